@@ -0,0 +1,56 @@
+"""
+Measures how long it takes to construct ODriveCAN objects for a number of axes.
+
+Runs on python-can's "virtual" interface, so it measures everything construction does except bringing up a real
+SocketCAN interface: opening the bus, registering the decoders and, with a database path, the lazy database setup.
+
+The "eager database" row also opens every node's database right after construction, like the constructor did before
+the database was opened on first use. The other removed eager steps (the candump link check and the 1 s sleep) need a
+real SocketCAN interface and are not measured here; they cost at least 1 s per program start.
+
+    python benchmarks/construction_time.py --axes 6
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pyodrivecan
+
+
+def construct(axes, channel, database, eager=False):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        odrives = [pyodrivecan.ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=database) for node_id in range(axes)]
+        if eager:
+            for odrive in odrives:
+                odrive.database
+        elapsed = time.perf_counter() - start
+        for odrive in odrives:
+            odrive.bus_shutdown()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--axes", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "bench.db")
+        eager_database = min(construct(args.axes, f"bench_construct_eager_{i}", database, eager=True) for i in range(args.repeat))
+        with_database = min(construct(args.axes, f"bench_construct_{i}", database) for i in range(args.repeat))
+        without_database = min(construct(args.axes, f"bench_construct_none_{i}", None) for i in range(args.repeat))
+
+    print(f"Constructing {args.axes} ODriveCAN objects (best of {args.repeat}):")
+    print(f"  eager database:   {eager_database * 1e3:8.2f} ms")
+    print(f"  with database:    {with_database * 1e3:8.2f} ms")
+    print(f"  without database: {without_database * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
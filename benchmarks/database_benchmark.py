@@ -0,0 +1,83 @@
+"""
+Benchmark of the ODriveData insert paths, in rows per second:
+
+    - add_odrive_data:        one INSERT and one commit per row (the path save_data used originally).
+    - add_odrive_data_many:   one executemany per batch of row tuples (used by the writer thread).
+    - insert_odrive_columns:  column oriented ingest of equal length arrays in one transaction.
+
+    python benchmarks/database_benchmark.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pyodrivecan
+
+
+def make_rows(count, trial_id=1, node_id=0):
+    return [(trial_id, node_id, i * 0.001) + tuple(float(i + j) for j in range(12)) for i in range(count)]
+
+
+def rows_to_columns(rows):
+    return dict(zip(pyodrivecan.OdriveDatabase.ODRIVE_DATA_COLUMNS, (list(column) for column in zip(*rows))))
+
+
+def rows_per_second(path, insert, count):
+    database = pyodrivecan.OdriveDatabase(path)
+    start = time.perf_counter()
+    insert(database)
+    elapsed = time.perf_counter() - start
+    database.close()
+    os.remove(path)
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--single-rows", type=int, default=2000, help="rows used for the slow one commit per row path")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    single_rows = rows[:args.single_rows]
+    columns = rows_to_columns(rows)
+
+    def single(database):
+        for row in single_rows:
+            database.add_odrive_data(*row)
+
+    def batched(database):
+        for i in range(0, len(rows), args.batch_size):
+            database.add_odrive_data_many(rows[i:i + args.batch_size])
+
+    def columnar(database):
+        database.insert_odrive_columns(columns)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        results["add_odrive_data"] = rows_per_second(path, single, len(single_rows))
+        results[f"add_odrive_data_many (batch {args.batch_size})"] = rows_per_second(path, batched, len(rows))
+        results["insert_odrive_columns"] = rows_per_second(path, columnar, len(rows))
+
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is not None:
+            dtype = [(name, 'f8') for name in pyodrivecan.OdriveDatabase.ODRIVE_DATA_COLUMNS]
+            array = np.array(rows, dtype=dtype)
+            results["insert_odrive_columns (NumPy)"] = rows_per_second(path, lambda database: database.insert_odrive_columns(array), len(rows))
+
+    baseline = results["add_odrive_data"]
+    print("ODriveData insert rate:")
+    for name, rate in results.items():
+        print(f"  {name:36s} {rate:12,.0f} rows/s ({rate / baseline:7.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Microbenchmark of ODriveCAN.process_can_message.
+
+Decodes the same mix of cyclic frames with the old if/elif decoder and with the table driven decoder,
+and prints the frames per second decoded by each:
+    python benchmarks/decode_benchmark.py --frames 200000
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import can
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pyodrivecan
+
+
+# Mix of cyclic command IDs an O-Drive sends: heartbeat (0x01), errors (0x03), encoder estimates (0x09) and the others.
+CYCLIC_IDS = (0x01, 0x03, 0x09, 0x09, 0x1C, 0x17, 0x14, 0x1D, 0x15)
+
+
+def legacy_process_can_message(self, message):
+    # The if/elif decoder used before the decode registry, kept here as the reference.
+    arbitration_id = message.arbitration_id
+    data = message.data
+    if arbitration_id == (self.nodeID << 5 | 0x09):
+        position, velocity = struct.unpack('<ff', data)
+        self.position = position
+        self.velocity = velocity
+    elif arbitration_id == (self.nodeID << 5 | 0x1C):
+        torque_target, torque_estimate = struct.unpack('<ff', data)
+        self.torque_target = torque_target
+        self.torque_estimate = torque_estimate
+    elif arbitration_id == (self.nodeID << 5 | 0x17):
+        bus_voltage, bus_current = struct.unpack('<ff', data)
+        self.bus_voltage = bus_voltage
+        self.bus_current = bus_current
+    elif arbitration_id == (self.nodeID << 5 | 0x14):
+        iq_setpoint, iq_measured = struct.unpack('<ff', data)
+        self.iq_setpoint = iq_setpoint
+        self.iq_measured = iq_measured
+    elif arbitration_id == (self.nodeID << 5 | 0x1D):
+        electrical_power, mechanical_power = struct.unpack('<ff', data)
+        self.electrical_power = electrical_power
+        self.mechanical_power = mechanical_power
+    elif arbitration_id == (self.nodeID << 5 | 0x15):
+        fet_temp, motor_temp = struct.unpack('<ff', data)
+        self.fet_temp = fet_temp
+        self.motor_temp = motor_temp
+    elif arbitration_id == (self.nodeID << 5 | 0x03):
+        active_errors, disarm_reason = struct.unpack('<II', data)
+        if active_errors != 0:
+            self.process_error_message(active_errors, 0)
+        if disarm_reason != 0:
+            self.process_error_message(0, disarm_reason)
+
+
+def make_frames(node_id, count):
+    frames = []
+    for i in range(count):
+        cmd_id = CYCLIC_IDS[i % len(CYCLIC_IDS)]
+        data = struct.pack('<II', 0, 0) if cmd_id == 0x03 else struct.pack('<ff', i, -i)
+        frames.append(can.Message(arbitration_id=node_id << 5 | cmd_id, data=data, is_extended_id=False))
+    return frames
+
+
+def frames_per_second(decode, odrive, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        decode(odrive, frame)
+    return len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        odrive = pyodrivecan.ODriveCAN(3, canBusID="bench_decode", canBusType="virtual", database=os.path.join(tmp, "bench.db"))
+        frames = make_frames(odrive.nodeID, args.frames)
+
+        before = max(frames_per_second(legacy_process_can_message, odrive, frames) for _ in range(args.repeat))
+        after = max(frames_per_second(pyodrivecan.ODriveCAN.process_can_message, odrive, frames) for _ in range(args.repeat))
+        odrive.bus_shutdown()
+
+    print(f"process_can_message decode rate ({args.frames} frames, best of {args.repeat}):")
+    print(f"  if/elif decoder:      {before:12,.0f} frames/s")
+    print(f"  table driven decoder: {after:12,.0f} frames/s ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
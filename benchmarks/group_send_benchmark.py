@@ -0,0 +1,64 @@
+"""
+Benchmark of sending one setpoint to every node per control tick.
+
+Compares calling set_torque once per node with one ODriveGroup.set_torques burst from pre-built frame templates.
+Runs on python-can's "virtual" interface by default. Pass --interface socketcan --channel vcan0 to measure real
+socket sends on a vcan interface (sudo ip link add dev vcan0 type vcan && sudo ip link set vcan0 up).
+
+    python benchmarks/group_send_benchmark.py --nodes 12 --ticks 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import can
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pyodrivecan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=12)
+    parser.add_argument("--ticks", type=int, default=5000)
+    parser.add_argument("--interface", default="virtual")
+    parser.add_argument("--channel", default="bench_group")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        odrives = [pyodrivecan.ODriveCAN(node_id, canBusID=args.channel, canBusType=args.interface, database=os.path.join(tmp, "bench.db")) for node_id in range(args.nodes)]
+        # A second bus on the channel drains the frames, so the benchmark measures sends rather than a filling queue.
+        sink = can.interface.Bus(args.channel, interface=args.interface)
+        torques = [0.01 * node_id for node_id in range(args.nodes)]
+
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            for odrive, torque in zip(odrives, torques):
+                odrive.set_torque(torque)
+            while sink.recv(0) is not None:
+                pass
+        per_node = (time.perf_counter() - start) / args.ticks
+
+        group = pyodrivecan.ODriveGroup(odrives)
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            group.set_torques(torques)
+            while sink.recv(0) is not None:
+                pass
+        burst = (time.perf_counter() - start) / args.ticks
+        stats = group.stats()
+
+        sink.shutdown()
+        for odrive in odrives:
+            odrive.bus_shutdown()
+
+    print(f"Torque setpoints for {args.nodes} nodes on {args.interface} ({args.ticks} ticks, including draining the sink bus):")
+    print(f"  set_torque per node:    {per_node * 1e6:8.1f} us/tick")
+    print(f"  ODriveGroup.set_torques: {burst * 1e6:8.1f} us/tick ({per_node / burst:.2f}x)")
+    print(f"  burst send latency: mean {stats['mean_burst_latency'] * 1e6:.1f} us, max {stats['max_burst_latency'] * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Timings of the trial queries on a large ODriveData table, with and without the trial index:
+
+    - get_next_trial_id:  the next free trial ID.
+    - trial count:        COUNT(*) of one node in one trial.
+    - window first page:  the first page of a 1 second window of one node (query_window).
+    - window deep page:   a page 90% into the last trial, by keyset (query_window after=) and by OFFSET.
+
+The database is built once (--rows rows spread over --trials trials of --nodes nodes) and kept at --path, so later
+runs reuse it. Building 10M rows takes a few minutes and about 1.5 GB.
+
+    python benchmarks/query_benchmark.py --rows 10000000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import numpy as np
+import pyodrivecan
+
+INDEX_NAME = "ODriveData_trial_node_time"
+CHUNK_ROWS = 500000
+
+
+def build(path, rows, trials, nodes):
+    database = pyodrivecan.OdriveDatabase(path)
+    if database.fetch("SELECT COUNT(*) FROM ODriveData;")[0][0] >= rows:
+        database.close()
+        return
+    rows_per_trial = rows // trials
+    start = time.perf_counter()
+    for trial_id in range(1, trials + 1):
+        for offset in range(0, rows_per_trial, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, rows_per_trial - offset)
+            sample = np.arange(offset, offset + count)
+            database.insert_odrive_columns({
+                'trial_id': trial_id,
+                'node_ID': sample % nodes,
+                'time': (sample // nodes) * 0.001,
+                'position': np.random.rand(count),
+                'velocity': np.random.rand(count),
+                'torque_estimate': np.random.rand(count),
+            })
+    database.close()
+    print(f"Built {rows} rows in {time.perf_counter() - start:.1f} s")
+
+
+def best_time(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_queries(database, trials, nodes, rows):
+    rows_per_node = rows // trials // nodes
+    trial_id = trials
+    end = rows_per_node * 0.001
+    deep = end * 0.9
+    columns = ['time', 'position', 'velocity']
+    key = database.query_window(trial_id, 0, deep, None, columns, page_size=1)[1]
+    offset = int(rows_per_node * 0.9)
+    return {
+        'get_next_trial_id': best_time(database.get_next_trial_id),
+        'trial count': best_time(lambda: database.fetch("SELECT COUNT(*) FROM ODriveData WHERE trial_id = ? AND node_ID = ?;", (trial_id, 0))),
+        'window first page': best_time(lambda: database.query_window(trial_id, 0, 1.0, 2.0, columns, page_size=1000)),
+        'window deep page (keyset)': best_time(lambda: database.query_window(trial_id, 0, None, None, columns, page_size=1000, after=key)),
+        'window deep page (OFFSET)': best_time(lambda: database.fetch(
+            "SELECT time, position, velocity FROM ODriveData WHERE trial_id = ? AND node_ID = ? ORDER BY time LIMIT 1000 OFFSET ?;", (trial_id, 0, offset)), repeat=1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--nodes", type=int, default=2)
+    parser.add_argument("--path", default="query_benchmark.db")
+    parser.add_argument("--no-baseline", action="store_true", help="skip the timings without the index")
+    args = parser.parse_args()
+
+    build(args.path, args.rows, args.trials, args.nodes)
+    database = pyodrivecan.OdriveDatabase(args.path)
+    with_index = run_queries(database, args.trials, args.nodes, args.rows)
+
+    without_index = None
+    if not args.no_baseline:
+        database.execute(f"DROP INDEX IF EXISTS {INDEX_NAME};")
+        without_index = run_queries(database, args.trials, args.nodes, args.rows)
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            database.ensure_odrive_table()
+        print(f"Rebuilt the trial index in {time.perf_counter() - start:.1f} s")
+    database.close()
+
+    print(f"{args.rows} rows, {args.trials} trials, {args.nodes} nodes:")
+    print(f"  {'query':28s} {'index':>12s} {'no index':>12s}")
+    for name, seconds in with_index.items():
+        baseline = f"{without_index[name] * 1e3:9.2f} ms" if without_index else ""
+        print(f"  {name:28s} {seconds * 1e3:9.3f} ms {baseline:>12s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures how much CPU the CAN receive path uses while the bus is idle.
+
+The old `recv_all` busy-polled the bus with `await asyncio.sleep(0)` and pinned a core at 100% for every node.
+The event driven receive path should stay below IDLE_CPU_TARGET (percent of one core) no matter how many nodes are attached.
+
+Runs on python-can's "virtual" interface so no hardware is needed:
+    python benchmarks/recv_idle_cpu.py --nodes 8 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pyodrivecan
+
+
+# Target idle CPU use of the receive path in percent of one core.
+IDLE_CPU_TARGET = 2.0
+
+
+async def busy_poll_recv_all(odrive):
+    # The receive loop used before the hub was event driven, kept here as the reference.
+    while odrive.running:
+        await asyncio.sleep(0)
+        msg = odrive.canBus.recv(timeout=0)
+        if msg is not None:
+            odrive.process_can_message(msg)
+
+
+async def measure(odrives, recv, seconds):
+    async def stop_after():
+        await asyncio.sleep(seconds)
+        for odrive in odrives:
+            odrive.running = False
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    await asyncio.gather(stop_after(), *(recv(odrive) for odrive in odrives))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return 100.0 * cpu / wall
+
+
+def make_odrives(nodes, channel, database):
+    return [pyodrivecan.ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=database) for node_id in range(nodes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "bench.db")
+
+        odrives = make_odrives(args.nodes, "bench_busy_poll", database)
+        before = asyncio.run(measure(odrives, busy_poll_recv_all, args.seconds))
+        for odrive in odrives:
+            odrive.bus_shutdown()
+
+        odrives = make_odrives(args.nodes, "bench_event", database)
+        after = asyncio.run(measure(odrives, lambda odrive: odrive.recv_all(), args.seconds))
+        for odrive in odrives:
+            odrive.bus_shutdown()
+
+    print(f"Idle receive CPU with {args.nodes} nodes over {args.seconds:.1f} s:")
+    print(f"  busy-poll recv_all:    {before:6.1f} % of one core")
+    print(f"  event driven recv_all: {after:6.1f} % of one core (target < {IDLE_CPU_TARGET} %)")
+    return 0 if after < IDLE_CPU_TARGET else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
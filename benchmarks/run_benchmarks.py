@@ -0,0 +1,255 @@
+"""
+Runs the benchmark suite and writes the results as JSON, optionally flagging regressions against a stored baseline.
+
+Everything runs on python-can's "virtual" interface, with ODriveSimulator standing in for the O-Drives, so no
+hardware is needed. Benchmarks:
+
+    - decode:        Frames per second through the hub dispatch and process_can_message, for each node count.
+    - database:      Rows per second of add_odrive_data, add_odrive_data_many and insert_odrive_columns.
+    - frame_to_row:  Latency from sending an encoder frame to save_data capturing its value in a row, p50/p99/max.
+    - recv_cpu:      CPU use of recv_all in percent of one core, with an idle bus and with the simulator sending
+                     its default cyclic messages, for each node count.
+
+Save a baseline once, then compare later runs against it (exits with 1 if anything regressed):
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --output results.json --compare baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+
+import can
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pyodrivecan
+
+import database_benchmark
+import decode_benchmark
+import recv_idle_cpu
+
+
+NODE_COUNTS = (1, 2, 4, 8, 16, 32)
+
+
+class Results:
+    """
+    The metrics of one run. Each metric knows whether higher is better and the noise floor below which
+    a change against the baseline is never flagged (e.g. CPU percentages near zero).
+    """
+    def __init__(self):
+        self.metrics = {}
+
+    def record(self, name, value, unit, higher_is_better, noise=0.0):
+        self.metrics[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better, 'noise': noise}
+        print(f"  {name:40s} {value:14,.6g} {unit}", file=sys.stderr)
+
+
+@contextlib.contextmanager
+def quiet():
+    # ODriveCAN prints its progress, keep it out of the benchmark output.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_odrives(nodes, channel, database):
+    with quiet():
+        return [pyodrivecan.ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=database) for node_id in range(nodes)]
+
+
+def shutdown(odrives):
+    with quiet():
+        for odrive in odrives:
+            odrive.bus_shutdown()
+
+
+#------ Decode ------
+def bench_decode(results, tmp, node_counts, frames):
+    for nodes in node_counts:
+        odrives = make_odrives(nodes, f"bench_decode_{nodes}", os.path.join(tmp, "decode.db"))
+        hub = odrives[0].hub
+        per_node = frames // nodes
+        messages = [frame for group in zip(*(decode_benchmark.make_frames(odrive.nodeID, per_node) for odrive in odrives)) for frame in group]
+        best = 0.0
+        for _ in range(3):
+            start = time.perf_counter()
+            for message in messages:
+                hub.dispatch(message)
+            best = max(best, len(messages) / (time.perf_counter() - start))
+        shutdown(odrives)
+        results.record(f"decode.frames_per_s.nodes_{nodes}", best, "frames/s", True)
+
+
+#------ Database ------
+def bench_database(results, tmp, rows, single_rows):
+    path = os.path.join(tmp, "insert.db")
+    data = database_benchmark.make_rows(rows)
+    columns = database_benchmark.rows_to_columns(data)
+
+    def single(database):
+        for row in data[:single_rows]:
+            database.add_odrive_data(*row)
+
+    def batched(database):
+        for i in range(0, len(data), 100):
+            database.add_odrive_data_many(data[i:i + 100])
+
+    results.record("database.add_odrive_data.rows_per_s", database_benchmark.rows_per_second(path, single, single_rows), "rows/s", True)
+    results.record("database.add_odrive_data_many.rows_per_s", database_benchmark.rows_per_second(path, batched, len(data)), "rows/s", True)
+    results.record("database.insert_odrive_columns.rows_per_s", database_benchmark.rows_per_second(path, lambda database: database.insert_odrive_columns(columns), len(data)), "rows/s", True)
+
+
+#------ Frame to row latency ------
+async def frame_to_row(odrive, sender, frames, frame_period, save_period):
+    sent = []
+
+    async def send_frames():
+        for k in range(1, frames + 1):
+            sent.append(time.time() - odrive.start_time)
+            sender.send(can.Message(arbitration_id=odrive.nodeID << 5 | 0x09, data=struct.pack('<ff', k, 0.0), is_extended_id=False))
+            await asyncio.sleep(frame_period)
+        await asyncio.sleep(5 * save_period)
+        odrive.running = False
+
+    await asyncio.gather(send_frames(), odrive.recv_all(), odrive.save_data(timeout=save_period))
+    return sent
+
+
+def bench_frame_to_row(results, tmp, frames, frame_period=0.002, save_period=0.001):
+    path = os.path.join(tmp, "latency.db")
+    odrives = make_odrives(1, "bench_latency", path)
+    odrive = odrives[0]
+    sender = can.interface.Bus("bench_latency", interface="virtual")
+    with quiet():
+        sent = asyncio.run(frame_to_row(odrive, sender, frames, frame_period, save_period))
+    sender.shutdown()
+    shutdown(odrives)
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT time, position FROM ODriveData WHERE position IS NOT NULL ORDER BY time").fetchall()
+    conn.close()
+    # The latency of frame k is the time until the first row holding its value (or a later one).
+    latencies = []
+    index = 0
+    for k, sent_time in enumerate(sent, start=1):
+        while index < len(rows) and rows[index][1] < k:
+            index += 1
+        if index == len(rows):
+            break
+        latencies.append(rows[index][0] - sent_time)
+    latencies.sort()
+    if not latencies:
+        return
+    results.record("frame_to_row.latency_p50", latencies[len(latencies) // 2], "s", False, noise=0.0005)
+    results.record("frame_to_row.latency_p99", latencies[int(len(latencies) * 0.99)], "s", False, noise=0.001)
+    results.record("frame_to_row.latency_max", latencies[-1], "s", False, noise=0.005)
+
+
+#------ Receive CPU ------
+def bench_recv_cpu(results, tmp, node_counts, seconds):
+    database = os.path.join(tmp, "recv.db")
+    for nodes in node_counts:
+        odrives = make_odrives(nodes, f"bench_idle_{nodes}", database)
+        with quiet():
+            idle = asyncio.run(recv_idle_cpu.measure(odrives, lambda odrive: odrive.recv_all(), seconds))
+        shutdown(odrives)
+        results.record(f"recv_cpu.idle_percent.nodes_{nodes}", idle, "%", False, noise=1.0)
+
+        simulator = pyodrivecan.ODriveSimulator(range(nodes), canBusID=f"bench_load_{nodes}", canBusType="virtual")
+        odrives = make_odrives(nodes, f"bench_load_{nodes}", database)
+        simulator.start()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        with quiet():
+            asyncio.run(recv_idle_cpu.measure(odrives, lambda odrive: odrive.recv_all(), seconds))
+        wall = time.perf_counter() - wall_start
+        simulator.stop()
+        # Leave out the CPU used by the simulator thread, it isn't part of the receive path.
+        loaded = 100.0 * (time.process_time() - cpu_start - simulator.cpu_time) / wall
+        shutdown(odrives)
+        results.record(f"recv_cpu.loaded_percent.nodes_{nodes}", loaded, "%", False, noise=2.0)
+        results.record(f"recv_cpu.loaded_frames_per_s.nodes_{nodes}", simulator.frames_sent / wall, "frames/s", True)
+
+
+#------ Compare ------
+def compare(metrics, baseline, tolerance):
+    """
+    Returns the names of the metrics that got worse than the baseline by more than tolerance (relative) and their noise floor.
+    """
+    regressions = []
+    print(f"\nCompared with the baseline (tolerance {tolerance:.0%}):", file=sys.stderr)
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['value']
+        new = metric['value']
+        change = (new - old) if metric['higher_is_better'] else (old - new)  # Positive is an improvement
+        regressed = -change > max(tolerance * abs(old), metric['noise'])
+        ratio = new / old if old else float('inf')
+        print(f"  {'REGRESSION' if regressed else 'ok':10s} {name:40s} {old:14,.6g} -> {new:14,.6g} ({ratio:.2f}x)", file=sys.stderr)
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", "-o", help="write the results to this JSON file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change counted as a regression (default 0.15)")
+    parser.add_argument("--nodes", type=int, nargs="+", default=list(NODE_COUNTS), help="node counts to scale over")
+    parser.add_argument("--only", nargs="+", choices=("decode", "database", "frame_to_row", "recv_cpu"), help="only run these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="shorter runs, for a smoke test")
+    args = parser.parse_args()
+
+    benchmarks = args.only or ("decode", "database", "frame_to_row", "recv_cpu")
+    scale = 0.1 if args.quick else 1.0
+    results = Results()
+    with tempfile.TemporaryDirectory() as tmp:
+        if "decode" in benchmarks:
+            bench_decode(results, tmp, args.nodes, int(200000 * scale))
+        if "database" in benchmarks:
+            bench_database(results, tmp, int(100000 * scale), int(2000 * scale))
+        if "frame_to_row" in benchmarks:
+            bench_frame_to_row(results, tmp, int(1000 * scale))
+        if "recv_cpu" in benchmarks:
+            bench_recv_cpu(results, tmp, args.nodes, 3.0 * scale)
+
+    report = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'pyodrivecan': pyodrivecan.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'quick': args.quick,
+        },
+        'metrics': results.metrics,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['metrics']
+        regressions = compare(results.metrics, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,7 @@ This is an example on how to use some of the methods inside the pyodrivecan clas
 
     Define an object of the class with its nodeID and initalize it:
     - pyodrivecan.ODriveCAN(#nodeID)
-    - initCanBus()
+    - initCanBusAsync()
 
     - set_controller_mode()
         - position
@@ -69,7 +69,7 @@ async def controller(odrive):
 
             #After the E-Stop and Clear Errror the O-Drive will be in an Idle Statee
             #Need to set axis state back to closed loop control
-            odrive.setAxisState("closed_loop_control")
+            await odrive.setAxisStateAsync("closed_loop_control")
 
 
 
@@ -85,7 +85,7 @@ async def controller(odrive):
             await asyncio.sleep(3) #Wait 3 second
 
         #Test if we can set axis state to idle.
-       # odrive.setAxisState("idle")
+       # await odrive.setAxisStateAsync("idle")
        # await asyncio.sleep(1)#Wait 1 second
        # print("O-Drive Axis State set to idle.")
         odrive.running = False  # Stop the loop after the timedelta.
@@ -98,7 +98,7 @@ async def main():
     odrive = pyodrivecan.ODriveCAN(10)
     try:
         # Initialize CAN bus
-        odrive.initCanBus()
+        await odrive.initCanBusAsync()
 
         # Clear errors on the O-Drive (This will clear the E-Stop Error if the program was previously Keyboard Interrupted)
         odrive.clear_errors(identify=False)
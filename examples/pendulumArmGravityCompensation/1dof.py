@@ -10,6 +10,9 @@ length = 0.11  # Meters
 async def controller(odrive):
     await asyncio.sleep(1)
 
+    # The kernel sends the torque setpoint every 1 ms, the loop below only updates its value.
+    odrive.start_streaming("torque", 0.001, 0.0)
+
     #Run for set time delay example runs for 15 seconds.
     stop_at = datetime.now() + timedelta(seconds=10000)
     while datetime.now() < stop_at:
@@ -27,12 +30,14 @@ async def controller(odrive):
         # Limit next_torque to between -0.129 and 0.129
         next_torque = max(-0.2, min(0.2, next_torque))
         
-        # Set the calculated torque
-        odrive.set_torque(next_torque) 
+        # Update the streamed torque setpoint
+        odrive.update_stream(next_torque)
         print(f"Normalized position {normalized_position} (revs), Current Position {current_position_rad} (rad), Torque Set to {next_torque} (Nm)")
 
         await asyncio.sleep(0.0015)  # 15ms sleep, adjust based on your control loop requirements
 
+    odrive.stop_streaming()
+
 
 #Set up Node_ID 10 ACTIV NODE ID = 10
 odrive = pyodrivecan.ODriveCAN(0)
@@ -44,7 +49,7 @@ async def main():
     await asyncio.sleep(1)
 
     #Initalize odrive
-    odrive.initCanBus()
+    await odrive.initCanBusAsync()
 
     
     print("Put Arm at bottom center to calibrate Zero Position.")
@@ -54,7 +59,7 @@ async def main():
     current_position = odrive.position
     print(f"Encoder Absolute Position Set: {current_position}")
 
-    #odrive.setAxisState("closed_loop_control")
+    #await odrive.setAxisStateAsync("closed_loop_control")
 
     #add each odrive to the async loop so they will run.
     await asyncio.gather(
@@ -68,5 +73,6 @@ if __name__ == "__main__":
         asyncio.run(main())
     except KeyboardInterrupt:
         print("KeyboardInterrupt caught, stopping...")
+        odrive.stop_streaming()
         odrive.estop()
         
@@ -0,0 +1,33 @@
+import pyodrivecan
+import asyncio
+
+async def controller(odrive):
+        odrive.set_velocity(2.0)  #Spin the simulated motor at 2 Rev/sec
+        await asyncio.sleep(5) # Need this line in order for the async functions to work. 
+        odrive.set_velocity(0)
+
+        # Set running flag to False to stop collecting and storing O-Drive to database.
+        odrive.running = False  
+        
+
+if __name__ == "__main__":
+    # Simulate an O-Drive with node_id = 0 on python-can's virtual bus, no hardware needed.
+    # To simulate on a vcan interface instead, run: python -m pyodrivecan.simulator --nodes 0 --channel vcan0
+    simulator = pyodrivecan.ODriveSimulator([0], canBusID="sim", canBusType="virtual")
+    simulator.start()
+
+    # Create ODriveCAN object on the same virtual bus
+    odrive = pyodrivecan.ODriveCAN(0, canBusID="sim", canBusType="virtual")
+    
+    # Initialize the odrive object 
+    odrive.initCanBus()
+
+    #Set O-Drive to velocity control
+    odrive.set_controller_mode("velocity_control")
+
+    # This will use the run method to pass in the async controller function
+    #and automatically run the odrive 
+    odrive.run(controller(odrive))
+
+    odrive.bus_shutdown()
+    simulator.stop()
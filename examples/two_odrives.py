@@ -44,15 +44,15 @@ async def controller(odrive1, odrive2):
 async def main():
     #Set up Node_ID 0
     odrive1 = pyodrivecan.ODriveCAN(0)
-    odrive1.initCanBus()
+    await odrive1.initCanBusAsync()
     
     #Set up Node_ID 1 
     odrive2 = pyodrivecan.ODriveCAN(1)
-    odrive2.initCanBus()
+    await odrive2.initCanBusAsync()
     
     #Set up Node_ID 2 
     #odrive3 = ODriveCAN(2)
-    #odrive3.initCanBus()
+    #await odrive3.initCanBusAsync()
 
     #Add each odrive to the async loop so they each will collect and store O-Drive data into the database concurrently.
     #Add the defined async controller function to also run concurrently with both odrive loops. 
@@ -1,10 +1,48 @@
 """
+pyodrivecan controls O-Drive motor controllers over CAN and logs their telemetry to SQLite.
+
+ODriveCAN is one O-Drive on a CAN interface. Every node on an interface shares one CanBusHub, which reads the bus
+once and routes each frame to its node, and CanNetwork runs several interfaces together. The
+decoded feedback of a node is kept in its Telemetry, and OdriveDatabase / OdriveDatabaseWriter log it to SQLite off
+the event loop. ODriveSimulator simulates O-Drives on a virtual or vcan bus, and
+iter_trial, load_trial and export_trial read a logged trial back out as arrays or CSV, Parquet and NPZ files.
 
 Examples
 ---------
-    TODO
+    Spin one O-Drive at 2 rev/s for 5 seconds while logging to odrive_data.db:
+
+        import asyncio
+        import pyodrivecan
+
+        async def controller(odrive):
+            odrive.set_velocity(2.0)
+            await asyncio.sleep(5)
+            odrive.set_velocity(0)
+            odrive.running = False
+
+        odrive = pyodrivecan.ODriveCAN(0)
+        odrive.initCanBus()
+        odrive.set_controller_mode("velocity_control")
+        odrive.run(controller(odrive))
+        odrive.bus_shutdown()
+
+    Load the logged trial back as a NumPy structured array:
+
+        data = pyodrivecan.load_trial("odrive_data.db", trial_id=1, node_ID=0)
 """
 __version__ = "0.1.03"
 
 from .pyodrivecan import ODriveCAN
-from .odrivedatabase import OdriveDatabase
\ No newline at end of file
+from .odrivedatabase import OdriveDatabase, OdriveDatabaseWriter
+from .canbushub import CanBusHub
+from .busmonitor import BusMonitor, StreamStats
+from .busstate import BusStateMonitor
+from .cannetwork import CanNetwork
+from .framerecorder import FrameRecorder, load_frames
+from .telemetrybuffer import TelemetryRingBuffer
+from .telemetry import Telemetry, TelemetrySnapshot
+from .odrivegroup import ODriveGroup
+from .controlloop import ControlLoop
+from .instrumentation import Instrumentation, LatencyStats
+from .simulator import ODriveSimulator, SimulatedAxis
+from .export import iter_trial, load_trial, export_trial
\ No newline at end of file
@@ -0,0 +1,196 @@
+import math
+
+
+
+
+class StreamStats:
+    """
+    Arrival statistics of one cyclic message stream, i.e. one (node ID, command ID) pair.
+
+    The period is learned from the intervals between frames (or given with expected_period). An interval longer than
+    GAP_FACTOR periods counts as a gap, and the frames that should have arrived during it count as missed. Gaps are
+    left out of the period and jitter, so one missing frame doesn't distort them.
+
+    Attributes:
+        frames       (int): Frames received.
+        period       (float): The (learned or expected) period in seconds, 0.0 until two frames were received.
+        jitter       (float): The standard deviation of the intervals between frames in seconds, gaps excluded.
+        max_interval (float): The longest interval between two frames in seconds.
+        missed       (int): Frames estimated missing from the gaps.
+        gaps         (int): Intervals longer than GAP_FACTOR periods.
+    """
+    __slots__ = ('frames', 'first_time', 'last_time', 'period', 'expected_period', 'intervals', 'interval_mean', 'interval_m2', 'max_interval', 'missed', 'gaps')
+
+    GAP_FACTOR = 1.5
+    # Weight of each new interval in the learned period
+    PERIOD_SMOOTHING = 1.0 / 16
+
+    def __init__(self, expected_period=None):
+        self.expected_period = expected_period
+        self.frames = 0
+        self.first_time = 0.0
+        self.last_time = 0.0
+        self.period = expected_period or 0.0
+        self.intervals = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+        self.max_interval = 0.0
+        self.missed = 0
+        self.gaps = 0
+
+
+    def observe(self, timestamp):
+        """
+        Records the arrival of one frame at timestamp (seconds).
+        """
+        self.frames += 1
+        if self.frames == 1:
+            self.first_time = self.last_time = timestamp
+            return
+        interval = timestamp - self.last_time
+        self.last_time = timestamp
+        if interval > self.max_interval:
+            self.max_interval = interval
+        period = self.period
+        if period <= 0.0:
+            self.period = interval
+        elif interval > self.GAP_FACTOR * period:
+            self.gaps += 1
+            self.missed += max(int(interval / period + 0.5) - 1, 1)
+            return
+        elif self.expected_period is None:
+            self.period = period + (interval - period) * self.PERIOD_SMOOTHING
+        # Welford's running variance of the intervals
+        self.intervals += 1
+        delta = interval - self.interval_mean
+        self.interval_mean += delta / self.intervals
+        self.interval_m2 += delta * (interval - self.interval_mean)
+
+
+    @property
+    def jitter(self):
+        return math.sqrt(self.interval_m2 / (self.intervals - 1)) if self.intervals > 1 else 0.0
+
+
+    def rate(self):
+        """
+        Returns the average rate in Hz since the first frame.
+        """
+        elapsed = self.last_time - self.first_time
+        return (self.frames - 1) / elapsed if elapsed > 0 else 0.0
+
+
+
+
+class BusMonitor:
+    """
+    Watches the frames received on one CAN interface: the period, jitter and missed frames of every (node ID, command ID)
+    stream, and the bus load in percent of the bit rate.
+
+    The bus load counts the bits of every frame observed in each window of window seconds, using the length of a
+    standard 11 bit ID frame with its data, the interframe space and worst case bit stuffing, so it errs on the high side.
+    With kernel filters on (see CanBusHub.update_filters) only the frames passing the filters are observed, so on
+    SocketCAN the load of the whole bus is also computed from the kernel's interface packet and byte counters.
+
+    Created by CanBusHub.enable_monitor(), which feeds it every received frame.
+
+    Attributes:
+        canBitRate     (int): The CAN bit rate in bits/s.
+        window         (float): The bus load window in seconds.
+        streams        (dict): StreamStats keyed by arbitration ID.
+        expected_rates (dict): Expected rates in Hz keyed by command ID, for streams whose period shouldn't be learned.
+        bus_load       (float): The bus load of the last complete window, in percent of canBitRate.
+        max_bus_load   (float): The highest bus load of any window.
+    """
+    def __init__(self, canBitRate=250000, window=1.0, expected_rates=None):
+        self.canBitRate = canBitRate
+        self.window = window
+        self.expected_rates = dict(expected_rates or {})
+        self.streams = {}
+        self.window_start = None
+        self.window_bits = 0
+        self.bus_load = 0.0
+        self.max_bus_load = 0.0
+        self.frames = 0
+        self.bits = 0
+
+
+    @staticmethod
+    def frame_bits(dlc, extended=False):
+        """
+        Returns the bits a classic CAN data frame with dlc data bytes takes on the bus, including the 3 bit interframe
+        space and worst case bit stuffing.
+        """
+        if extended:
+            stuffable = 54 + 8 * dlc
+            return 8 * dlc + 67 + (stuffable - 1) // 4
+        stuffable = 34 + 8 * dlc
+        return 8 * dlc + 47 + (stuffable - 1) // 4
+
+
+    def counter_load(self, packets, data_bytes, elapsed):
+        """
+        Returns the bus load in percent estimated from frame and data byte counts over elapsed seconds, e.g. from the
+        kernel's interface statistics, assuming standard IDs and worst case bit stuffing.
+        """
+        # frame_bits summed over the frames: 10 bits per data byte and 55.25 bits of overhead per frame on average
+        bits = 10 * data_bytes + 55.25 * packets
+        return 100.0 * bits / (elapsed * self.canBitRate)
+
+
+    def observe(self, msg):
+        """
+        Records one received frame.
+        """
+        timestamp = msg.timestamp
+        stream = self.streams.get(msg.arbitration_id)
+        if stream is None:
+            rate = self.expected_rates.get(msg.arbitration_id & 0x1F)
+            stream = self.streams[msg.arbitration_id] = StreamStats(1.0 / rate if rate else None)
+        stream.observe(timestamp)
+
+        bits = self.frame_bits(msg.dlc, msg.is_extended_id)
+        self.frames += 1
+        self.bits += bits
+        if self.window_start is None:
+            self.window_start = timestamp
+        elif timestamp - self.window_start >= self.window:
+            # Close the window. After a silence it spans the silence too, which lowers its load accordingly.
+            elapsed = timestamp - self.window_start
+            self.bus_load = 100.0 * self.window_bits / (elapsed * self.canBitRate)
+            if self.bus_load > self.max_bus_load:
+                self.max_bus_load = self.bus_load
+            self.window_start = timestamp
+            self.window_bits = 0
+        self.window_bits += bits
+
+
+    def reset(self):
+        """
+        Clears all statistics.
+        """
+        self.__init__(self.canBitRate, self.window, self.expected_rates)
+
+
+    def stream_stats(self):
+        """
+        Returns the statistics of every stream.
+
+        Returns:
+            list of dicts with node_ID, cmd_id, frames, rate (Hz), period (s), jitter (s), max_interval (s), missed and gaps,
+            sorted by node ID and command ID.
+        """
+        return [
+            {
+                'node_ID': arbitration_id >> 5,
+                'cmd_id': arbitration_id & 0x1F,
+                'frames': stream.frames,
+                'rate': stream.rate(),
+                'period': stream.period,
+                'jitter': stream.jitter,
+                'max_interval': stream.max_interval,
+                'missed': stream.missed,
+                'gaps': stream.gaps,
+            }
+            for arbitration_id, stream in sorted(self.streams.items())
+        ]
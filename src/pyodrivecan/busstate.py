@@ -0,0 +1,342 @@
+import asyncio
+import collections
+import json
+import subprocess
+import time
+
+
+
+
+class BusStateMonitor:
+    """
+    Follows the error state of one CAN interface (error-active, error-warning, error-passive, bus-off) from the error
+    frames the SocketCAN driver sends, and recovers from bus-off without restarting the process.
+
+    python-can enables error frames on SocketCAN sockets, and the kernel filters (see CanBusHub.update_filters) don't
+    apply to them, so they reach the read loop as can.Message objects with is_error_frame set. CanBusHub.route() hands
+    them to handle_error_frame(), which counts them, updates the state and the controller's error counters, and calls
+    the listeners on every event.
+
+    On bus-off, with auto_recover set, recover() restarts the CAN controller with `ip link set <interface> type can
+    restart`, which takes milliseconds instead of taking the link down and up. It waits at most recovery_timeout
+    seconds per attempt for the driver to report the restart (or for frames to arrive again), and after
+    max_recovery_attempts falls back to taking the link down and setting it up again. If the interface restarts by
+    itself (restart-ms set, see CanBusHub.setup_interface), the restart command is refused and recover() just waits.
+    The commands run with `sudo -n`, so they fail at once instead of waiting for a password nobody can type; if the
+    restart can't be run at all, recover() goes straight to taking the link down and up.
+
+    Attributes:
+        hub                   (CanBusHub): The hub of the interface.
+        state                 (str): The current error state, one of STATES.
+        tx_errors             (int): The controller's transmit error counter from the last error frame that had it.
+        rx_errors             (int): The controller's receive error counter from the last error frame that had it.
+        error_frames          (int): The number of error frames received.
+        error_counts          (dict): The number of error frames of every error class, keyed by class name.
+        bus_off_count         (int): How often the interface went bus-off.
+        recoveries            (int): How often it recovered from bus-off.
+        last_recovery_time    (float): Seconds from bus-off to the last recovery.
+        max_recovery_time     (float): The longest recovery in seconds.
+        last_error_time       (float): The receive timestamp of the last error frame, 0.0 if none was received.
+        events                (collections.deque): The last MAX_EVENTS events (see add_listener).
+        auto_recover          (bool): Recover from bus-off automatically. Defaults to True.
+        recovery_timeout      (float): Max seconds to wait for one restart attempt. Defaults to 0.1.
+        max_recovery_attempts (int): Restart attempts before taking the link down and up. Defaults to 3.
+
+    Example:
+        >>> odrive.hub.bus_state.add_listener(print)
+        >>> odrive.hub.bus_state.stats()
+    """
+    # Error classes in the ID of an error frame (linux/can/error.h)
+    CAN_ERR_TX_TIMEOUT = 0x001
+    CAN_ERR_LOSTARB = 0x002
+    CAN_ERR_CRTL = 0x004
+    CAN_ERR_PROT = 0x008
+    CAN_ERR_TRX = 0x010
+    CAN_ERR_ACK = 0x020
+    CAN_ERR_BUSOFF = 0x040
+    CAN_ERR_BUSERROR = 0x080
+    CAN_ERR_RESTARTED = 0x100
+    CAN_ERR_CNT = 0x200
+
+    ERROR_CLASSES = {
+        CAN_ERR_TX_TIMEOUT: 'tx_timeout',
+        CAN_ERR_LOSTARB: 'lost_arbitration',
+        CAN_ERR_CRTL: 'controller',
+        CAN_ERR_PROT: 'protocol',
+        CAN_ERR_TRX: 'transceiver',
+        CAN_ERR_ACK: 'no_ack',
+        CAN_ERR_BUSOFF: 'bus_off',
+        CAN_ERR_BUSERROR: 'bus_error',
+        CAN_ERR_RESTARTED: 'restarted',
+    }
+
+    # Controller status in data[1] of a CAN_ERR_CRTL error frame
+    CAN_ERR_CRTL_RX_WARNING = 0x04
+    CAN_ERR_CRTL_TX_WARNING = 0x08
+    CAN_ERR_CRTL_RX_PASSIVE = 0x10
+    CAN_ERR_CRTL_TX_PASSIVE = 0x20
+    CAN_ERR_CRTL_ACTIVE = 0x40
+
+    ERROR_ACTIVE = "error-active"
+    ERROR_WARNING = "error-warning"
+    ERROR_PASSIVE = "error-passive"
+    BUS_OFF = "bus-off"
+    STATES = (ERROR_ACTIVE, ERROR_WARNING, ERROR_PASSIVE, BUS_OFF)
+
+    MAX_EVENTS = 100
+
+    def __init__(self, hub, auto_recover=True, recovery_timeout=0.1, max_recovery_attempts=3):
+        self.hub = hub
+        self.auto_recover = auto_recover
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_attempts = max_recovery_attempts
+        self.state = self.ERROR_ACTIVE
+        self.tx_errors = 0
+        self.rx_errors = 0
+        self.error_frames = 0
+        self.error_counts = dict.fromkeys(self.ERROR_CLASSES.values(), 0)
+        self.bus_off_count = 0
+        self.recoveries = 0
+        self.bus_off_time = None
+        self.last_recovery_time = 0.0
+        self.max_recovery_time = 0.0
+        self.last_error_time = 0.0
+        self.events = collections.deque(maxlen=self.MAX_EVENTS)
+        self.listeners = []
+        self.state_waiters = []
+        self.recovery = None
+        self.restart_unavailable = False  # Set when the restart command could not be run at all (see restart_controller)
+
+
+    def add_listener(self, callback):
+        """
+        Calls callback(event) on the event loop thread for every event. An event is a dict with the event name
+        ("state_change", "recovered" or "recovery_failed"), the time (time.time()), the old_state and the new state.
+        """
+        self.listeners.append(callback)
+
+
+    def remove_listener(self, callback):
+        """
+        Removes a callback added with add_listener.
+        """
+        self.listeners.remove(callback)
+
+
+    def emit(self, event, old_state, **details):
+        event = {'event': event, 'time': time.time(), 'interface': self.hub.canBusID, 'old_state': old_state, 'state': self.state, **details}
+        self.events.append(event)
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in bus state listener: {e}")
+
+
+    def set_state(self, state, timestamp=None):
+        """
+        Changes the error state, emits a "state_change" event and wakes wait_for_state(). Starts recovery on bus-off.
+        """
+        old_state = self.state
+        if state == old_state:
+            return
+        self.state = state
+        if state == self.BUS_OFF:
+            self.bus_off_count += 1
+            self.bus_off_time = time.monotonic()
+        self.emit("state_change", old_state, timestamp=timestamp)
+        waiting, self.state_waiters = self.state_waiters, []
+        for future in waiting:
+            if not future.done():
+                future.set_result(state)
+        if old_state == self.BUS_OFF and self.bus_off_time is not None:
+            self.record_recovery(old_state)
+        if state == self.BUS_OFF and self.auto_recover and (self.recovery is None or self.recovery.done()):
+            try:
+                self.recovery = asyncio.ensure_future(self.recover())
+            except RuntimeError:
+                pass  # No event loop running, e.g. frames handed in by hand
+
+
+    def record_recovery(self, old_state):
+        recovery_time = time.monotonic() - self.bus_off_time
+        self.bus_off_time = None
+        self.recoveries += 1
+        self.last_recovery_time = recovery_time
+        self.max_recovery_time = max(self.max_recovery_time, recovery_time)
+        self.emit("recovered", old_state, recovery_time=recovery_time)
+
+
+    def handle_error_frame(self, msg):
+        """
+        Decodes one error frame and updates the counters and state. Called by CanBusHub.route().
+
+        Parameters:
+            msg (can.Message): A received message with is_error_frame set.
+        """
+        self.error_frames += 1
+        self.last_error_time = msg.timestamp
+        error_class = msg.arbitration_id
+        for bit, name in self.ERROR_CLASSES.items():
+            if error_class & bit:
+                self.error_counts[name] += 1
+        data = msg.data
+        if error_class & self.CAN_ERR_CNT and len(data) >= 8:
+            self.tx_errors = data[6]
+            self.rx_errors = data[7]
+
+        if error_class & self.CAN_ERR_BUSOFF:
+            state = self.BUS_OFF
+        elif error_class & self.CAN_ERR_RESTARTED:
+            state = self.ERROR_ACTIVE
+        elif error_class & self.CAN_ERR_CRTL and len(data) >= 2:
+            status = data[1]
+            if status & (self.CAN_ERR_CRTL_RX_PASSIVE | self.CAN_ERR_CRTL_TX_PASSIVE):
+                state = self.ERROR_PASSIVE
+            elif status & (self.CAN_ERR_CRTL_RX_WARNING | self.CAN_ERR_CRTL_TX_WARNING):
+                state = self.ERROR_WARNING
+            elif status & self.CAN_ERR_CRTL_ACTIVE:
+                state = self.ERROR_ACTIVE
+            else:
+                return
+        else:
+            return
+        self.set_state(state, msg.timestamp)
+
+
+    async def wait_for_state(self, states, timeout=None):
+        """
+        Waits until the error state is one of states.
+
+        Parameters:
+            states  (str or tuple): The state or states to wait for.
+            timeout (float, optional): Max seconds to wait. Defaults to waiting forever.
+
+        Returns:
+            True if the state was reached before the timeout.
+        """
+        if isinstance(states, str):
+            states = (states,)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.state not in states:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            future = asyncio.get_running_loop().create_future()
+            self.state_waiters.append(future)
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return self.state in states
+        return True
+
+
+    async def recover(self):
+        """
+        Brings the interface back from bus-off within a bounded time (see the class description).
+
+        Returns:
+            True if the interface recovered.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_recovery_attempts):
+            if self.state != self.BUS_OFF:
+                return True
+            frames = self.hub.frames_decoded
+            if self.hub.canBusType == "socketcan":
+                if not await loop.run_in_executor(None, self.restart_controller) and self.restart_unavailable:
+                    break
+            if await self.wait_for_state(self.STATES[:3], self.recovery_timeout):
+                return True
+            if self.hub.frames_decoded != frames:
+                # Frames are arriving again, but the driver sent no restarted error frame
+                self.set_state(self.ERROR_ACTIVE)
+                return True
+
+        if self.hub.canBusType == "socketcan":
+            print(f"CAN interface {self.hub.canBusID} is still bus-off after {self.max_recovery_attempts} restarts, taking it down and up...")
+            await loop.run_in_executor(None, self.reset_interface)
+            if self.hub.is_link_up():
+                self.set_state(self.ERROR_ACTIVE)
+                return True
+        self.emit("recovery_failed", self.state, attempts=self.max_recovery_attempts)
+        return False
+
+
+    def restart_controller(self):
+        """
+        Restarts the CAN controller after bus-off with `ip link set <interface> type can restart`.
+
+        Returns:
+            True if the restart was accepted. The kernel refuses it if the interface isn't bus-off or restarts by itself.
+            If sudo needs a password or the command can't be run, restart_unavailable is set too.
+        """
+        restart_command = ["sudo", "-n", "ip", "link", "set", self.hub.canBusID, "type", "can", "restart"]
+        try:
+            subprocess.run(restart_command, check=True, stderr=subprocess.PIPE, text=True, timeout=self.recovery_timeout * 10)
+            self.restart_unavailable = False
+            return True
+        except subprocess.CalledProcessError as e:
+            # Refused by the kernel (RTNETLINK answers ...), or by sudo itself (sudo: a password is required)
+            self.restart_unavailable = (e.stderr or "").startswith("sudo:")
+            return False
+        except (subprocess.TimeoutExpired, OSError):
+            self.restart_unavailable = True
+            return False
+
+
+    def reset_interface(self):
+        # Last resort: takes the link down and sets it up again (see CanBusHub.setup_interface).
+        reset_command = ["sudo", "-n", "/sbin/ip", "link", "set", self.hub.canBusID, "down"]
+        try:
+            subprocess.run(reset_command, check=True, stderr=subprocess.PIPE, text=True)
+            self.hub.wait_for_link(up=False)
+            self.hub.setup_interface()
+        except Exception as e:
+            print(f"Error resetting CAN interface {self.hub.canBusID}: {e}")
+
+
+    def read_interface_state(self):
+        """
+        Reads the error state and error counters of the interface from the kernel with `ip -details -statistics -json link show`,
+        e.g. to learn the state before any error frame arrived. Updates state, tx_errors and rx_errors.
+
+        Returns:
+            The state, or None if it can't be read (e.g. "virtual" interfaces or no iproute2 JSON support).
+        """
+        try:
+            result = subprocess.run(["ip", "-details", "-statistics", "-json", "link", "show", self.hub.canBusID], check=True, capture_output=True, text=True, timeout=1.0)
+            info_data = json.loads(result.stdout)[0]['linkinfo']['info_data']
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError, LookupError, TypeError):
+            return None
+        counters = info_data.get('berr_counter') or {}
+        self.tx_errors = counters.get('tx', self.tx_errors)
+        self.rx_errors = counters.get('rx', self.rx_errors)
+        state = str(info_data.get('state', '')).lower()
+        if state in self.STATES:
+            self.set_state(state)
+            return state
+        return None
+
+
+    def stats(self):
+        """
+        Returns the error state and counters.
+
+        Returns:
+            dict with the state, tx_errors, rx_errors, error_frames, error_counts (by class), bus_off_count, recoveries,
+            last_recovery_time, max_recovery_time, last_error_time and whether a recovery is running.
+        """
+        return {
+            'state': self.state,
+            'tx_errors': self.tx_errors,
+            'rx_errors': self.rx_errors,
+            'error_frames': self.error_frames,
+            'error_counts': dict(self.error_counts),
+            'bus_off_count': self.bus_off_count,
+            'recoveries': self.recoveries,
+            'last_recovery_time': self.last_recovery_time,
+            'max_recovery_time': self.max_recovery_time,
+            'last_error_time': self.last_error_time,
+            'recovering': self.recovery is not None and not self.recovery.done(),
+        }
@@ -0,0 +1,741 @@
+from .busmonitor import BusMonitor
+from .busstate import BusStateMonitor
+from .framerecorder import FrameRecorder
+from .odrivedatabase import OdriveDatabaseWriter
+import asyncio
+import can
+import subprocess
+import threading
+import time
+
+
+
+
+class CanBusHub:
+    """
+    A shared CAN Bus hub that owns a single python-can Bus (socket) per CAN interface and routes every received
+    frame to the ODriveCAN node it belongs to.
+
+    Every frame on the wire is read once by the hub and handed to the matching node through a dictionary
+    keyed on the arbitration ID, so the per-frame cost stays the same no matter how many nodes are attached.
+
+    Attributes:
+        canBusID      (str): The CAN Bus ID, which should be "can0" by default.
+        canBusType    (str): The CAN communication type as defined by the python-can package. By default, "socketcan" is used.
+        canBitRate    (int): The CAN Bit Rate or Bus Speed, by Default O-Drive GUI has this set to 250000 bits/s
+        canBus        (can.BusABC): The one python-can Bus object shared by every node attached to this hub.
+        nodes         (dict): Attached ODriveCAN objects keyed by their nodeID.
+        routes        (dict): Attached ODriveCAN objects keyed by every arbitration ID they can receive.
+        subscriptions (dict): The command IDs each attached node receives keyed by nodeID, None for all of them.
+        kernel_filters (bool): Whether the bus only lets the subscribed frames through (see update_filters). Defaults to True.
+        setup_done    (bool): Whether the interface was verified up or set up by setup_interface. Always False for non SocketCAN interfaces.
+        frames_received (int): The number of frames received on this interface.
+        frames_decoded (int): The number of frames routed to an attached node and decoded.
+        frames_dropped (int): The number of frames the receive thread dropped because the event loop fell more than
+                              MAX_PENDING_FRAMES behind. Always 0 without a receive thread.
+        last_frame_time (float): The receive timestamp of the last frame, 0.0 if none was received.
+        receive_thread (bool): Receive on a dedicated OS thread (see read_loop). Defaults to False. Can be changed
+                               while the read loop isn't running.
+        recorder      (FrameRecorder, optional): Records every received frame while recording is on. Defaults to None.
+        bus_state     (BusStateMonitor): The error state of the interface from its error frames, with bus-off recovery.
+        monitor       (BusMonitor, optional): Tracks stream gaps, jitter and bus load while monitoring is on (see enable_monitor). Defaults to None.
+
+    Example:
+        >>> hub = CanBusHub.get_hub("can0")
+        >>> odrive1 = ODriveCAN(0, hub=hub)
+        >>> odrive2 = ODriveCAN(1, hub=hub)
+    """
+    # Class variable holding one hub per CAN interface
+    hubs = {}
+
+    # O-Drive CAN Simple uses an 11 bit ID made from a 6 bit node ID and a 5 bit command ID (nodeID << 5 | cmd).
+    COMMAND_ID_BITS = 5
+    COMMAND_ID_COUNT = 1 << COMMAND_ID_BITS
+    # Mask of the node ID bits of a standard 11 bit arbitration ID.
+    NODE_ID_MASK = 0x7FF & ~(COMMAND_ID_COUNT - 1)
+
+    # Max seconds a thread based Notifier reader blocks in recv() before checking if it was stopped.
+    NOTIFIER_TIMEOUT = 0.1
+
+    # The receive thread hands at most this many frames to the event loop per batch.
+    MAX_BATCH_FRAMES = 256
+    # Frames the receive thread keeps while the event loop is busy. Older frames are dropped beyond this.
+    MAX_PENDING_FRAMES = 10000
+
+    def __init__(self, canBusID="can0", canBusType="socketcan", canBitRate=250000, kernel_filters=True, setup=True, receive_thread=False):
+        self.canBusID = canBusID
+        self.canBusType = canBusType
+        self.canBitRate = canBitRate
+        self.kernel_filters = kernel_filters
+        self.receive_thread = receive_thread
+        self.nodes = {}
+        self.routes = {}
+        self.subscriptions = {}
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.last_frame_time = 0.0
+        #Hand off from the receive thread to the event loop (see receive_loop)
+        self.receiving = False
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.delivery_scheduled = False
+        self.receive_error = None
+        self.batches = 0
+        self.max_batch = 0
+        #Make sure the interface is up before opening it. Only SocketCAN interfaces are set up, other interfaces
+        #(e.g. "virtual" used by ODriveSimulator) need no setup.
+        self.setup_done = False
+        if setup and canBusType == "socketcan":
+            self.setup_interface()
+        #Nothing is attached yet, so the bus starts out receiving no frames at all.
+        self.canBus = can.interface.Bus(canBusID, interface=canBusType, can_filters=self.build_filters() if kernel_filters else None)
+        self.reader = None
+        self.stopped = None
+        self.notifier = None
+        self.thread = None
+        self.recorder = None
+        self.monitor = None
+        self.monitor_counters = None
+        self.bus_state = BusStateMonitor(self)
+
+
+#----------------------------- CAN Interface Setup for Raspberry Pi START -----------------------------------------
+    def link_state(self):
+        """
+        Reads the operational state of the CAN interface from sysfs, without opening it or waiting for traffic.
+
+        Returns:
+            str: The operstate of the interface, e.g. "up", "down" or "unknown" (reported by vcan interfaces while up),
+            or None if the interface doesn't exist (or isn't a network interface, e.g. "virtual").
+
+        Example:
+            >>> hub.link_state()
+            ...
+            ... 'up'
+        """
+        try:
+            with open(f"/sys/class/net/{self.canBusID}/operstate") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+
+    def is_link_up(self):
+        """
+        Returns True if the CAN interface exists and is up.
+        """
+        return self.link_state() in ("up", "unknown")
+
+
+    def wait_for_link(self, up=True, timeout=2.0):
+        """
+        Polls the link state until the CAN interface is up (or down), for at most timeout seconds.
+
+        Returns:
+            bool: True if the interface reached the state in time.
+        """
+        deadline = time.monotonic() + timeout
+        while self.is_link_up() != up:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+    def setup_interface(self):
+        """
+        Attempts to set up the CAN interface only if it's not already operational and will reset and restart if necessary.
+
+        This method first checks if the CAN interface is up by reading its link state from sysfs (see link_state).
+        If it is, the method exits without making changes.
+        If the interface is already in use or encounters an error, the method attempts to reset and restart the interface before trying the setup again. 
+        After a successful setup, it verifies the interface came up by polling its link state.
+
+        The method executes several commands to configure the CAN interface:
+        
+        1. Setup Command:
+            - `sudo ip link set can0 up type can bitrate 250000`: This command configures the CAN interface `can0` with a specified bitrate (250000 bits per second in this example). 
+            It sets the interface type to CAN and brings it up, making it ready for communication.
+        
+        2. Reset Command:
+            - `sudo /sbin/ip link set can0 down`: This command brings the CAN interface `can0` down, effectively resetting its configuration. 
+            This is useful for clearing any existing state before attempting to reconfigure the interface.
+        
+        3. Restart Command:
+            - `sudo ip link set can0 type can restart-ms 100`: After resetting, this command sets the interface to automatically restart in case of errors, with a restart delay specified by `restart-ms` (100 milliseconds in this case). 
+            This helps in recovering from transient errors without manual intervention.
+        
+        If the initial setup attempt detects the interface as "busy," indicating it's already in use or cannot be configured as requested, the method performs a reset followed by a restart command before attempting the setup again. 
+        This ensures that any lingering issues are cleared and the interface is correctly configured for CAN communication.
+
+        After successfully configuring the interface, the method verifies the setup by polling the link state until the interface is up,
+        rather than sleeping a fixed time.
+
+        Raises:
+            Exception: If the setup process fails after retrying, including after a reset and restart attempt.
+        """
+        
+
+        # Commands for setting up, resetting, and restarting the CAN interface
+        setup_command = ["sudo", "ip", "link", "set", self.canBusID, "up", "type", "can", "bitrate", str(self.canBitRate)]
+        reset_command = ["sudo", "/sbin/ip", "link", "set", self.canBusID, "down"]
+        restart_command = ["sudo", "ip", "link", "set", self.canBusID, "type", "can", "restart-ms", "100"]
+
+        try:
+            # First, check if the CAN interface is already up.
+            if self.is_link_up():
+                print(f"CAN interface {self.canBusID} is already operational. Skipping setup.")
+                self.setup_done = True
+                return  # Exit the method early if CAN interface is operational.
+            # Attempt to set up the CAN interface
+            subprocess.run(setup_command, check=True, stderr=subprocess.PIPE, text=True)
+            if not self.wait_for_link(up=True):
+                print(f"CAN interface {self.canBusID} was set up but its link is {self.link_state()}.")
+            print("CAN interface setup successfully.")
+            self.setup_done = True
+        except subprocess.CalledProcessError as e:
+            if "Device or resource busy" in e.stderr:
+                print("Device or resource busy, attempting to reset and restart...")
+                # Reset and restart the CAN interface
+                subprocess.run(reset_command, check=True)
+                self.wait_for_link(up=False)
+                subprocess.run(restart_command, check=True)
+                print("CAN interface restart attempted. Retrying setup...")
+                # Retry the setup command
+                subprocess.run(setup_command, check=True)
+                # Verify the link came up again
+                if self.wait_for_link(up=True):
+                    self.setup_done = True  # Only set after successful verification
+                    print("CAN setup verified successfully after reset and restart.")
+                else:
+                    raise Exception("Failed to verify CAN setup after reset and restart.")
+            else:
+                print(f"Error setting up CAN interface: {e.stderr}")
+                raise
+
+
+#----------------------------- CAN Interface Setup for Raspberry Pi END -----------------------------------------
+
+
+    def health(self):
+        """
+        Returns the health of this interface.
+
+        Returns:
+            dict with the interface name and type, the sysfs link state (None for interfaces without one, e.g. "virtual"),
+            whether setup is done, whether the read loop is running, the attached node IDs, the frames received,
+            decoded and dropped by the receive thread, the receive timestamp of the last frame, the receive thread
+            batch counts, the error that stopped the receive thread (None if it didn't fail), the frames the kernel dropped (rx_dropped, None for interfaces without one), and the error
+            state, error frames and bus-off count (see BusStateMonitor).
+
+        Example:
+            >>> hub.health()
+            ...
+            ... {'interface': 'can0', 'type': 'socketcan', 'link_state': 'up', 'setup_done': True, 'reading': True, 'nodes': [0, 1], 'frames_received': 5120, 'frames_decoded': 5120, 'frames_dropped': 0, ...}
+        """
+        return {
+            'interface': self.canBusID,
+            'type': self.canBusType,
+            'link_state': self.link_state() if self.canBusType == "socketcan" else None,
+            'setup_done': self.setup_done,
+            'reading': self.reader is not None and not self.reader.done(),
+            'nodes': sorted(self.nodes),
+            'frames_received': self.frames_received,
+            'frames_decoded': self.frames_decoded,
+            'frames_dropped': self.frames_dropped,
+            'last_frame_time': self.last_frame_time,
+            'receive_thread': self.receive_thread,
+            'batches': self.batches,
+            'max_batch': self.max_batch,
+            'receive_error': repr(self.receive_error) if self.receive_error is not None else None,
+            'rx_dropped': self.interface_statistic('rx_dropped'),
+            'bus_state': self.bus_state.state,
+            'error_frames': self.bus_state.error_frames,
+            'bus_off_count': self.bus_state.bus_off_count,
+        }
+
+
+    def interface_statistic(self, name):
+        """
+        Reads one of the kernel's statistics of the interface from sysfs (e.g. "rx_dropped", "rx_errors"),
+        or returns None if the interface has none (e.g. "virtual").
+        """
+        try:
+            with open(f"/sys/class/net/{self.canBusID}/statistics/{name}") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+
+    @classmethod
+    def get_hub(cls, canBusID="can0", canBusType="socketcan", canBitRate=250000, kernel_filters=True, setup=True, receive_thread=False):
+        """
+        Returns the hub for a CAN interface, creating it (and opening its one Bus) the first time it is requested.
+
+        Parameters:
+            canBusID   (str): The name of the CAN interface. Defaults to "can0".
+            canBusType (str): The python-can interface type. Defaults to "socketcan".
+            canBitRate (int): The CAN Bit Rate of the interface. Defaults to 250000.
+            kernel_filters (bool): Only let the frames of the attached nodes through. Defaults to True.
+                                   Only used when the hub is created.
+            setup      (bool): Set the interface up if it isn't (SocketCAN only, see setup_interface). Defaults to True.
+                               Only used when the hub is created.
+            receive_thread (bool): Receive on a dedicated OS thread (see read_loop). Defaults to False.
+                                   Only used when the hub is created.
+
+        Example:
+            >>> hub = CanBusHub.get_hub("can0")
+        """
+        hub = cls.hubs.get(canBusID)
+        if hub is None:
+            hub = cls(canBusID, canBusType, canBitRate, kernel_filters, setup, receive_thread)
+            cls.hubs[canBusID] = hub
+        return hub
+
+
+    def attach(self, node, command_ids=None):
+        """
+        Attaches an ODriveCAN node to the hub so the frames with its node ID are routed to it.
+
+        Parameters:
+            node        (ODriveCAN): The node to attach.
+            command_ids (iterable of int, optional): Only receive these command IDs (e.g. 0x01, 0x09) from the node.
+                                                     Defaults to all command IDs.
+        """
+        existing = self.nodes.get(node.nodeID)
+        if existing is not None and existing is not node:
+            raise ValueError(f"Node ID {node.nodeID} is already attached to CAN interface {self.canBusID}.")
+        self.nodes[node.nodeID] = node
+        self.subscribe(node, command_ids)
+
+
+    def subscribe(self, node, command_ids=None):
+        """
+        Changes which command IDs an attached node receives, and updates the routes and the bus filters to match.
+
+        Parameters:
+            node        (ODriveCAN): An attached node.
+            command_ids (iterable of int, optional): The command IDs to receive. Defaults to all command IDs.
+
+        Example:
+            >>> odrive.hub.subscribe(odrive, [0x01, 0x03, 0x09])  # Only heartbeat, errors and encoder estimates
+        """
+        if command_ids is not None:
+            command_ids = frozenset(command_ids)
+            for cmd in command_ids:
+                if not 0 <= cmd < self.COMMAND_ID_COUNT:
+                    raise ValueError(f"Command ID {cmd:#x} is out of range, it must be below {self.COMMAND_ID_COUNT:#x}.")
+        self.remove_routes(node)
+        self.subscriptions[node.nodeID] = command_ids
+        base_id = node.nodeID << self.COMMAND_ID_BITS
+        for cmd in range(self.COMMAND_ID_COUNT) if command_ids is None else command_ids:
+            self.routes[base_id | cmd] = node
+        self.update_filters()
+
+
+    def remove_routes(self, node):
+        base_id = node.nodeID << self.COMMAND_ID_BITS
+        for cmd in range(self.COMMAND_ID_COUNT):
+            self.routes.pop(base_id | cmd, None)
+
+
+    def detach(self, node):
+        """
+        Detaches an ODriveCAN node from the hub. When the last node detaches the CAN bus is shut down.
+
+        Parameters:
+            node (ODriveCAN): The node to detach.
+        """
+        if self.nodes.get(node.nodeID) is not node:
+            return
+        del self.nodes[node.nodeID]
+        del self.subscriptions[node.nodeID]
+        self.remove_routes(node)
+        if not self.nodes:
+            self.shutdown()
+        else:
+            self.update_filters()
+
+
+    def build_filters(self):
+        """
+        Returns the python-can filters that let only the frames of the subscribed nodes and command IDs through.
+
+        A node receiving every command ID needs one filter on its node ID bits (mask 0x7E0), a node subscribed to a
+        subset of command IDs needs one exact filter per command ID. With no node attached a filter that matches
+        no standard frame is returned, since an empty filter list would let every frame through.
+        """
+        filters = []
+        for nodeID, command_ids in self.subscriptions.items():
+            base_id = nodeID << self.COMMAND_ID_BITS
+            if command_ids is None:
+                filters.append({"can_id": base_id, "can_mask": self.NODE_ID_MASK, "extended": False})
+            else:
+                filters.extend({"can_id": base_id | cmd, "can_mask": 0x7FF, "extended": False} for cmd in sorted(command_ids))
+        if not filters:
+            filters.append({"can_id": 0, "can_mask": 0x7FF, "extended": True})
+        return filters
+
+
+    def update_filters(self):
+        """
+        Applies the filters of the attached nodes to the bus. On SocketCAN they are applied by the kernel, so frames of
+        other nodes and devices are dropped before they wake the process. Other interfaces filter in python-can.
+
+        Filtering is off while kernel_filters is False or while recording, since the recording keeps every frame.
+        """
+        if self.kernel_filters and self.recorder is None:
+            self.canBus.set_filters(self.build_filters())
+        else:
+            self.canBus.set_filters(None)
+
+
+    def dispatch(self, msg):
+        """
+        Routes one received CAN message to the node it belongs to. Messages for unknown node IDs are dropped.
+
+        Parameters:
+            msg (can.Message): The received CAN message.
+        """
+        self.frames_received += 1
+        self.last_frame_time = msg.timestamp
+        self.route(msg)
+
+
+    def route(self, msg):
+        # Records and monitors the message if enabled, and hands it to the decoder of its node.
+        # Error frames carry an error class instead of a node's arbitration ID, so they go to the bus state only.
+        if self.recorder is not None:
+            self.recorder.record(msg)
+        if msg.is_error_frame:
+            self.bus_state.handle_error_frame(msg)
+            return
+        if self.monitor is not None:
+            self.monitor.observe(msg)
+        node = self.routes.get(msg.arbitration_id)
+        if node is not None:
+            node.process_can_message(msg)
+            self.frames_decoded += 1
+
+
+    def start_recording(self, path):
+        """
+        Starts recording every frame received on this interface, including frames of nodes that are not attached.
+
+        Frames are appended to a fixed-width binary file which can be read with pyodrivecan.load_frames().
+        Unlike save_data, which samples the latest values, this keeps every frame at the full cyclic rate.
+
+        Parameters:
+            path (str): Path of the recording file.
+
+        Example:
+            >>> odrive.hub.start_recording('trial_1.frames')
+        """
+        self.stop_recording()
+        self.recorder = FrameRecorder(path)
+        self.update_filters()
+
+
+    def stop_recording(self):
+        """
+        Stops recording frames and closes the recording file.
+
+        Returns:
+            The number of frames recorded, or 0 if nothing was being recorded.
+        """
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return 0
+        recorder.close()
+        if self.nodes:
+            self.update_filters()
+        return recorder.frames_recorded
+
+
+#------------------------------------------- Bus Monitor START -------------------------------------------------
+    def enable_monitor(self, window=1.0, expected_rates=None):
+        """
+        Starts tracking the inter-arrival period, jitter and missed frames of every (node ID, command ID) stream and the
+        bus load of this interface (see BusMonitor). Monitoring costs one dictionary lookup and a few additions per frame.
+
+        Parameters:
+            window         (float): The bus load window in seconds. Defaults to 1.0.
+            expected_rates (dict, optional): Expected rates in Hz keyed by command ID (e.g. {0x09: 100}). Streams of other
+                                             command IDs learn their period from the frames. Defaults to None.
+
+        Returns:
+            The BusMonitor.
+
+        Example:
+            >>> odrive.hub.enable_monitor(expected_rates={0x09: 100, 0x01: 10})
+            >>> odrive.hub.monitor_stats()
+        """
+        self.monitor = BusMonitor(self.canBitRate, window, expected_rates)
+        self.monitor_counters = self.read_monitor_counters()
+        return self.monitor
+
+
+    def disable_monitor(self):
+        """
+        Stops monitoring and returns the final statistics (see monitor_stats), or None if monitoring was off.
+        """
+        if self.monitor is None:
+            return None
+        stats = self.monitor_stats()
+        self.monitor = None
+        self.monitor_counters = None
+        return stats
+
+
+    def read_monitor_counters(self):
+        # Packets and data bytes the kernel received and sent on the interface, or None without sysfs statistics.
+        counters = [self.interface_statistic(name) for name in ('rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes')]
+        if None in counters:
+            return None
+        return (time.monotonic(), counters[0] + counters[1], counters[2] + counters[3])
+
+
+    def monitor_stats(self):
+        """
+        Returns the bus monitor statistics of this interface.
+
+        interface_load is the load of the whole bus estimated from the kernel's packet and byte counters since the last
+        call, which include the frames the kernel filters keep out of the read loop and the frames sent by this
+        computer. It is None for interfaces without counters (e.g. "virtual").
+
+        Returns:
+            dict with the interface name, the bit rate, the frames observed, the bus_load of the last window and the
+            max_bus_load in percent, the interface_load in percent, the total missed frames and a list with the stats
+            of every stream (see BusMonitor.stream_stats), or None if monitoring is off.
+
+        Example:
+            >>> odrive.hub.monitor_stats()
+            ...
+            ... {'interface': 'can0', 'bit_rate': 250000, 'frames': 1200, 'bus_load': 31.6, 'max_bus_load': 32.0, 'interface_load': 33.1, 'missed': 0, 'streams': [{'node_ID': 0, 'cmd_id': 9, 'frames': 1000, 'rate': 100.0, ...}, ...]}
+        """
+        monitor = self.monitor
+        if monitor is None:
+            return None
+        interface_load = None
+        counters = self.read_monitor_counters()
+        if counters is not None and self.monitor_counters is not None:
+            elapsed = counters[0] - self.monitor_counters[0]
+            if elapsed > 0:
+                interface_load = monitor.counter_load(counters[1] - self.monitor_counters[1], counters[2] - self.monitor_counters[2], elapsed)
+            self.monitor_counters = counters
+        streams = monitor.stream_stats()
+        return {
+            'interface': self.canBusID,
+            'bit_rate': self.canBitRate,
+            'frames': monitor.frames,
+            'bus_load': monitor.bus_load,
+            'max_bus_load': monitor.max_bus_load,
+            'interface_load': interface_load,
+            'missed': sum(stream['missed'] for stream in streams),
+            'streams': streams,
+        }
+
+
+    async def log_monitor(self, database_path, interval=1.0, trial_id=None):
+        """
+        Writes the monitor statistics to the BusStats table of a database every interval seconds while a node is running:
+        one row for the interface (node_ID and cmd_id NULL) and one per stream. Enables monitoring if it is off.
+        The rows go through the database's OdriveDatabaseWriter (the same one save_data uses), so SQLite never runs
+        on the event loop thread and no extra connection is opened.
+
+        Parameters:
+            database_path (str): Path to the SQLite database file.
+            interval      (float): Seconds between rows. Defaults to 1.0.
+            trial_id      (int, optional): The trial the rows belong to. Defaults to the trial of the nodes logging
+                                           through the same writer, if any.
+
+        Example:
+            >>> await asyncio.gather(odrive.recv_all(), odrive.save_data(), odrive.hub.log_monitor('odrive_data.db'))
+        """
+        if self.monitor is None:
+            self.enable_monitor()
+        writer = OdriveDatabaseWriter.get_writer(database_path)
+        try:
+            while self.is_running() and self.monitor is not None:
+                await asyncio.sleep(interval)
+                stats = self.monitor_stats()
+                if stats is None:
+                    break
+                now = time.time()
+                trial = trial_id if trial_id is not None else writer.trial_id
+                rows = [(trial, now, self.canBusID, None, None, stats['frames'], None, None, None, None, stats['missed'], stats['bus_load'], stats['interface_load'])]
+                rows.extend((trial, now, self.canBusID, stream['node_ID'], stream['cmd_id'], stream['frames'], stream['rate'], stream['period'], stream['jitter'], stream['max_interval'], stream['missed'], None, None) for stream in stats['streams'])
+                writer.put_bus_stats(rows)
+        finally:
+            # The last user of the writer waits for its thread to finish writing, so release it off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, writer.release)
+
+
+#------------------------------------------- Bus Monitor END ---------------------------------------------------
+
+
+    def is_running(self):
+        """
+        Returns True while at least one attached node still has its running flag set.
+        """
+        return any(node.running for node in self.nodes.values())
+
+
+    @staticmethod
+    def resolve_stopped(stopped):
+        if not stopped.done():
+            stopped.set_result(None)
+
+
+    def update_running(self):
+        """
+        Called by the nodes when their running flag changes. Wakes the read loop once no attached node is running.
+        """
+        if self.stopped is not None and not self.stopped.done() and not self.is_running():
+            self.stopped.set_result(None)
+
+
+    #This is aysnc receiving the messages from the can bus once for all nodes and routing them to each node.
+    #python-can's Notifier registers the socket file descriptor with the event loop, so the loop only wakes when a frame arrives.
+    #(Interfaces without a file descriptor, like "virtual", fall back to a blocking reader thread that hands frames to the loop.)
+    #With receive_thread set, a dedicated OS thread drains the bus instead (see receive_loop), so frames keep being read
+    #out of the socket while a controller coroutine holds up the event loop.
+    async def read_loop(self):
+        loop = asyncio.get_running_loop()
+        self.stopped = loop.create_future()
+        if self.receive_thread:
+            self.start_receive_thread(loop)
+        else:
+            self.notifier = can.Notifier(self.canBus, [self.dispatch], timeout=self.NOTIFIER_TIMEOUT, loop=loop)
+        try:
+            self.update_running()
+            await self.stopped
+        finally:
+            self.stop_reader()
+
+
+    def start_receive_thread(self, loop):
+        self.receiving = True
+        self.thread = threading.Thread(target=self.receive_loop, args=(loop,), name=f"CanBusHub receive {self.canBusID}", daemon=True)
+        self.thread.start()
+        return self.thread
+
+
+    def stop_reader(self):
+        # Stops the Notifier or receive thread reading the bus, so nothing reads it any more once this returns.
+        notifier, self.notifier = self.notifier, None
+        if notifier is not None:
+            notifier.stop()
+        thread, self.thread = self.thread, None
+        self.receiving = False
+        if thread is not None:
+            if thread is not threading.current_thread():
+                thread.join(2 * self.NOTIFIER_TIMEOUT)
+            self.deliver()  # Decode the frames the thread received before it stopped
+
+
+    #This runs on the receive thread. It blocks in recv() until a frame arrives, drains whatever else is waiting in
+    #the socket into one batch and hands the batch to the event loop, with at most one call_soon_threadsafe per batch.
+    #Frames are decoded on the event loop thread, so the telemetry of a node is only ever written by one thread and
+    #snapshots stay consistent. While the event loop is busy, batches pile up in pending (up to MAX_PENDING_FRAMES)
+    #and are decoded together once it gets to them.
+    #A receive error ends the thread and is raised from the read loop (and recv_all), like python-can's Notifier
+    #hands errors to the event loop.
+    def receive_loop(self, loop):
+        recv = self.canBus.recv
+        while self.receiving:
+            try:
+                msg = recv(self.NOTIFIER_TIMEOUT)
+                if msg is None:
+                    continue
+                batch = [msg]
+                while len(batch) < self.MAX_BATCH_FRAMES:
+                    msg = recv(0)
+                    if msg is None:
+                        break
+                    batch.append(msg)
+            except Exception as e:
+                if self.receiving:
+                    self.receiving = False
+                    try:
+                        loop.call_soon_threadsafe(self.receive_failed, e)
+                    except RuntimeError:
+                        pass  # The event loop was closed
+                return
+            self.frames_received += len(batch)
+            self.last_frame_time = batch[-1].timestamp
+            with self.pending_lock:
+                self.pending.extend(batch)
+                overflow = len(self.pending) - self.MAX_PENDING_FRAMES
+                if overflow > 0:
+                    # The event loop fell too far behind, keep the newest frames
+                    del self.pending[:overflow]
+                    self.frames_dropped += overflow
+                schedule = not self.delivery_scheduled
+                self.delivery_scheduled = True
+            if schedule:
+                try:
+                    loop.call_soon_threadsafe(self.deliver)
+                except RuntimeError:
+                    return  # The event loop was closed
+
+
+    def receive_failed(self, error):
+        # Runs on the event loop thread: ends the read loop with the error the receive thread stopped on.
+        self.receive_error = error
+        if self.stopped is not None and not self.stopped.done():
+            self.stopped.set_exception(error)
+
+
+    def deliver(self):
+        # Runs on the event loop thread: decodes every frame the receive thread handed over since the last delivery.
+        with self.pending_lock:
+            batch, self.pending = self.pending, []
+            self.delivery_scheduled = False
+        if batch:
+            self.batches += 1
+            if len(batch) > self.max_batch:
+                self.max_batch = len(batch)
+            route = self.route
+            for msg in batch:
+                route(msg)
+
+
+    def start(self):
+        """
+        Starts the read loop in the running event loop if it is not running yet, and returns its task.
+        """
+        if self.reader is None or self.reader.done():
+            self.reader = asyncio.ensure_future(self.read_loop())
+        return self.reader
+
+
+    async def recv_all(self):
+        """
+        Asynchronously receives all messages from the CAN bus and routes them to the attached nodes.
+
+        Every attached node calls this from its own `recv_all`, but only one read loop is started per hub.
+        The other callers wait on the same read loop, which stops once no attached node is running.
+        The read loop is event driven and does not use any CPU while the bus is idle.
+        """
+        await asyncio.shield(self.start())
+
+
+    def shutdown(self):
+        """
+        Stops the read loop's Notifier or receive thread, shuts down the shared CAN bus and removes this hub from
+        the registry.
+        """
+        self.stop_recording()
+        # Stop reading before closing the socket, and end the read loop if it is still waiting
+        self.stop_reader()
+        stopped = self.stopped
+        if stopped is not None and not stopped.done():
+            try:
+                stopped.get_loop().call_soon_threadsafe(self.resolve_stopped, stopped)
+            except RuntimeError:
+                pass  # The event loop was closed
+        self.canBus.shutdown()
+        if CanBusHub.hubs.get(self.canBusID) is self:
+            del CanBusHub.hubs[self.canBusID]
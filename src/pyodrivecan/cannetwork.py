@@ -0,0 +1,146 @@
+from .canbushub import CanBusHub
+from .pyodrivecan import ODriveCAN
+import asyncio
+
+
+
+
+class CanNetwork:
+    """
+    Manages the O-Drives on several CAN interfaces (e.g. two CAN HATs, can0 and can1) in one process.
+
+    Each interface has its own CanBusHub with its own setup, bus filters, health state and read loop, so adding an
+    interface adds a reader instead of making one reader poll more buses. The read loops all deliver to the same asyncio
+    event loop. With receive_thread=True every interface is drained by its own OS thread (see CanBusHub.read_loop). Nodes are addressed by (interface, nodeID), so the same node ID can be used on each interface.
+
+    Attributes:
+        hubs   (dict): The CanBusHub of every interface, keyed by interface name.
+        nodes  (dict): The ODriveCAN objects keyed by (interface, nodeID).
+
+    Example:
+        >>> network = CanNetwork({"can0": 250000, "can1": 500000})
+        >>> network.add_node("can0", 0)
+        >>> network.add_node("can1", 0)
+        >>> network["can1", 0].set_torque(0.1)
+        >>> await asyncio.gather(network.recv_all(), controller(network))
+        >>> network.health()
+        >>> network.shutdown()
+    """
+    def __init__(self, interfaces=(), canBusType="socketcan", kernel_filters=True, receive_thread=False):
+        self.canBusType = canBusType
+        self.kernel_filters = kernel_filters
+        self.receive_thread = receive_thread
+        self.hubs = {}
+        self.nodes = {}
+        # A list of interface names uses the O-Drive default bit rate.
+        if not isinstance(interfaces, dict):
+            interfaces = {canBusID: 250000 for canBusID in interfaces}
+        for canBusID, canBitRate in interfaces.items():
+            self.add_interface(canBusID, canBitRate)
+
+
+    def add_interface(self, canBusID, canBitRate=250000, canBusType=None):
+        """
+        Sets up and opens a CAN interface (once), and returns its hub.
+
+        Parameters:
+            canBusID   (str): The name of the CAN interface, e.g. "can1".
+            canBitRate (int): The CAN Bit Rate of the interface. Defaults to 250000.
+            canBusType (str, optional): The python-can interface type. Defaults to the network's canBusType.
+
+        Raises:
+            ValueError: If the interface is already open at another bit rate.
+        """
+        # The registry returns the open hub of the interface, or opens a new one if it was shut down.
+        hub = CanBusHub.get_hub(canBusID, canBusType or self.canBusType, canBitRate, self.kernel_filters, receive_thread=self.receive_thread)
+        if hub.canBitRate != canBitRate:
+            raise ValueError(f"CAN interface {canBusID} is already open at {hub.canBitRate} bit/s, not {canBitRate} bit/s.")
+        self.hubs[canBusID] = hub
+        return hub
+
+
+    def add_node(self, canBusID, nodeID, **kwargs):
+        """
+        Creates an ODriveCAN node on one of the interfaces.
+
+        Parameters:
+            canBusID (str): The interface the O-Drive is connected to. It is added if it isn't yet.
+            nodeID   (int): The node ID of the O-Drive on that interface.
+            kwargs:  Passed on to ODriveCAN (e.g. database, command_ids).
+
+        Returns:
+            The ODriveCAN object, also available as network[canBusID, nodeID].
+        """
+        hub = self.hubs.get(canBusID)
+        if hub is None:
+            hub = self.add_interface(canBusID)
+        elif CanBusHub.hubs.get(canBusID) is not hub:
+            # The interface was shut down, open it again with the same settings
+            hub = self.add_interface(canBusID, hub.canBitRate, hub.canBusType)
+        node = ODriveCAN(nodeID, canBusID=canBusID, canBusType=hub.canBusType, canBitRate=hub.canBitRate, hub=hub, **kwargs)
+        self.nodes[canBusID, nodeID] = node
+        return node
+
+
+    def __getitem__(self, address):
+        return self.nodes[address]
+
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+    def set_running(self, running):
+        """
+        Sets the running flag of every node, e.g. False to stop all read loops and data collection.
+        """
+        for node in self.nodes.values():
+            node.running = running
+
+
+    async def recv_all(self):
+        """
+        Runs the read loop of every interface until no node on it is running.
+        """
+        await asyncio.gather(*(hub.recv_all() for hub in self.hubs.values() if hub.nodes))
+
+
+    async def loop(self, *others):
+        """
+        Receives on every interface and saves the data of every node, while running any other coroutines passed in.
+
+        Example:
+            >>> await network.loop(controller(network))
+        """
+        await asyncio.gather(self.recv_all(), *(node.save_data() for node in self.nodes.values()), *others)
+
+
+    def health(self):
+        """
+        Returns the health of every interface (see CanBusHub.health), keyed by interface name.
+        """
+        return {canBusID: hub.health() for canBusID, hub in self.hubs.items()}
+
+
+    def monitor_stats(self):
+        """
+        Returns the bus monitor statistics of every interface with monitoring on (see CanBusHub.monitor_stats), keyed by interface name.
+        """
+        return {canBusID: hub.monitor_stats() for canBusID, hub in self.hubs.items() if hub.monitor is not None}
+
+
+    def shutdown(self):
+        """
+        Shuts down every node and interface.
+        """
+        for node in list(self.nodes.values()):
+            node.bus_shutdown()
+        self.nodes.clear()
+        for hub in self.hubs.values():
+            if not hub.nodes and CanBusHub.hubs.get(hub.canBusID) is hub:
+                hub.shutdown()
+        self.hubs.clear()
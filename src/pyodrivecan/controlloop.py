@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+
+
+
+class ControlLoop:
+    """
+    Runs a controller callback at a fixed rate against absolute monotonic deadlines, and keeps timing statistics.
+
+    Tick k is due at start + k * period, so sleeping late on one tick doesn't push the following ticks back and the
+    period doesn't drift. Each tick the callback gets a snapshot (see ODriveCAN.snapshot) of the telemetry of every O-Drive
+    taken at the start of the tick, so all values it reads belong to the same instant even if the callback awaits. The
+    snapshots are reused from tick to tick, so taking them allocates nothing; copy any values you want to keep.
+
+    Timing statistics:
+        - lateness:  How long after its deadline a tick started. Kept in a histogram with bin_width wide bins, plus the max.
+        - late_ticks: Ticks that started more than late_threshold after their deadline.
+        - overruns:  Ticks whose callback was still running at the next deadline. The missed deadlines are skipped
+                     (counted in skipped_ticks) instead of being run back to back.
+
+    Attributes:
+        callback        (callable): Called as callback(snapshot) every tick. Can be a coroutine function.
+        rate            (float): The loop rate in Hz.
+        odrives         (list of ODriveCAN): The O-Drives whose telemetry is passed to the callback.
+        late_threshold  (float): Seconds after its deadline a tick counts as late. Defaults to 10% of the period.
+        spin            (float): Seconds before each deadline to stop sleeping and yield to the event loop until the
+                                 deadline instead. asyncio sleeps are only accurate to about 1 ms, so a small spin
+                                 (e.g. 0.001) gives tighter timing at the cost of CPU. Defaults to 0 (no spinning).
+
+    Example:
+        >>> async def balance(snapshot):
+        ...     odrive1_telemetry, odrive2_telemetry = snapshot
+        ...     group.set_torques([-0.1 * odrive1_telemetry.velocity, -0.1 * odrive2_telemetry.velocity])
+        >>> control_loop = ControlLoop(balance, rate=1000, odrives=[odrive1, odrive2])
+        >>> await asyncio.gather(odrive1.loop(), odrive2.loop(), control_loop.run(duration=10))
+        >>> control_loop.stats()
+    """
+    def __init__(self, callback, rate, odrives=(), late_threshold=None, spin=0.0, bin_width=50e-6, bins=200):
+        self.callback = callback
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.odrives = list(odrives)
+        self.snapshots = [odrive.snapshot() for odrive in self.odrives]
+        self.late_threshold = self.period * 0.1 if late_threshold is None else late_threshold
+        self.spin = spin
+        self.bin_width = bin_width
+        self.running = False
+        self.reset_stats(bins)
+
+
+    def reset_stats(self, bins=None):
+        """
+        Clears the timing statistics.
+        """
+        if bins is not None:
+            self.histogram = [0] * (bins + 1)  # The last bin counts everything later than bins * bin_width
+        else:
+            self.histogram = [0] * len(self.histogram)
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.late_ticks = 0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+        self.max_callback_time = 0.0
+
+
+    def snapshot(self):
+        """
+        Returns the latest telemetry of every O-Drive as a list of TelemetrySnapshot, in the order of odrives.
+        The same snapshot objects are updated in place every call.
+        """
+        snapshots = self.snapshots
+        for index, odrive in enumerate(self.odrives):
+            odrive.telemetry.snapshot(snapshots[index])
+        return snapshots
+
+
+    def record_lateness(self, lateness):
+        self.ticks += 1
+        self.total_lateness += lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        if lateness > self.late_threshold:
+            self.late_ticks += 1
+        self.histogram[min(int(lateness / self.bin_width), len(self.histogram) - 1)] += 1
+
+
+    async def run(self, duration=None, ticks=None):
+        """
+        Runs the loop until stop() is called, duration seconds have passed or ticks ticks have run.
+
+        Parameters:
+            duration (float, optional): Seconds to run for.
+            ticks    (int, optional): Number of ticks to run.
+        """
+        clock = time.monotonic
+        start = clock()
+        end = None if duration is None else start + duration
+        tick = 0
+        self.running = True
+        while self.running and (ticks is None or tick < ticks):
+            deadline = start + tick * self.period
+            if end is not None and deadline >= end:
+                break
+
+            # Sleep until the deadline, then optionally yield to the event loop for the last spin seconds.
+            delay = deadline - clock() - self.spin
+            if delay > 0:
+                await asyncio.sleep(delay)
+            while clock() < deadline:
+                await asyncio.sleep(0)
+
+            started = clock()
+            self.record_lateness(started - deadline)
+            result = self.callback(self.snapshot())
+            if asyncio.iscoroutine(result):
+                await result
+
+            finished = clock()
+            self.max_callback_time = max(self.max_callback_time, finished - started)
+            tick += 1
+            next_deadline = start + tick * self.period
+            if finished > next_deadline:
+                # Overrun: skip the deadlines that already passed instead of running them back to back.
+                self.overruns += 1
+                missed = int((finished - next_deadline) / self.period) + 1
+                self.skipped_ticks += missed
+                tick += missed
+        self.running = False
+
+
+    def stop(self):
+        """
+        Stops the loop after the current tick.
+        """
+        self.running = False
+
+
+    def lateness_percentile(self, percentile):
+        """
+        Returns the lateness (seconds) below which the given percent of ticks started, to within one histogram bin.
+
+        Parameters:
+            percentile (float): e.g. 99 for the p99 lateness.
+        """
+        if self.ticks == 0:
+            return 0.0
+        target = self.ticks * percentile / 100.0
+        count = 0
+        for index, bin_count in enumerate(self.histogram):
+            count += bin_count
+            if count >= target:
+                # The last bin has no upper edge, so its ticks are only known to be at most the measured max.
+                if index == len(self.histogram) - 1:
+                    return self.max_lateness
+                # Upper edge of the bin, capped at the measured max.
+                return min((index + 1) * self.bin_width, self.max_lateness)
+        return self.max_lateness
+
+
+    def stats(self):
+        """
+        Returns the timing statistics of the loop.
+
+        Returns:
+            dict with the rate, ticks, overruns, skipped_ticks, late_ticks, the mean, p50, p99 and max lateness and
+            the max callback time in seconds, and the lateness histogram as a list of (bin start in seconds, count).
+        """
+        return {
+            'rate': self.rate,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'skipped_ticks': self.skipped_ticks,
+            'late_ticks': self.late_ticks,
+            'mean_lateness': self.total_lateness / self.ticks if self.ticks else 0.0,
+            'p50_lateness': self.lateness_percentile(50),
+            'p99_lateness': self.lateness_percentile(99),
+            'max_lateness': self.max_lateness,
+            'max_callback_time': self.max_callback_time,
+            'histogram': [(index * self.bin_width, count) for index, count in enumerate(self.histogram) if count],
+        }
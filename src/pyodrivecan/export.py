@@ -0,0 +1,289 @@
+import argparse
+import csv
+import os
+import sqlite3
+import urllib.request
+import zipfile
+
+from .odrivedatabase import OdriveDatabase
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+
+# NumPy type of every ODriveData column. node_ID is stored in a TEXT column, but always holds node IDs.
+ODRIVE_DATA_TYPES = {column: '<f8' for column in OdriveDatabase.ODRIVE_DATA_COLUMNS}
+ODRIVE_DATA_TYPES['trial_id'] = '<i8'
+ODRIVE_DATA_TYPES['node_ID'] = '<i8'
+
+EXPORT_FORMATS = ('csv', 'parquet', 'npz')
+
+# Name of the structured array in NPZ exports
+NPZ_ARRAY_NAME = 'odrive_data'
+
+# node_ID of rows logged without one, in exported arrays (NULL does not fit their integer node_ID field)
+MISSING_NODE_ID = -1
+
+
+
+
+def open_database(database):
+    # Returns (sqlite3 connection, True if it was opened here and has to be closed by the caller).
+    # A database file is opened read-only, so an export never writes to it: unlike OdriveDatabase it doesn't switch the
+    # journal to WAL, build the trial index or create the Trials table, and it works on a copy the user can't write.
+    if isinstance(database, OdriveDatabase):
+        return database.conn, False
+    if isinstance(database, sqlite3.Connection):
+        return database, False
+    if not os.path.exists(database):
+        raise FileNotFoundError(f"No database at {database}")
+    uri = f"file:{urllib.request.pathname2url(os.path.abspath(database))}?mode=ro"
+    return sqlite3.connect(uri, uri=True), True
+
+
+def fetch_chunks(conn, sql, params, chunk_size):
+    # Yields the rows of a query in lists of at most chunk_size rows, like OdriveDatabase.fetch_chunks, but raises errors.
+    c = conn.cursor()
+    try:
+        c.execute(sql, params)
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        c.close()
+
+
+def trial_query(trial_id, node_ID=None, columns=None):
+    # Returns the columns and the WHERE clause and parameters selecting one trial (or one node of it).
+    columns = list(columns or OdriveDatabase.ODRIVE_DATA_COLUMNS)
+    unknown = [column for column in columns if column not in OdriveDatabase.ODRIVE_DATA_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown ODriveData columns {unknown}.")
+    where = "trial_id = ?"
+    params = [trial_id]
+    if node_ID is not None:
+        where += " AND node_ID = ?"
+        params.append(node_ID)
+    return columns, where, params
+
+
+def trial_dtype(columns):
+    """
+    Returns the NumPy structured dtype of the given ODriveData columns.
+    """
+    if np is None:
+        raise ImportError("Exporting arrays requires numpy, install it with: pip install numpy")
+    return np.dtype([(column, ODRIVE_DATA_TYPES[column]) for column in columns])
+
+
+def count_trial(database, trial_id, node_ID=None):
+    """
+    Returns the number of rows of a trial (or of one node in it) and the highest UniqueID among them.
+    """
+    _, where, params = trial_query(trial_id, node_ID)
+    conn, owned = open_database(database)
+    try:
+        return tuple(conn.execute(f"SELECT COUNT(*), MAX(UniqueID) FROM ODriveData WHERE {where};", params).fetchone())
+    finally:
+        if owned:
+            conn.close()
+
+
+def iter_trial(database, trial_id, node_ID=None, columns=None, chunk_size=10000, as_array=False, last_unique_id=None):
+    """
+    Streams the ODriveData rows of one trial, or of one node in it, in chunks of at most chunk_size rows.
+    Only one chunk is in memory at a time, however long the trial is.
+
+    Parameters:
+        database       (str or OdriveDatabase): Path of the SQLite database file, or an open database.
+        trial_id       (int): The trial to read.
+        node_ID        (int, optional): Only read this node. Defaults to all nodes of the trial.
+        columns        (list, optional): ODriveData columns to read. Defaults to all of them (ODRIVE_DATA_COLUMNS).
+        chunk_size     (int): Max rows per chunk. Defaults to 10000.
+        as_array       (bool): Yield NumPy structured arrays instead of lists of tuples. Defaults to False.
+        last_unique_id (int, optional): Ignore rows written after this UniqueID, e.g. the one count_trial returned,
+                                        so rows still being logged don't change the export halfway. Defaults to None.
+
+    Yields:
+        Lists of row tuples (or structured arrays) ordered by node ID, then time. The rows are read in the order of the
+        trial index, so SQLite streams them without sorting. node_ID is a TEXT column, so nodes come in text order
+        (node 10 before node 2). Rows without a node ID come first, with node_ID None (MISSING_NODE_ID in arrays).
+
+    Example:
+        >>> for chunk in iter_trial('odrive_data.db', 3, node_ID=0, as_array=True):
+        ...     print(chunk['position'].mean())
+    """
+    columns, where, params = trial_query(trial_id, node_ID, columns)
+    dtype = trial_dtype(columns) if as_array else None
+    if last_unique_id is not None:
+        where += " AND UniqueID <= ?"
+        params.append(last_unique_id)
+    selected = [f"IFNULL(node_ID, {MISSING_NODE_ID})" if as_array and column == 'node_ID' else column for column in columns]
+    # The order of the (trial_id, node_ID, time) index, whose entries are in UniqueID (rowid) order for equal keys.
+    # Casting node_ID to sort numerically would make SQLite sort the whole trial in a temporary B-tree first.
+    sql = f"SELECT {', '.join(selected)} FROM ODriveData WHERE {where} ORDER BY node_ID, time, UniqueID;"
+    conn, owned = open_database(database)
+    try:
+        for rows in fetch_chunks(conn, sql, params, chunk_size):
+            yield np.array(rows, dtype=dtype) if as_array else rows
+    finally:
+        if owned:
+            conn.close()
+
+
+def load_trial(database, trial_id, node_ID=None, columns=None, chunk_size=10000, dataframe=False):
+    """
+    Loads the ODriveData rows of one trial (or of one node in it) into one NumPy structured array or pandas DataFrame.
+
+    The array is allocated once for the whole trial and filled chunk by chunk, so no list of row tuples is ever built.
+
+    Parameters:
+        database   (str or OdriveDatabase): Path of the SQLite database file, or an open database.
+        trial_id   (int): The trial to load.
+        node_ID    (int, optional): Only load this node. Defaults to all nodes of the trial.
+        columns    (list, optional): ODriveData columns to load. Defaults to all of them.
+        chunk_size (int): Rows read per chunk. Defaults to 10000.
+        dataframe  (bool): Return a pandas DataFrame instead of a structured array. Defaults to False.
+
+    Returns:
+        numpy.ndarray with one field per column (or a pandas.DataFrame).
+
+    Example:
+        >>> data = load_trial('odrive_data.db', 3, node_ID=0, columns=['time', 'position', 'velocity'])
+        >>> data['position'].max()
+    """
+    columns = trial_query(trial_id, node_ID, columns)[0]
+    dtype = trial_dtype(columns)
+    conn, owned = open_database(database)
+    try:
+        count, last_unique_id = count_trial(conn, trial_id, node_ID)
+        data = np.empty(count, dtype=dtype)
+        filled = 0
+        for chunk in iter_trial(conn, trial_id, node_ID, columns, chunk_size, as_array=True, last_unique_id=last_unique_id):
+            data[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+    finally:
+        if owned:
+            conn.close()
+    data = data[:filled]
+    if dataframe:
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("load_trial(dataframe=True) requires pandas, install it with: pip install pandas") from None
+        return pd.DataFrame(data)
+    return data
+
+
+def export_trial(database, trial_id, path, format=None, node_ID=None, columns=None, chunk_size=10000):
+    """
+    Writes the ODriveData rows of one trial (or of one node in it) to a CSV, Parquet or NPZ file, one chunk at a
+    time, so memory use doesn't grow with the length of the trial.
+
+    CSV needs nothing but the standard library. Parquet needs pyarrow and writes one row group per chunk. NPZ needs
+    numpy and holds one structured array named "odrive_data" (np.load(path)['odrive_data']), streamed into the
+    archive after a COUNT(*) sizes its header.
+
+    Parameters:
+        database   (str or OdriveDatabase): Path of the SQLite database file, or an open database.
+        trial_id   (int): The trial to export.
+        path       (str): Path of the output file.
+        format     (str, optional): "csv", "parquet" or "npz". Defaults to the extension of path.
+        node_ID    (int, optional): Only export this node. Defaults to all nodes of the trial.
+        columns    (list, optional): ODriveData columns to export. Defaults to all of them.
+        chunk_size (int): Rows per chunk. Defaults to 10000.
+
+    Returns:
+        The number of rows written.
+
+    Example:
+        >>> export_trial('odrive_data.db', 3, 'trial_3.parquet')
+        ...
+        ... 360000
+    """
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {format!r}, use one of {EXPORT_FORMATS}.")
+    columns = trial_query(trial_id, node_ID, columns)[0]
+    conn, owned = open_database(database)
+    try:
+        count, last_unique_id = count_trial(conn, trial_id, node_ID)
+        chunks = iter_trial(conn, trial_id, node_ID, columns, chunk_size, as_array=format != 'csv', last_unique_id=last_unique_id)
+        if format == 'csv':
+            return write_csv(path, columns, chunks)
+        if format == 'parquet':
+            return write_parquet(path, columns, chunks)
+        return write_npz(path, columns, chunks, count)
+    finally:
+        if owned:
+            conn.close()
+
+
+def write_csv(path, columns, chunks):
+    # Writes lists of row tuples to a CSV file with a header row.
+    rows_written = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            rows_written += len(rows)
+    return rows_written
+
+
+def write_parquet(path, columns, chunks):
+    # Writes structured array chunks to a Parquet file, one row group per chunk.
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow, install it with: pip install pyarrow") from None
+    schema = pa.schema([(column, pa.from_numpy_dtype(np.dtype(ODRIVE_DATA_TYPES[column]))) for column in columns])
+    rows_written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_arrays([chunk[column] for column in columns], schema=schema))
+            rows_written += len(chunk)
+    return rows_written
+
+
+def write_npz(path, columns, chunks, count):
+    # Streams structured array chunks into one .npy member of a zip archive, like numpy.savez but without the whole array.
+    dtype = trial_dtype(columns)
+    header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,)}
+    rows_written = 0
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        with archive.open(NPZ_ARRAY_NAME + '.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array_header_2_0(f, header)
+            for chunk in chunks:
+                f.write(chunk.tobytes())
+                rows_written += len(chunk)
+            if rows_written != count:
+                raise ValueError(f"Trial rows changed during the export ({rows_written} read, {count} counted).")
+    return rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export one trial of an O-Drive database to CSV, Parquet or NPZ.")
+    parser.add_argument("database", help="path of the SQLite database file")
+    parser.add_argument("trial_id", type=int, help="trial to export")
+    parser.add_argument("output", help="output file, the format is taken from its extension (.csv, .parquet or .npz)")
+    parser.add_argument("--node", type=int, default=None, help="only export this node ID")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="output format if not given by the extension")
+    parser.add_argument("--columns", nargs="+", default=None, help="ODriveData columns to export (default all)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows read and written per chunk")
+    args = parser.parse_args()
+
+    rows = export_trial(args.database, args.trial_id, args.output, args.format, args.node, args.columns, args.chunk_size)
+    print(f"Exported {rows} rows of trial {args.trial_id} to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
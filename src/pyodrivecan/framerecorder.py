@@ -0,0 +1,99 @@
+import os
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+
+# One 24 byte record per frame: kernel timestamp (float64), arbitration ID (uint32), DLC (uint8), 3 pad bytes, 8 data bytes.
+FRAME_RECORD = struct.Struct('<dIB3x8s')
+
+# NumPy dtype matching FRAME_RECORD, so a recording can be memory-mapped as a structured array with no parsing.
+FRAME_DTYPE = None if np is None else np.dtype({
+    'names': ['timestamp', 'arbitration_id', 'dlc', 'data'],
+    'formats': ['<f8', '<u4', 'u1', ('u1', 8)],
+    'offsets': [0, 8, 12, 16],
+    'itemsize': FRAME_RECORD.size,
+})
+
+
+
+
+class FrameRecorder:
+    """
+    Appends every received CAN frame to a fixed-width binary file.
+
+    Each frame is stored as one 24 byte record (see FRAME_RECORD): the kernel receive timestamp, the arbitration ID,
+    the DLC and the 8 data bytes (zero padded). The file has no header, so it can be memory-mapped and read as a
+    NumPy structured array directly with load_frames().
+
+    Attributes:
+        path             (str): Path of the recording file. Frames are appended if the file already exists.
+        frames_recorded  (int): The number of frames recorded by this recorder.
+
+    Example:
+        >>> recorder = FrameRecorder('trial_1.frames')
+        >>> recorder.record(msg)
+        >>> recorder.close()
+        >>> frames = load_frames('trial_1.frames')
+    """
+    def __init__(self, path, buffer_size=1 << 16):
+        self.path = path
+        self.file = open(path, 'ab', buffering=buffer_size)
+        self.frames_recorded = 0
+        self.pack = FRAME_RECORD.pack
+
+
+    def record(self, msg):
+        """
+        Appends one CAN message to the recording.
+
+        Parameters:
+            msg (can.Message): The received CAN message.
+        """
+        self.file.write(self.pack(msg.timestamp, msg.arbitration_id, msg.dlc, bytes(msg.data)))
+        self.frames_recorded += 1
+
+
+    def flush(self):
+        """
+        Writes the buffered frames to the file.
+        """
+        self.file.flush()
+
+
+    def close(self):
+        """
+        Writes the buffered frames and closes the file.
+        """
+        self.file.close()
+
+
+
+
+def load_frames(path, mode='r'):
+    """
+    Memory-maps a recording made by FrameRecorder as a NumPy structured array.
+
+    Parameters:
+        path (str): Path of the recording file.
+        mode (str): numpy.memmap mode. Defaults to 'r' (read only).
+
+    Returns:
+        numpy.memmap with the fields timestamp, arbitration_id, dlc and data (8 bytes per frame). An empty recording,
+        which numpy can't memory-map, is returned as an empty array with the same fields.
+
+    Example:
+        >>> frames = load_frames('trial_1.frames')
+        >>> encoder = frames[frames['arbitration_id'] == (0 << 5 | 0x09)]
+        >>> position = encoder['data'][:, :4].copy().view('<f4')
+    """
+    if np is None:
+        raise ImportError("load_frames requires numpy, install it with: pip install numpy")
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=FRAME_DTYPE)
+    return np.memmap(path, dtype=FRAME_DTYPE, mode=mode)
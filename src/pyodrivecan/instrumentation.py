@@ -0,0 +1,136 @@
+import time
+
+
+
+
+class LatencyStats:
+    """
+    Counts and a log2 histogram of the latencies of one hot path stage.
+
+    Bucket i counts latencies from 2**(i - 1) to 2**i microseconds (bucket 0 is everything under 1 us), so recording is
+    a few arithmetic operations and memory is fixed.
+
+    Attributes:
+        count  (int): The number of latencies recorded.
+        total  (float): The sum of the latencies in seconds.
+        max    (float): The largest latency in seconds.
+    """
+    BUCKETS = 32
+
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * self.BUCKETS
+
+
+    def record(self, latency):
+        """
+        Records one latency in seconds.
+        """
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+        bucket = int(latency * 1e6).bit_length() if latency > 0 else 0
+        self.histogram[min(bucket, self.BUCKETS - 1)] += 1
+
+
+    def percentile(self, percentile):
+        """
+        Returns the upper edge (seconds) of the histogram bucket holding the given percentile, capped at the max.
+        """
+        if self.count == 0:
+            return 0.0
+        target = self.count * percentile / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return min((1 << bucket) * 1e-6, self.max)
+        return self.max
+
+
+    def snapshot(self):
+        """
+        Returns the statistics as a dict with count, mean, p50, p99 and max in seconds.
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+
+
+class Instrumentation:
+    """
+    Latency counters around the hot path stages of one ODriveCAN node.
+
+    Stages:
+        receive:   From the kernel receive timestamp of a frame (can.Message.timestamp) to the start of its decode.
+        decode:    Time spent in the decoder of a frame in process_can_message.
+        save_data: Time spent queuing one row for the database in save_data.
+        send.<method>: Time spent sending one frame in set_position, set_velocity or set_torque.
+
+    The kernel timestamp is wall clock time, so it is compared against time.monotonic() plus the wall clock offset
+    measured when the instrumentation was created. Use ODriveCAN.enable_instrumentation() rather than creating this directly.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.calibrate()
+
+
+    def calibrate(self):
+        """
+        Measures the offset between the wall clock used by the kernel timestamps and time.monotonic().
+        """
+        self.clock_offset = time.time() - time.monotonic()
+
+
+    def stage(self, name):
+        """
+        Returns the LatencyStats of a stage, creating it the first time.
+        """
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = LatencyStats()
+        return stats
+
+
+    def decode_message(self, decode, message):
+        # Times one decode and records how long the frame waited since the kernel received it.
+        if message.timestamp:
+            self.stage('receive').record(time.monotonic() + self.clock_offset - message.timestamp)
+        start = time.perf_counter()
+        decode(message)
+        self.stage('decode').record(time.perf_counter() - start)
+
+
+    def timed_send(self, bus, message, name):
+        # Times one bus.send
+        start = time.perf_counter()
+        bus.send(message)
+        self.stage(name).record(time.perf_counter() - start)
+
+
+    def reset(self):
+        """
+        Clears the statistics of every stage.
+        """
+        for stats in self.stages.values():
+            stats.reset()
+
+
+    def snapshot(self):
+        """
+        Returns {stage name: statistics dict} for every stage that recorded something.
+        """
+        return {name: stats.snapshot() for name, stats in self.stages.items()}
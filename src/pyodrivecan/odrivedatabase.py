@@ -1,9 +1,22 @@
 from sqlite3 import Error
+from time import monotonic
+import itertools
+import json
+import queue
 import sqlite3
+import threading
+import time
 
 
 
 class OdriveDatabase:
+    ODRIVE_DATA_COLUMNS = ('trial_id', 'node_ID', 'time', 'position', 'velocity', 'torque_target', 'torque_estimate', 'bus_voltage', 'bus_current', 'iq_setpoint', 'iq_measured', 'electrical_power', 'mechanical_power', 'fet_temp', 'motor_temp')
+
+    ODRIVE_DATA_INSERT_SQL = f"""INSERT INTO ODriveData({', '.join(ODRIVE_DATA_COLUMNS)})
+                 VALUES({', '.join('?' for _ in ODRIVE_DATA_COLUMNS)});"""
+
+    BUS_STATS_COLUMNS = ('trial_id', 'time', 'interface', 'node_ID', 'cmd_id', 'frames', 'rate', 'period', 'jitter', 'max_interval', 'missed', 'bus_load', 'interface_load')
+
     def __init__(self, database_path=None):
         """
         Initializes the database connection.
@@ -53,6 +66,9 @@ class OdriveDatabase:
         """
         Creates a database connection to the SQLite database specified by the database_path.
 
+        The connection uses write-ahead logging (WAL) with synchronous=NORMAL, so a commit only appends to the
+        log instead of waiting for every write to reach the SD card.
+
         Returns:
             Connection object to the SQLite database.
 
@@ -60,7 +76,10 @@ class OdriveDatabase:
             >>> conn = database.create_connection()
         """
         try:
-            return sqlite3.connect(self.database_path)
+            conn = sqlite3.connect(self.database_path)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            return conn
         except Error as e:
             print(e)
 
@@ -94,6 +113,91 @@ class OdriveDatabase:
         );
         """
         self.execute(sql)
+        # One index serves per trial, per node and time window queries, and MAX(trial_id). Building it on an existing
+        # large database takes a while, but only the first time the database is opened by this version.
+        self.execute("CREATE INDEX IF NOT EXISTS ODriveData_trial_node_time ON ODriveData(trial_id, node_ID, time);")
+        self.ensure_trials_table()
+
+
+
+    def ensure_trials_table(self):
+        """
+        Ensures the Trials table exists; creates it if it does not.
+
+        Each trial has one row with its start time (time.time()), the node IDs logging to it and user metadata, the last
+        two as JSON text. When the table is first created, the trials already in ODriveData are added to it (without a
+        start time or metadata).
+
+        Example:
+            >>> database.ensure_trials_table()
+        """
+        if self.fetch("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Trials';"):
+            return
+        sql = """
+        CREATE TABLE IF NOT EXISTS Trials (
+            trial_id INTEGER PRIMARY KEY,
+            start_time REAL,
+            nodes TEXT,
+            metadata TEXT
+        );
+        """
+        self.execute(sql)
+        self.execute("""INSERT OR IGNORE INTO Trials(trial_id, nodes)
+                 SELECT trial_id, json_group_array(DISTINCT CASE WHEN node_ID GLOB '[0-9]*' THEN CAST(node_ID AS INTEGER) ELSE node_ID END)
+                 FROM ODriveData GROUP BY trial_id;""")
+
+
+
+    def ensure_bus_stats_table(self):
+        """
+        Ensures the BusStats table written by CanBusHub.log_monitor exists; creates it if it does not.
+
+        Each row holds the statistics of one stream (node_ID, cmd_id), or of the whole interface when node_ID and cmd_id are NULL.
+
+        Example:
+            >>> database.ensure_bus_stats_table()
+        """
+        sql = """
+        CREATE TABLE IF NOT EXISTS BusStats (
+            UniqueID INTEGER PRIMARY KEY AUTOINCREMENT,
+            trial_id INTEGER,
+            time REAL,
+            interface TEXT,
+            node_ID INTEGER,
+            cmd_id INTEGER,
+            frames INTEGER,
+            rate REAL,
+            period REAL,
+            jitter REAL,
+            max_interval REAL,
+            missed INTEGER,
+            bus_load REAL,
+            interface_load REAL
+        );
+        """
+        self.execute(sql)
+
+
+    def add_bus_stats_many(self, rows):
+        """
+        Inserts many rows into the BusStats table in a single transaction.
+
+        Para:
+            rows - Sequence of tuples (trial_id, time, interface, node_ID, cmd_id, frames, rate, period, jitter,
+                   max_interval, missed, bus_load, interface_load).
+
+        Returns:
+            The number of rows written, or 0 on failure.
+        """
+        sql = f"""INSERT INTO BusStats({', '.join(self.BUS_STATS_COLUMNS)})
+                 VALUES({', '.join('?' for _ in self.BUS_STATS_COLUMNS)});"""
+        try:
+            with self.conn:
+                self.conn.executemany(sql, rows)
+            return len(rows)
+        except Error as e:
+            print(e)
+            return 0
 
 
 
@@ -185,6 +289,35 @@ class OdriveDatabase:
             print(e)
             return []
 
+    def fetch_chunks(self, sql, params=None, chunk_size=10000):
+        """
+        Fetches data from the database in chunks, so a large result never has to fit in memory.
+
+        Params:
+            sql - SQL query to be executed.
+            params - Optional parameters for the SQL query.
+            chunk_size - Max rows per chunk. Defaults to 10000.
+
+        Yields:
+            Lists of at most chunk_size rows, until the result is exhausted.
+
+        Example:
+            >>> for rows in database.fetch_chunks("SELECT time, position FROM ODriveData WHERE trial_id = ?", (1,)):
+            ...     process(rows)
+        """
+        c = self.conn.cursor()
+        try:
+            c.execute(sql, params or ())
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except Error as e:
+            print(e)
+        finally:
+            c.close()
+
     def get_expected_column_types(self, table_name):
         """
         Retrieves the expected column types for a given table.
@@ -219,25 +352,160 @@ class OdriveDatabase:
 
     def get_next_trial_id(self):
         """
-        Fetches the next trial_id by finding the maximum trial_id in the database and adding 1.
+        Fetches the next trial_id, one more than the highest trial_id in the Trials and ODriveData tables.
+
+        Both maximums are read from the end of an index (the Trials primary key and the ODriveData trial index), so this
+        takes the same time however large the database is. Use start_trial to also reserve the ID.
 
         Returns:
             The next trial_id to be used.
         """
         try:
             c = self.conn.cursor()
-            c.execute("SELECT MAX(trial_id) FROM ODriveData")
-            max_id = c.fetchone()[0]
-            if max_id is not None:
-                return max_id + 1
-            else:
-                return 1  # If table is empty, start with 1
+            c.execute("SELECT MAX((SELECT IFNULL(MAX(trial_id), 0) FROM Trials), (SELECT IFNULL(MAX(trial_id), 0) FROM ODriveData))")
+            return c.fetchone()[0] + 1
         except Error as e:
             print(e)
             return 1  # Default to 1 if there's an issue
 
 
 
+    def start_trial(self, nodes=(), metadata=None, start_time=None):
+        """
+        Reserves the next trial_id by adding the trial to the Trials table.
+
+        Para:
+            nodes - Node IDs logging to the trial. More can be added with add_trial_node.
+            metadata - Optional JSON serializable data describing the trial (e.g. controller gains).
+            start_time - Start time of the trial (time.time()). Defaults to now.
+
+        Returns:
+            The trial_id, or None on failure.
+
+        Example:
+            >>> database.start_trial(nodes=[0, 1], metadata={'kp': 0.5, 'notes': 'step response'})
+            ...
+            ... 4
+        """
+        if start_time is None:
+            start_time = time.time()
+        try:
+            with self.conn:
+                trial_id = self.get_next_trial_id()
+                self.conn.execute("INSERT INTO Trials(trial_id, start_time, nodes, metadata) VALUES (?, ?, ?, ?);",
+                                  (trial_id, start_time, json.dumps(sorted(nodes)), None if metadata is None else json.dumps(metadata)))
+            return trial_id
+        except Error as e:
+            print(e)
+            return None
+
+
+
+    def add_trial_node(self, trial_id, node_ID):
+        """
+        Adds a node ID to the nodes of a trial in the Trials table.
+        """
+        trial = self.get_trial(trial_id)
+        if trial is None or node_ID in trial['nodes']:
+            return
+        self.execute("UPDATE Trials SET nodes = ? WHERE trial_id = ?;", (json.dumps(sorted(trial['nodes'] + [node_ID])), trial_id))
+
+
+
+    def get_trial(self, trial_id):
+        """
+        Returns a trial from the Trials table as a dict with trial_id, start_time, nodes and metadata, or None.
+        """
+        rows = self.fetch("SELECT trial_id, start_time, nodes, metadata FROM Trials WHERE trial_id = ?;", (trial_id,))
+        return self.trial_dict(rows[0]) if rows else None
+
+
+
+    def get_trials(self):
+        """
+        Returns every trial in the Trials table as a list of dicts (see get_trial), oldest first.
+        """
+        return [self.trial_dict(row) for row in self.fetch("SELECT trial_id, start_time, nodes, metadata FROM Trials ORDER BY trial_id;")]
+
+
+    @staticmethod
+    def trial_dict(row):
+        trial_id, start_time, nodes, metadata = row
+        return {
+            'trial_id': trial_id,
+            'start_time': start_time,
+            'nodes': json.loads(nodes) if nodes else [],
+            'metadata': json.loads(metadata) if metadata else None,
+        }
+
+
+
+    def query_window(self, trial_id, node_ID, start=None, end=None, columns=None, page_size=1000, after=None):
+        """
+        Fetches one page of a node's ODriveData rows in a time window of a trial, ordered by time.
+
+        Pages are found with keyset pagination: the next page starts after the (time, UniqueID) of the last row of the
+        previous one, which the trial index finds directly, so every page costs the same however deep into the trial it is
+        (OFFSET would skip over all the rows before it).
+
+        Para:
+            trial_id - The trial to read.
+            node_ID - The node to read.
+            start - Start of the window (ODriveData time, inclusive). Defaults to the start of the trial.
+            end - End of the window (exclusive). Defaults to the end of the trial.
+            columns - ODriveData columns to return. Defaults to all of them.
+            page_size - Max rows per page. Defaults to 1000.
+            after - The key returned with the previous page. Defaults to None for the first page.
+
+        Returns:
+            (rows, key): The rows, and the key to pass as after for the next page (None after the last page).
+
+        Example:
+            >>> rows, key = database.query_window(3, 0, start=10.0, end=20.0, columns=['time', 'position'])
+            >>> while key is not None:
+            ...     rows, key = database.query_window(3, 0, start=10.0, end=20.0, columns=['time', 'position'], after=key)
+        """
+        columns = list(columns or self.ODRIVE_DATA_COLUMNS)
+        unknown = [name for name in columns if name not in self.ODRIVE_DATA_COLUMNS]
+        if unknown:
+            print(f"Unknown ODriveData columns {unknown}.")
+            return [], None
+        where = "trial_id = ? AND node_ID = ?"
+        params = [trial_id, node_ID]
+        if start is not None:
+            where += " AND time >= ?"
+            params.append(start)
+        if end is not None:
+            where += " AND time < ?"
+            params.append(end)
+        if after is not None:
+            where += " AND (time, UniqueID) > (?, ?)"
+            params.extend(after)
+        sql = f"SELECT {', '.join(columns)}, time, UniqueID FROM ODriveData WHERE {where} ORDER BY time, UniqueID LIMIT ?;"
+        params.append(page_size)
+        rows = self.fetch(sql, params)
+        key = tuple(rows[-1][-2:]) if len(rows) == page_size else None
+        return [row[:-2] for row in rows], key
+
+
+
+    def iter_window(self, trial_id, node_ID, start=None, end=None, columns=None, page_size=1000):
+        """
+        Iterates over the pages of query_window until the window is exhausted.
+
+        Yields:
+            Lists of at most page_size rows, ordered by time.
+        """
+        key = None
+        while True:
+            rows, key = self.query_window(trial_id, node_ID, start, end, columns, page_size, key)
+            if rows:
+                yield rows
+            if key is None:
+                return
+
+
+
     def add_odrive_data(self, trial_id, node_ID, time, position, velocity, torque_target, torque_estimate, bus_voltage, bus_current, iq_setpoint, iq_measured, electrical_power, mechanical_power, fet_temp, motor_temp):
         """
         Inserts data into the ODriveData table.
@@ -253,26 +521,433 @@ class OdriveDatabase:
             ...
             ... 1
         """
-        sql = '''INSERT INTO ODriveData(trial_id, node_ID, time, position, velocity, torque_target, torque_estimate, bus_voltage, bus_current, iq_setpoint, iq_measured, electrical_power, mechanical_power, fet_temp, motor_temp)
-                 VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);'''
-        return self.execute(sql, (trial_id, node_ID, time, position, velocity, torque_target, torque_estimate, bus_voltage, bus_current, iq_setpoint, iq_measured, electrical_power, mechanical_power, fet_temp, motor_temp))
+        return self.execute(self.ODRIVE_DATA_INSERT_SQL, (trial_id, node_ID, time, position, velocity, torque_target, torque_estimate, bus_voltage, bus_current, iq_setpoint, iq_measured, electrical_power, mechanical_power, fet_temp, motor_temp))
+
+
+    def add_odrive_data_many(self, rows):
+        """
+        Inserts many rows into the ODriveData table with one executemany in a single transaction.
+
+        Para:
+            rows - Sequence of tuples with the same fields, in the same order, as add_odrive_data.
+
+        Returns:
+            The number of rows written, or 0 on failure.
+        """
+        try:
+            with self.conn:
+                self.conn.executemany(self.ODRIVE_DATA_INSERT_SQL, rows)
+            return len(rows)
+        except Error as e:
+            print(e)
+            return 0
+
+
+    def close(self):
+        """
+        Closes the database connection.
+
+        Example:
+            >>> database.close()
+        """
+        self.conn.close()
 
 
     def bulk_insert_odrive_data(self, data_list):
-        """Inserts multiple data records into the database."""
-        conn = self.create_connection()  # Create a new connection
+        """
+        Inserts multiple data records into the database in one transaction.
+
+        Para:
+            data_list - List of dictionaries, each with the ODriveData column names as keys (see add_odrive_data).
+
+        Returns:
+            The number of rows written, or 0 on failure.
+        """
+        try:
+            rows = [tuple(data[column] for column in self.ODRIVE_DATA_COLUMNS) for data in data_list]
+        except KeyError as e:
+            print(f"Missing ODriveData column {e}. No data inserted.")
+            return 0
+        return self.add_odrive_data_many(rows)
+
+
+    def insert_odrive_columns(self, columns):
+        """
+        Inserts column oriented data into the ODriveData table with one prepared statement in a single transaction.
+
+        Para:
+            columns - Either a dictionary of {column_name: sequence} with equal length sequences (lists, tuples or
+                      NumPy arrays), or a NumPy structured array whose field names are ODriveData column names.
+                      A scalar value (e.g. a single trial_id) is repeated for every row. Columns left out are stored as NULL.
+
+        Returns:
+            The number of rows written, or 0 on failure.
+
+        Example:
+            >>> database.insert_odrive_columns({
+            ...     'trial_id': 1,
+            ...     'node_ID': 0,
+            ...     'time': [0.0, 0.1, 0.2],
+            ...     'position': [1.0, 1.1, 1.2],
+            ...     'velocity': [0.5, 0.5, 0.5],
+            ... })
+            ...
+            ... 3
+        """
+        dtype = getattr(columns, 'dtype', None)
+        if dtype is not None and dtype.names is not None:
+            columns = {name: columns[name] for name in dtype.names}
+
+        unknown = [name for name in columns if name not in self.ODRIVE_DATA_COLUMNS]
+        if unknown:
+            print(f"Unknown ODriveData columns {unknown}. No data inserted.")
+            return 0
+
+        names = list(columns)
+        values = []
+        length = None
+        for name in names:
+            value = columns[name]
+            if hasattr(value, 'tolist'):
+                value = value.tolist()  # NumPy arrays and scalars to Python values in one C call
+            if isinstance(value, (list, tuple, range)):
+                if length is None:
+                    length = len(value)
+                elif len(value) != length:
+                    print(f"Column '{name}' has {len(value)} values, expected {length}. No data inserted.")
+                    return 0
+            else:
+                value = itertools.repeat(value)  # Scalar used for every row
+            values.append(value)
+
+        if not length:
+            return 0
+
+        sql = f"INSERT INTO ODriveData({', '.join(names)}) VALUES({', '.join('?' for _ in names)});"
         try:
-            c = conn.cursor()
-            for data in data_list:
-                sql = '''INSERT INTO ODriveData(trial_id, node_ID, time, position, velocity, torque_target, torque_estimate, bus_voltage, bus_current, iq_setpoint, iq_measured, electrical_power, mechanical_power, fet_temp, motor_temp )
-                         VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);'''
-                params = (data['trial_id'], data['node_ID'], data['time'], data['position'], data['velocity'], data['torque_target'], data['torque_estimate'], data['bus_voltage'], data['bus_current'], data['iq_setpoint'], data['iq_measured'], data['electrical_power'], data['mechanical_power'], data['fet_temp'], data['motor_temp'])
-                c.execute(sql, params)
-            conn.commit()
+            with self.conn:
+                self.conn.executemany(sql, zip(*values))
+            return length
         except Error as e:
             print(e)
-        finally:
-            conn.close()
+            return 0
+
+
+
+class OdriveDatabaseWriter:
+    """
+    Writes ODriveData rows from a dedicated thread, so SQLite commits never run on the asyncio event loop thread.
+
+    The writer thread owns its own OdriveDatabase connection and takes rows from a bounded queue. put() never blocks:
+    when the queue is full the row is dropped and counted, so persistence can never add latency to the control path.
+    One writer is shared by every node logging to the same database file (see get_writer).
+
+    If the writer thread can't open the database, the error is kept in the error attribute: call() and join_trial raise
+    it, put() drops the rows and flush() returns False, instead of waiting on a thread that will never write.
+
+    Attributes:
+        database_path   (str): Path to the SQLite database file.
+        batch_size      (int): Max rows written per transaction.
+        flush_interval  (float): Max seconds a row waits in the writer before it is written.
+        max_queue       (int): Max rows waiting in the queue before new rows are dropped.
+
+    Example:
+        >>> writer = OdriveDatabaseWriter.get_writer('odrive_data.db')
+        >>> writer.put((1, 0, 0.1, 123.45, 67.89, 2.34, 2.30, 48.0, 1.5, 3.33, 3.30, 120, 110, 40.0, 35.0))
+        >>> writer.stats()
+        ...
+        ... {'queue_depth': 1, 'dropped_rows': 0, 'rows_written': 0, 'flushes': 0, 'last_flush_latency': 0.0, 'max_flush_latency': 0.0}
+        >>> writer.release()
+    """
+    # Class variable holding one writer per database file
+    writers = {}
+
+    def __init__(self, database_path='odrive_data.db', batch_size=100, flush_interval=1.0, max_queue=10000):
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.users = 0
+        self.dropped_rows = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.trial_id = None  # The trial shared by every node logging through this writer (see join_trial)
+        self.trial_users = 0
+        self.trial_lock = threading.Lock()
+        self.bus_stats_table = False  # Set once the writer thread created the BusStats table (see put_bus_stats)
+        self.error = None  # The exception raised opening the database on the writer thread, if any
+        self.thread = threading.Thread(target=self.write_loop, name=f"OdriveDatabaseWriter {database_path}", daemon=True)
+        self.thread.start()
+
+
+    @classmethod
+    def get_writer(cls, database_path='odrive_data.db', **kwargs):
+        """
+        Returns the writer for a database file, starting it the first time it is requested. Call release() when done.
+
+        Para:
+            database_path - Path to the SQLite database file.
+            kwargs - batch_size, flush_interval and max_queue used if a new writer is started.
+        """
+        writer = cls.writers.get(database_path)
+        if writer is None:
+            writer = cls(database_path, **kwargs)
+            cls.writers[database_path] = writer
+        writer.users += 1
+        return writer
+
+
+    def join_trial(self, node_ID, timeout=None):
+        """
+        Returns the trial_id the rows of a node are logged under. The first node to join starts a new trial in the Trials
+        table; nodes joining before every node left it (e.g. the other axes of the same run) are added to that trial.
+        Call leave_trial when the node stops logging.
+
+        The trial is registered on the writer thread (see call), so this blocks until the writer opened the database.
+        From a coroutine run it in an executor: await loop.run_in_executor(None, writer.join_trial, node_ID).
+
+        Para:
+            node_ID - The node ID joining the trial.
+            timeout - Max seconds to wait for the writer. Defaults to waiting until the trial is registered.
+        """
+        return self.call(lambda database: self.register_trial_node(database, node_ID), timeout)
+
+
+    def register_trial_node(self, database, node_ID):
+        # Runs on the writer thread, which serializes the joins of every node.
+        with self.trial_lock:
+            if self.trial_id is None:
+                self.trial_id = database.start_trial(nodes=[node_ID])
+            else:
+                database.add_trial_node(self.trial_id, node_ID)
+            self.trial_users += 1
+            return self.trial_id
+
+
+    def leave_trial(self):
+        """
+        Called when a node that joined the trial stops logging. Once every node left, the next join starts a new trial.
+        """
+        with self.trial_lock:
+            self.trial_users -= 1
+            if self.trial_users <= 0:
+                self.trial_users = 0
+                self.trial_id = None
+
+
+    def call(self, function, timeout=None):
+        """
+        Runs function(database) on the writer thread, after the rows queued before it are written, and returns its
+        result. Lets other database work (e.g. registering a trial) use the writer's connection instead of opening
+        one on the calling thread. Blocks until it ran, so don't call it from the event loop thread.
+
+        Para:
+            function - Callable taking the writer's OdriveDatabase.
+            timeout - Max seconds to wait. Defaults to waiting until it ran.
+
+        Returns:
+            The result of function. Exceptions raised by function, or by the writer opening the database, are raised here.
+        """
+        if self.error is not None:
+            raise self.error
+        if not self.thread.is_alive():
+            raise RuntimeError(f"The database writer of {self.database_path} is closed.")
+        done = threading.Event()
+        result = {}
+        def request(database):
+            try:
+                if database is None:
+                    raise self.error  # The writer failed to open the database (see write_loop)
+                result['value'] = function(database)
+            except Exception as e:
+                result['error'] = e
+            finally:
+                done.set()
+        self.queue.put(request)
+        if not done.wait(timeout):
+            raise TimeoutError(f"The database writer of {self.database_path} did not respond within {timeout} seconds.")
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+
+    def release(self):
+        """
+        Releases a writer returned by get_writer. The last user to release it writes all queued rows and stops the thread.
+        """
+        self.users -= 1
+        if self.users <= 0:
+            if OdriveDatabaseWriter.writers.get(self.database_path) is self:
+                del OdriveDatabaseWriter.writers[self.database_path]
+            self.close()
+
+
+    def put(self, row):
+        """
+        Queues a row for the ODriveData table without blocking.
+
+        Para:
+            row - Tuple with the same fields, in the same order, as OdriveDatabase.add_odrive_data.
+
+        Returns:
+            True if the row was queued, False if the queue was full or the writer failed, and the row was dropped.
+        """
+        if self.error is not None:
+            self.dropped_rows += 1
+            return False
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped_rows += 1
+            return False
+
+
+    def put_bus_stats(self, rows):
+        """
+        Queues rows for the BusStats table (see CanBusHub.log_monitor) without blocking. They are written on the writer
+        thread, which creates the table the first time.
+
+        Para:
+            rows - Sequence of tuples with the fields of OdriveDatabase.add_bus_stats_many.
+
+        Returns:
+            True if the rows were queued, False if the queue was full or the writer failed, and they were dropped.
+        """
+        if self.error is not None:
+            self.dropped_rows += len(rows)
+            return False
+        try:
+            self.queue.put_nowait(lambda database: self.write_bus_stats(database, rows))
+            return True
+        except queue.Full:
+            self.dropped_rows += len(rows)
+            return False
+
+
+    def write_bus_stats(self, database, rows):
+        # Runs on the writer thread.
+        if not self.bus_stats_table:
+            database.ensure_bus_stats_table()
+            self.bus_stats_table = True
+        database.add_bus_stats_many(rows)
+
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every row queued before this call has been written.
+
+        Para:
+            timeout - Max seconds to wait. Defaults to waiting until the rows are written.
+
+        Returns:
+            True if the rows were written before the timeout, False otherwise or if the writer failed.
+        """
+        if self.error is not None or not self.thread.is_alive():
+            return False
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout) and self.error is None
+
+
+    def close(self, timeout=5.0):
+        """
+        Writes all queued rows, then stops the writer thread and closes its database connection.
+
+        Para:
+            timeout - Max seconds to wait for the writer thread. Defaults to 5. Use None to wait until every row is written.
+
+        Returns:
+            True if the writer thread stopped before the timeout.
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+
+    def stats(self):
+        """
+        Returns the writer statistics.
+
+        Returns:
+            dict with the current queue_depth, the number of dropped_rows, rows_written and flushes, and the
+            last_flush_latency and max_flush_latency in seconds.
+        """
+        return {
+            'queue_depth': self.queue.qsize(),
+            'dropped_rows': self.dropped_rows,
+            'rows_written': self.rows_written,
+            'flushes': self.flushes,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+        }
+
+
+    def write_rows(self, database, rows):
+        start = monotonic()
+        self.rows_written += database.add_odrive_data_many(rows)
+        self.last_flush_latency = monotonic() - start
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+        self.flushes += 1
+
+
+    #This runs on the writer thread. It owns the sqlite3 connection and writes the queued rows in batches.
+    #Flush events, call() requests and BusStats rows are handled after the rows queued before them are written.
+    def write_loop(self):
+        try:
+            database = OdriveDatabase(self.database_path)
+        except Exception as e:
+            self.error = e
+            self.fail_requests()
+            return
+        rows = []
+        next_flush = monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                item = self.queue.get(timeout=max(0.0, next_flush - monotonic()))
+            except queue.Empty:
+                item = False  # Flush interval elapsed
+
+            if isinstance(item, tuple):
+                rows.append(item)
+                if len(rows) < self.batch_size and monotonic() < next_flush:
+                    continue
+            elif item is None:
+                running = False  # Stop requested by close()
+
+            if rows:
+                self.write_rows(database, rows)
+                rows = []
+            next_flush = monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()  # Flush requested by flush()
+            elif callable(item):
+                item(database)  # Request queued by call()
+
+        database.conn.close()
+
+
+    #This runs on the writer thread when the database could not be opened. Until close() stops it, queued rows are
+    #dropped, flush events are set and call() requests are answered with the error, so no caller waits forever.
+    def fail_requests(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, tuple):
+                self.dropped_rows += 1
+            elif isinstance(item, threading.Event):
+                item.set()
+            elif callable(item):
+                try:
+                    item(None)
+                except Exception:
+                    pass  # BusStats rows, which need a database
 
 
 
@@ -0,0 +1,149 @@
+from .pyodrivecan import ODriveCAN
+import can
+import struct
+import time
+
+
+
+
+class ODriveGroup:
+    """
+    Sends one setpoint to each O-Drive of a group as a single burst of pre-built CAN frames.
+
+    A frame template (a reused can.Message) is built once per node and setpoint command when the group is created,
+    together with the send method of the node's CAN bus. Each burst only packs the new setpoints into the payload
+    bytes of the templates and sends them back to back through python-can.
+
+    Attributes:
+        odrives  (list of ODriveCAN): The O-Drives in the group, in the order setpoints are given.
+
+    Example:
+        >>> group = ODriveGroup([odrive1, odrive2, odrive3])
+        >>> group.set_torques([0.1, 0.0, -0.1])
+        >>> group.set_velocities([1.0, 2.0, 3.0], torque_feedforwards=[0.0, 0.0, 0.01])
+        >>> group.stats()
+        ...
+        ... {'bursts': 2, 'frames': 6, 'last_burst_latency': 4.1e-05, 'mean_burst_latency': 4.5e-05, 'max_burst_latency': 4.9e-05}
+    """
+    SETPOINT_COMMANDS = ODriveCAN.SETPOINT_COMMANDS
+
+    def __init__(self, odrives):
+        self.odrives = list(odrives)
+        self.packers = {}
+        self.integer_fields = {}
+        self.templates = {}
+        for mode, (cmd_id, fmt) in self.SETPOINT_COMMANDS.items():
+            packer = struct.Struct(fmt)
+            self.packers[mode] = packer.pack_into
+            # The 'h' fields (the feedforwards of Set_Input_Pos) only take ints, see ODriveCAN.stream_payload
+            self.integer_fields[mode] = [field == 'h' for field in fmt.lstrip('<>=!@')]
+            self.templates[mode] = [self.build_template(odrive, cmd_id, packer.size) for odrive in self.odrives]
+        self.bursts = 0
+        self.frames = 0
+        self.last_burst_latency = 0.0
+        self.max_burst_latency = 0.0
+        self.total_burst_latency = 0.0
+
+
+    @staticmethod
+    def build_template(odrive, cmd_id, size):
+        """
+        Builds the frame template of one node and command.
+
+        Returns:
+            (send, msg): The send method of the node's CAN bus (the bus of its CanBusHub, see ODriveCAN.canBus) and the
+            can.Message whose data the setpoints are packed into.
+        """
+        msg = can.Message(arbitration_id=(odrive.nodeID << 5 | cmd_id), data=bytes(size), is_extended_id=False)
+        return (odrive.canBus.send, msg)
+
+
+    def send_burst(self, mode, *columns):
+        """
+        Packs one row of setpoint values per node into the templates of a command and sends them as one burst.
+
+        Parameters:
+            mode    (str): "position", "velocity" or "torque".
+            columns (sequences): One sequence (list, tuple or NumPy array) per payload field, each with one value per
+                                 node in the group.
+        """
+        for column in columns:
+            if len(column) != len(self.odrives):
+                raise ValueError(f"Expected {len(self.odrives)} setpoints, got {len(column)}.")
+        columns = [[int(value) for value in column] if integer else column for column, integer in zip(columns, self.integer_fields[mode])]
+        pack_into = self.packers[mode]
+        start = time.perf_counter()
+        for (send, msg), row in zip(self.templates[mode], zip(*columns)):
+            pack_into(msg.data, 0, *row)
+            send(msg)
+        latency = time.perf_counter() - start
+        self.bursts += 1
+        self.frames += len(self.odrives)
+        self.last_burst_latency = latency
+        self.total_burst_latency += latency
+        if latency > self.max_burst_latency:
+            self.max_burst_latency = latency
+
+
+    def set_torques(self, torques):
+        """
+        Sets the torque of every O-Drive in the group in one burst.
+
+        Parameters:
+            torques (sequence of float): Target torque in Nm for each O-Drive.
+
+        Example:
+            >>> group.set_torques([0.1, 0.1, 0.0])
+        """
+        self.send_burst("torque", torques)
+
+
+    def set_velocities(self, velocities, torque_feedforwards=None):
+        """
+        Sets the velocity of every O-Drive in the group in one burst.
+
+        Parameters:
+            velocities (sequence of float): Target velocity in Rev/sec for each O-Drive.
+            torque_feedforwards (sequence of float, optional): Feedforward torque for each O-Drive. Defaults to 0.
+
+        Example:
+            >>> group.set_velocities([2.0, 2.0, -2.0])
+        """
+        if torque_feedforwards is None:
+            torque_feedforwards = [0.0] * len(self.odrives)
+        self.send_burst("velocity", velocities, torque_feedforwards)
+
+
+    def set_positions(self, positions, velocity_feedforwards=None, torque_feedforwards=None):
+        """
+        Sets the position of every O-Drive in the group in one burst.
+
+        Parameters:
+            positions (sequence of float): Target position in Revs for each O-Drive.
+            velocity_feedforwards (sequence of int, optional): Feedforward velocity for each O-Drive, as in set_position (truncated to int). Defaults to 0.
+            torque_feedforwards (sequence of int, optional): Feedforward torque for each O-Drive, as in set_position (truncated to int). Defaults to 0.
+
+        Example:
+            >>> group.set_positions([10.0, 20.0, 30.0])
+        """
+        if velocity_feedforwards is None:
+            velocity_feedforwards = [0] * len(self.odrives)
+        if torque_feedforwards is None:
+            torque_feedforwards = [0] * len(self.odrives)
+        self.send_burst("position", positions, velocity_feedforwards, torque_feedforwards)
+
+
+    def stats(self):
+        """
+        Returns the burst send statistics.
+
+        Returns:
+            dict with the number of bursts and frames sent, and the last, mean and max burst latency in seconds.
+        """
+        return {
+            'bursts': self.bursts,
+            'frames': self.frames,
+            'last_burst_latency': self.last_burst_latency,
+            'mean_burst_latency': self.total_burst_latency / self.bursts if self.bursts else 0.0,
+            'max_burst_latency': self.max_burst_latency,
+        }
@@ -1,9 +1,14 @@
-from .odrivedatabase import OdriveDatabase
+from .odrivedatabase import OdriveDatabase, OdriveDatabaseWriter
+from .canbushub import CanBusHub
+from .telemetrybuffer import TelemetryRingBuffer
+from .telemetry import Telemetry, TelemetrySignal
+from .instrumentation import Instrumentation
 import asyncio
 import can
 import struct
 import time
 import subprocess
+import warnings
 
 
 
@@ -31,6 +36,13 @@ class ODriveCAN:
         mechanical_power   (float, optional): The calculated mechanical power being produced by the motor. Defaults to None.
         error_messages     (str, optional): Any error messages that are generated by the O-Drive. Defaults to None.
         database           (str): The path to the database file used for storing O-Drive data. Defaults to 'odrive_data.db'.
+                                  The file is only opened once data is saved. None runs without a database (telemetry only).
+        hub                (CanBusHub, optional): The shared CAN Bus hub this node attaches to. Defaults to the hub for canBusID, which is created on first use.
+        history_size       (int, optional): Keep this many recent samples of every signal group in ring buffers (requires numpy, see enable_history). Defaults to None (no history).
+        instrument         (bool): Record hot path latency statistics (see enable_instrumentation). Defaults to False.
+        command_ids        (iterable of int, optional): Only receive these command IDs from the O-Drive; the CAN bus filters
+                                                        out the others before they reach Python. Defaults to all command IDs.
+                                                        Include 0x01 (heartbeat) to use setAxisStateAsync.
         running            (bool): A flag indicating if the main event loop is running.
         active_error       (list of str): The current active error/s of the O-Drive will be added to this list. 
         disarm_reason      (list of str): The last error/s that occured on the O-Drive to cause it to disarm will be added to this list. 
@@ -38,9 +50,12 @@ class ODriveCAN:
 
     Methods:
         initCanBus():            Initializes the CAN bus connection.
-        flush_can_buffer():      Clears all messages from the CAN bus.
+        initCanBusAsync():       Initializes the CAN bus connection from a coroutine.
+        can_link_state():        Reads the link state of the CAN interface from sysfs.
         bus_shutdown():          Shuts down the CAN bus safely.
         setAxisState():          Sets the state of the O-Drive axis.
+        setAxisStateAsync():     Sets the state of the O-Drive axis and awaits the heartbeat confirming it without blocking.
+        is_odrive_idle_async():  Awaits the next heartbeat and checks if the O-Drive is idle without blocking.
         set_controller_mode():   Sets the control and input modes of the O-Drive.
         estop():                 Triggers an emergency stop.
         clear_errors():          Clears any errors and optionally flashes the status LED.
@@ -48,10 +63,22 @@ class ODriveCAN:
         set_position():          Sets the desired position for the motor.
         set_velocity():          Sets the desired velocity for the motor.
         set_torque():            Sets the desired torque for the motor.
+        start_streaming():       Sends a torque, velocity or position setpoint at a fixed, kernel timed rate.
+        update_stream():         Updates the streamed setpoint.
+        stop_streaming():        Stops streaming the setpoint.
+        register_decoder():      Registers a decoder for an extra cyclic CAN message.
         process_can_message():   Processes incoming CAN messages and updates the object's state.
+        snapshot():              Returns a consistent copy of the latest values with their timestamps and sequence numbers.
+        enable_instrumentation(): Records latency statistics of the receive, decode, save and send stages.
+        stats():                 Returns the recorded latency statistics.
+        enable_history():        Keeps recent samples of every signal group in ring buffers.
+        get_history():           Returns the ring buffer of a signal group for windowed queries.
         recv_all():              Asynchronously receives all messages from the CAN bus.
         save_data():             Asynchronously saves data to the database.
+        database_stats():        Returns the queue depth, dropped rows and flush latency of the database writer.
         get_velocity():          Returns the current velocity of the motor.
+        wait_for():              Waits for the next frame of a signal group without polling.
+        updates():               Asynchronously iterates over the updates of a signal group.
         run():                   Starts the main event loop for the class.
         
     Example Usage:
@@ -91,9 +118,6 @@ class ODriveCAN:
         # Start the asynchronous event loop
         odrive.run()
     """
-    # Class variable to track CAN bus setup status
-    can_setup_done = False
-
     def __init__(
             self,
             nodeID,
@@ -115,19 +139,31 @@ class ODriveCAN:
             error_messages = None,
             database='odrive_data.db',
             active_error = None,
-            disarm_reason = None
+            disarm_reason = None,
+            hub = None,
+            history_size = None,
+            instrument = False,
+            command_ids = None
             ):
     
         self.canBusID = canBusID
         self.canBusType = canBusType
         self.canBitRate = canBitRate
         self.nodeID = nodeID
-        self.canBus = can.interface.Bus(canBusID, bustype=canBusType)
-        self.database = OdriveDatabase(database)
+        #All nodes on the same CAN interface share one hub, so the interface is only set up, opened and read once.
+        self.hub = hub if hub is not None else CanBusHub.get_hub(canBusID, canBusType, canBitRate)
+        self.hub.attach(self, command_ids)
+        self.canBus = self.hub.canBus
+        #The database is opened on first use (see the database property), None runs without a database.
+        self.database_path = database
+        self.odrive_database = None
+        self.database_writer = None  # Writer thread used by save_data, started when data collection starts
         self.collected_data = []  # Initialize an empty list to store data
         self.start_time = time.time()  # Capture the start time when the object is initialized
         self.latest_data = {}
         self.running = True
+        #Latest decoded values with their receive timestamps and sequence numbers (see snapshot)
+        self.telemetry = Telemetry()
         #O-Drive Data
         self.position = position
         self.velocity = velocity
@@ -144,17 +180,75 @@ class ODriveCAN:
         self.error_messages = error_messages
         self.active_error = active_error
         self.disarm_reason = disarm_reason
-        #At the start of initalizeding the oject it will automatically check if the CAN Interface on the pi is set up correctly.
-        # Check if the CAN setup is already done by any instance
-        if not ODriveCAN.can_setup_done:
-            self.setup_can_interface()
-            time.sleep(1)
-            # The CAN setup will be attempted by setup_can_interface
-        else:
-            print("CAN bus setup already completed by another instance.")
+        #Latest heartbeat data
+        self.axis_error = None
+        self.axis_state = None
+        self.procedure_result = None
+        self.trajectory_done_flag = None
+        self.heartbeat_waiters = []  # Futures waiting for the next heartbeat (see setAxisStateAsync)
+        #Hot path latency statistics, None while instrumentation is disabled (see enable_instrumentation)
+        self.instrumentation = Instrumentation() if instrument else None
+        #Periodic setpoint sent by the kernel (see start_streaming)
+        self.stream_task = None
+        self.stream_message = None
+        self.stream_packer = None
+        #Decoders for the messages sent by this O-Drive, keyed by arbitration ID
+        self.decoders = {}
+        self.decoder_specs = {}
+        #Ring buffers with the recent samples of each signal group, keyed by group name (see enable_history)
+        self.history_size = history_size
+        self.history = {}
+        for cmd_id, (name, fmt, signals) in self.CYCLIC_MESSAGES.items():
+            self.register_decoder(cmd_id, fmt, signals, name=name)
+        self.register_decoder(0x03, '<II', callback=self.process_error_message, name='error')  # Get_Error
+        self.register_decoder(0x01, '<IBBB', ('axis_error', 'axis_state', 'procedure_result', 'trajectory_done_flag'), callback=self.process_heartbeat, name='heartbeat')  # Heartbeat
+
+
+    @property
+    def address(self):
+        """
+        The (CAN interface, node ID) pair identifying this O-Drive, e.g. ("can1", 0). See CanNetwork.
+        """
+        return (self.canBusID, self.nodeID)
+
+
+    @property
+    def database(self):
+        """
+        The OdriveDatabase O-Drive data is saved to, opened the first time it is used. None if the node was created with database=None.
+        """
+        if self.odrive_database is None and self.database_path is not None:
+            self.odrive_database = OdriveDatabase(self.database_path)
+        return self.odrive_database
+
+
+    @property
+    def running(self):
+        return self._running
+
+    @running.setter
+    def running(self, value):
+        # Let the shared hub know, so its read loop stops once no node on the bus is running.
+        self._running = value
+        self.hub.update_running()
+        if not value:
+            # Nothing will be received anymore, wake everything waiting for an update (see wait_for)
+            self.telemetry.notify_all()
 
 
 #----------------------------- CAN Bus Setup for Raspberry Pi START -----------------------------------------
+    def can_link_state(self):
+        """
+        Reads the operational state of this node's CAN interface from sysfs (see CanBusHub.link_state).
+
+        Example:
+            >>> odrive_can.can_link_state()
+            ...
+            ... 'up'
+        """
+        return self.hub.link_state()
+
+
     def try_candump(self):
         """
         Attempts to verify the operational status of the CAN interface by dumping CAN messages using the `candump` command. 
@@ -187,7 +281,6 @@ class ODriveCAN:
                 print("CAN interface is operational. Captured messages:")
                 for line in lines:
                     print(line)
-                ODriveCAN.can_setup_done = True #Set can setup flag true so another instance doesn't run this again.
                 return True
         except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
             print(f"CAN interface might not be operational or `candump` command failed. Error: {e}")
@@ -195,74 +288,10 @@ class ODriveCAN:
 
     def setup_can_interface(self):
         """
-        Attempts to set up the CAN interface only if it's not already operational and will reset and restart if necessary.
-
-        This method first checks if the CAN interface is operational by attempting to dump CAN messages.
-        If messages are successfully dumped, indicating the interface is operational, the method exits without making changes.
-        If the interface is already in use or encounters an error, the method attempts to reset and restart the interface before trying the setup again. 
-        After a successful setup, it verifies the operational status of the interface by capturing CAN messages.
-
-        The method executes several commands to configure the CAN interface:
-        
-        1. Setup Command:
-            - `sudo ip link set can0 up type can bitrate 250000`: This command configures the CAN interface `can0` with a specified bitrate (250000 bits per second in this example). 
-            It sets the interface type to CAN and brings it up, making it ready for communication.
-        
-        2. Reset Command:
-            - `sudo /sbin/ip link set can0 down`: This command brings the CAN interface `can0` down, effectively resetting its configuration. 
-            This is useful for clearing any existing state before attempting to reconfigure the interface.
-        
-        3. Restart Command:
-            - `sudo ip link set can0 type can restart-ms 100`: After resetting, this command sets the interface to automatically restart in case of errors, with a restart delay specified by `restart-ms` (100 milliseconds in this case). 
-            This helps in recovering from transient errors without manual intervention.
-        
-        If the initial setup attempt detects the interface as "busy," indicating it's already in use or cannot be configured as requested, the method performs a reset followed by a restart command before attempting the setup again. 
-        This ensures that any lingering issues are cleared and the interface is correctly configured for CAN communication.
-
-        After successfully configuring the interface, the method verifies the setup by attempting to capture CAN messages, ensuring the interface is fully operational and ready for use.
-
-        Raises:
-            Exception: If the setup process fails after retrying, including after a reset and restart attempt.
+        Sets up this node's CAN interface if it is not up yet (see CanBusHub.setup_interface). The hub does this
+        once per interface when it is created, so this is only needed to set the interface up again.
         """
-        
-
-        # Commands for setting up, resetting, and restarting the CAN interface
-        setup_command = ["sudo", "ip", "link", "set", self.canBusID, "up", "type", "can", "bitrate", str(self.canBitRate)]
-        reset_command = ["sudo", "/sbin/ip", "link", "set", self.canBusID, "down"]
-        restart_command = ["sudo", "ip", "link", "set", self.canBusID, "type", "can", "restart-ms", "100"]
-        # Command to dump CAN messages for verification
-       
-        
-        try:
-            # First, check if the CAN interface is already operational.
-            if self.try_candump():
-                print(f"CAN interface {self.canBusID} is already operational. Skipping setup.")
-                return  # Exit the method early if CAN interface is operational.
-            # Attempt to set up the CAN interface
-            subprocess.run(setup_command, check=True, stderr=subprocess.PIPE, text=True)
-            print("CAN interface setup successfully.")
-            # Mark the setup as done to prevent future attempts within this instance
-            ODriveCAN.can_setup_done = True  # Set can setup flag true so another instance doesn't run this again.
-        except subprocess.CalledProcessError as e:
-            if "Device or resource busy" in e.stderr:
-                print("Device or resource busy, attempting to reset and restart...")
-                # Reset and restart the CAN interface
-                subprocess.run(reset_command, check=True)
-                time.sleep(2)
-                subprocess.run(restart_command, check=True)
-                print("CAN interface restart attempted. Retrying setup...")
-                time.sleep(2)
-                # Retry the setup command
-                subprocess.run(setup_command, check=True)
-                # Verify setup with candump again
-                if self.try_candump():
-                    ODriveCAN.can_setup_done = True  # Again, set flag true only after successful verification
-                    print("CAN setup verified successfully after reset and restart.")
-                else:
-                    raise Exception("Failed to verify CAN setup after reset and restart.")
-            else:
-                print(f"Error setting up CAN interface: {e.stderr}")
-                raise
+        self.hub.setup_interface()
 
 
 #----------------------------- CAN Bus Setup for Raspberry Pi END -----------------------------------------
@@ -276,26 +305,50 @@ class ODriveCAN:
         canBusID (String): Default "can0" this is the name of the can interface
         canBus (String): Default "socketcan" this is the python can libary CAN type
 
-        This will first clear all the buffer messages on the CAN bus, then it will set the axis state to the default "closed_loop_control"
+        The CAN bus itself is opened once by the shared CanBusHub, so this reuses the hub's bus rather than opening a second one.
+        It then sets the axis state to the default "closed_loop_control" (see setAxisState). From a coroutine, await
+        initCanBusAsync instead.
         """
-         # Create and assign the CAN bus interface object to self.canBus
-        self.canBus = can.interface.Bus(self.canBusID, bustype=self.canBusType)
+        # Use the CAN bus interface object owned by the shared hub
+        self.canBus = self.hub.canBus
 
         #Set Axis State
         self.setAxisState()
-        
+
+
+    async def initCanBusAsync(self):
+        """
+        Initalize connection to CAN Bus from a coroutine, like initCanBus, awaiting the heartbeat confirming "closed_loop_control"
+        (see setAxisStateAsync) without blocking the event loop.
+
+        Returns:
+            bool: True if a heartbeat confirmed closed loop control.
+
+        Example:
+            >>> await odrive.initCanBusAsync()
+        """
+        # Use the CAN bus interface object owned by the shared hub
+        self.canBus = self.hub.canBus
+
+        #Set Axis State
+        return await self.setAxisStateAsync()
+
 
     def flush_can_buffer(self):
         """
-        Flushes the CAN receive buffer to clear any pending messages.
+        Deprecated: the CanBusHub decodes every frame as it arrives, so there is no stale receive buffer to flush.
+
+        Kept for existing programs. While the hub's read loop isn't running, it still drops the frames waiting on the bus.
 
         Example:
             >>> odrive_can.flush_can_buffer()
             ...
             ... CAN BUS Flushed.
         """
-        #Flush CAN RX buffer to ensure no old pending messages.
-        while not (self.canBus.recv(timeout=0) is None): pass
+        warnings.warn("flush_can_buffer() is deprecated, the CanBusHub decodes every frame as it arrives.", DeprecationWarning, stacklevel=2)
+        # Never take frames away from a running read loop, the other nodes on the bus need them.
+        if not self.hub.health()['reading']:
+            while not (self.canBus.recv(timeout=0) is None): pass
         print("CAN BUS Flushed.")
 
 
@@ -303,6 +356,8 @@ class ODriveCAN:
     def bus_shutdown(self):
         """
         Run this method at the end of your program to shundown the can bus to prevent can errors.
+        The node is detached from its CanBusHub, and the shared bus is shut down once the last node on it detaches.
+        Any O-Drive data still queued for the database is written first.
 
         Example:
         >>> import pyodrivecan
@@ -311,20 +366,54 @@ class ODriveCAN:
         ... Can bus successfully shut down.
         """
 
-        self.canBus.shutdown()
+        self.stop_streaming()
+        if self.database_writer is not None:
+            self.database_writer.release()
+            self.database_writer = None
+        if self.odrive_database is not None:
+            self.odrive_database.close()
+            self.odrive_database = None
+        self.hub.detach(self)
 
         print("Can bus successfully shut down.")
 
 
 #-------------------------------------- Set Axis State ------------------------------------------------
-    def setAxisState(self, axis_state_name = "closed_loop_control"):
+    # Mapping from axis state names to their corresponding codes
+    AXIS_STATES = {
+        "undefined": 0,
+        "idle": 1,
+        "startup_sequence": 2,
+        "full_calibration_sequence": 3,
+        "motor_calibration": 4,
+        "encoder_index_search": 6,
+        "encoder_offset_calibration": 7,
+        "closed_loop_control": 8,
+        "lockin_spin": 9,
+        "encoder_dir_find": 10,
+        "homing": 11,
+        "encoder_hall_polarity_calibration": 12,
+        "encoder_hall_phase_calibration": 13,
+        "anticogging_calibration": 14
+    }
+
+    # Reverse mapping from codes to state names for reporting purposes
+    AXIS_STATE_NAMES = {code: name for name, code in AXIS_STATES.items()}
+
+    def setAxisState(self, axis_state_name = "closed_loop_control", timeout=5):
         """
         Sets the Axis State of an ODrive Controller through CAN Bus using a human-readable state name.
-        After sending the set state command, it listens for a heartbeat message to confirm the state change.
+        After sending the set state command, it waits for a heartbeat message to confirm the state change.
+
+        The heartbeat is decoded by the hub's read loop like every other frame (see setAxisStateAsync), so waiting for it
+        never takes frames away from the other nodes on the bus. Called outside of an event loop, this runs the read loop
+        until the state is confirmed or timeout seconds passed. Called from a coroutine, blocking would stall the event
+        loop that decodes the heartbeat, so it raises instead; await setAxisStateAsync there.
 
         Parameters:
             axis_state_name (str): The desired state to set for the axis, specified as a text string corresponding to the state names.
-            axis_state_name    (str): The default axis state to which the O-Drive should be set. Defaults to "closed_loop_control".
+                                   Defaults to "closed_loop_control".
+            timeout         (float): Max seconds to wait for the confirmation. Defaults to 5.
 
         Supported Axis States:
             - "undefined"
@@ -342,40 +431,112 @@ class ODriveCAN:
             - "encoder_hall_phase_calibration"
             - "anticogging_calibration"
 
+        Returns:
+            bool: True if a heartbeat confirmed the new state.
+
+        Raises:
+            RuntimeError: If called while an event loop is running in this thread.
+
         Example:
             # Set the ODrive axis to Closed Loop Control
             >>> odrive_can.setAxisState("closed_loop_control")
         """
-        # Mapping from state names to their corresponding codes
-        state_codes = {
-            "undefined": 0,
-            "idle": 1,
-            "startup_sequence": 2,
-            "full_calibration_sequence": 3,
-            "motor_calibration": 4,
-            "encoder_index_search": 6,
-            "encoder_offset_calibration": 7,
-            "closed_loop_control": 8,
-            "lockin_spin": 9,
-            "encoder_dir_find": 10,
-            "homing": 11,
-            "encoder_hall_polarity_calibration": 12,
-            "encoder_hall_phase_calibration": 13,
-            "anticogging_calibration": 14
-        }
+        if self.event_loop_running():
+            raise RuntimeError("setAxisState() would block the running event loop, await setAxisStateAsync() instead.")
+        return asyncio.run(self.setAxisStateAsync(axis_state_name, timeout))
+
+
+#----------------------------------------- Check Axis State Idle --------------------------------------------------------
+            
+    def is_odrive_idle(self, timeout=5):
+        """
+        Checks if the ODrive is in the IDLE state, waiting for its next heartbeat as decoded by the hub's read loop.
+
+        This blocks until the heartbeat arrives, so it can't be called from a coroutine; await is_odrive_idle_async instead.
+
+        Parameters:
+            timeout (float): Max seconds to wait for a heartbeat. Defaults to 5.
+
+        Returns:
+            bool: True if the ODrive is in the IDLE state, False otherwise.
+
+        Raises:
+            RuntimeError: If called while an event loop is running in this thread.
+        """
+        if self.event_loop_running():
+            raise RuntimeError("is_odrive_idle() would block the running event loop, await is_odrive_idle_async() instead.")
+        print(f"Checking if ODrive {self.nodeID} is in IDLE state...")
+        return asyncio.run(self.is_odrive_idle_async(timeout))
+
+
+    @staticmethod
+    def event_loop_running():
+        """
+        Returns True if an asyncio event loop is running in the calling thread.
+        """
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+
+#----------------------------------------- Async Axis State --------------------------------------------------------
+
+    async def wait_for_heartbeat(self, timeout):
+        """
+        Waits for the next heartbeat message (0x01) from this O-Drive, as decoded by the receive loop.
+
+        Parameters:
+            timeout (float): Max seconds to wait.
+
+        Returns:
+            int: The axis state reported by the heartbeat, or None if no heartbeat arrived before the timeout.
+        """
+        # Make sure the shared receive loop is running, otherwise no heartbeat would ever be decoded.
+        self.hub.start()
+        future = asyncio.get_running_loop().create_future()
+        self.heartbeat_waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+    def process_heartbeat(self, axis_error, axis_state, procedure_result, trajectory_done_flag):
+        """
+        Decodes a heartbeat message (0x01) and wakes every coroutine waiting for one.
+        """
+        waiters, self.heartbeat_waiters = self.heartbeat_waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(axis_state)
 
-        # Reverse mapping from codes to state names for reporting purposes
-        state_names = {code: name for name, code in state_codes.items()}
 
-        if axis_state_name not in state_codes:
+    async def setAxisStateAsync(self, axis_state_name = "closed_loop_control", timeout=5):
+        """
+        Sets the Axis State of an ODrive Controller and waits, without blocking the event loop, until a heartbeat confirms it.
+
+        Other nodes keep being serviced while it waits, and several nodes can change state concurrently. The receive loop (recv_all) is started if it is not running yet.
+
+        Parameters:
+            axis_state_name (str): The desired state, see setAxisState for the supported names. Defaults to "closed_loop_control".
+            timeout (float): Max seconds to wait for the confirmation. Defaults to 5.
+
+        Returns:
+            bool: True if a heartbeat confirmed the new state before the timeout, False otherwise.
+
+        Example:
+            # Put two O-Drives in closed loop control at the same time
+            >>> await asyncio.gather(odrive1.setAxisStateAsync("closed_loop_control"), odrive2.setAxisStateAsync("closed_loop_control"))
+        """
+        if axis_state_name not in self.AXIS_STATES:
             print(f"Unsupported axis state: {axis_state_name}. Please check the state name.")
-            return
+            return False
 
-        axis_requested_state = state_codes[axis_state_name]
+        axis_requested_state = self.AXIS_STATES[axis_state_name]
 
         try:
-            self.flush_can_buffer() #Flush all current can bus messages
-            # Send the set state command with a timeout
             self.canBus.send(
                 can.Message(
                     arbitration_id=(self.nodeID << 5 | 0x07),  # 0x07: Set_Axis_State command ID
@@ -384,80 +545,54 @@ class ODriveCAN:
                 ),
                 timeout=0.5  # Timeout of 0.5 seconds
             )
-            print(f"Axis state set command sent for {axis_state_name} ({axis_requested_state}) to ODrive {self.nodeID}.")
-            
-            # Now we wait for a heartbeat message to confirm the new state
-            #print(f"Waiting for confirmation from ODrive {self.nodeID}...")
-            start_time = time.time()
-            while time.time() - start_time < 5:  # Wait for up to 5 seconds for confirmation
-                msg = self.canBus.recv(timeout=0.5)  # Adjust timeout as needed
-                if msg and (msg.arbitration_id == (self.nodeID << 5 | 0x01)):  # 0x01: Heartbeat
-                    _, state, _, _ = struct.unpack('<IBBB', bytes(msg.data[:7]))
-                    if state == axis_requested_state:
-                        print(f"Confirmation received: ODrive {self.nodeID} is now in state {axis_state_name}.")
-                        return
-                    else:
-                        # Retrieve the actual state name from the code
-                        actual_state_name = state_names.get(state, "Unknown State")
-                        print(f"ODrive {self.nodeID} did not enter {axis_state_name}. It is currently in {actual_state_name}.")
-                        return
-                elif msg:
-                    continue # Skip any non-heartbeat messages
-                else:
-                    # If no message is received within the timeout, print an error message
-                    print(f"No confirmation received from ODrive {self.nodeID}. Please check the device.")
-                    return
-
         except Exception as e:
             print(f"Error setting axis state for ODrive {self.nodeID}: {str(e)}")
+            return False
+        print(f"Axis state set command sent for {axis_state_name} ({axis_requested_state}) to ODrive {self.nodeID}.")
+
+        # The heartbeat sent right after the command may still report the old state, so wait until it changes or time runs out.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        state = None
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            heartbeat_state = await self.wait_for_heartbeat(remaining)
+            if heartbeat_state is None:
+                break
+            state = heartbeat_state
+            if state == axis_requested_state:
+                print(f"Confirmation received: ODrive {self.nodeID} is now in state {axis_state_name}.")
+                return True
 
+        if state is None:
+            print(f"No confirmation received from ODrive {self.nodeID}. Please check the device.")
+        else:
+            actual_state_name = self.AXIS_STATE_NAMES.get(state, "Unknown State")
+            print(f"ODrive {self.nodeID} did not enter {axis_state_name}. It is currently in {actual_state_name}.")
+        return False
 
-#----------------------------------------- Check Axis State Idle --------------------------------------------------------
-            
-    def is_odrive_idle(self):
+
+    async def is_odrive_idle_async(self, timeout=5):
         """
-        Checks if the ODrive is in the IDLE state.
+        Checks if the ODrive is in the IDLE state by waiting, without blocking the event loop, for its next heartbeat.
+
+        Parameters:
+            timeout (float): Max seconds to wait for a heartbeat. Defaults to 5.
 
         Returns:
             bool: True if the ODrive is in the IDLE state, False otherwise.
         """
-        state_names = {
-            0: "undefined",
-            1: "idle",
-            2: "startup_sequence",
-            3: "full_calibration_sequence",
-            4: "motor_calibration",
-            6: "encoder_index_search",
-            7: "encoder_offset_calibration",
-            8: "closed_loop_control",
-            9: "lockin_spin",
-            10: "encoder_dir_find",
-            11: "homing",
-            12: "encoder_hall_polarity_calibration",
-            13: "encoder_hall_phase_calibration",
-            14: "anticogging_calibration"
-        }
-        idle_state_code = 1  # The code for the IDLE state
-
-        # Send a command to request the current state, or just wait for the next heartbeat message
-        print(f"Checking if ODrive {self.nodeID} is in IDLE state...")
-        start_time = time.time()
-        while time.time() - start_time < 5:  # Wait for up to 5 seconds for a heartbeat message
-            msg = self.canBus.recv(timeout=0.5)  # Adjust timeout as needed
-            if msg and (msg.arbitration_id == (self.nodeID << 5 | 0x01)):  # 0x01: Heartbeat
-                _, state, _, _ = struct.unpack('<IBBB', bytes(msg.data[:7]))
-                if state == idle_state_code:
-                    print(f"ODrive {self.nodeID} is in IDLE state.")
-                    return True
-                else:
-                    actual_state_name = state_names.get(state, "Unknown State")
-                    print(f"ODrive {self.nodeID} is in {actual_state_name} state.")
-                    return False
-            elif msg:
-                continue  # Skip any non-heartbeat messages
-
-        print(f"No state information received from ODrive {self.nodeID}.")
-        return False
+        state = await self.wait_for_heartbeat(timeout)
+        if state is None:
+            print(f"No state information received from ODrive {self.nodeID}.")
+            return False
+        if state != self.AXIS_STATES["idle"]:
+            print(f"ODrive {self.nodeID} is in {self.AXIS_STATE_NAMES.get(state, 'Unknown State')} state.")
+            return False
+        print(f"ODrive {self.nodeID} is in IDLE state.")
+        return True
 
 
 #----------------------------------------- Set Controller Mode --------------------------------------------------------
@@ -616,6 +751,27 @@ class ODriveCAN:
         Command ID: 0x16 (Host → ODrive)
 
         Note: The axis must be in the IDLE state before performing this action.
+
+        Waiting for the heartbeat that confirms the IDLE state blocks, so from a coroutine await reboot_save_async instead.
+
+        Raises:
+            RuntimeError: If called while an event loop is running in this thread.
+        """
+        if self.event_loop_running():
+            raise RuntimeError("reboot_save() would block the running event loop, await reboot_save_async() instead.")
+        asyncio.run(self.reboot_save_async(action))
+
+
+    async def reboot_save_async(self, action='save'):
+        """
+        Reboots the ODrive or performs related actions like reboot_save, awaiting the heartbeat that confirms the IDLE
+        state without blocking the event loop.
+
+        Parameters:
+            action (str): 'reboot', 'save', 'erase' or 'dfu', see reboot_save.
+
+        Example:
+            >>> await odrive.reboot_save_async('save')
         """
         actions = {
             'reboot': 0,
@@ -629,7 +785,8 @@ class ODriveCAN:
             return
 
         # Check if ODrive is in IDLE state before proceeding
-        if not self.is_odrive_idle():
+        print(f"Checking if ODrive {self.nodeID} is in IDLE state...")
+        if not await self.is_odrive_idle_async():
             print(f"ODrive {self.nodeID} is not in IDLE state. Cannot perform {action} action.")
             return
 
@@ -798,11 +955,15 @@ class ODriveCAN:
             >>> odrive_can.set_position(1000.0)
         """
 
-        self.canBus.send(can.Message(
+        message = can.Message(
             arbitration_id=(self.nodeID << 5 | 0x0C),
             data=struct.pack('<fhh', float(position), velocity_feedforward, torque_feedforward),
             is_extended_id=False
-        ))
+        )
+        if self.instrumentation is None:
+            self.canBus.send(message)
+        else:
+            self.instrumentation.timed_send(self.canBus, message, 'send.set_position')
         #print(f"Successfully moved ODrive {self.nodeID} to {position}")
         
 
@@ -819,11 +980,15 @@ class ODriveCAN:
             >>> odrive_can.set_velocity(2.0)
         """
 
-        self.canBus.send(can.Message(
+        message = can.Message(
             arbitration_id=(self.nodeID << 5 | 0x0d),  # 0x0d: Set_Input_Vel
             data=struct.pack('<ff', velocity, torque_feedforward),
             is_extended_id=False
-        ))
+        )
+        if self.instrumentation is None:
+            self.canBus.send(message)
+        else:
+            self.instrumentation.timed_send(self.canBus, message, 'send.set_velocity')
 
 
     # Function to set torque for a specific O-Drive
@@ -838,14 +1003,112 @@ class ODriveCAN:
             >>> odrive_can.set_torque(0.1)
         """
         
-        self.canBus.send(can.Message(
+        message = can.Message(
             arbitration_id=(self.nodeID << 5 | 0x0E),  # 0x0E: Set_Input_Torque
             data=struct.pack('<f', torque),
             is_extended_id=False
-        ))
+        )
+        if self.instrumentation is None:
+            self.canBus.send(message)
+        else:
+            self.instrumentation.timed_send(self.canBus, message, 'send.set_torque')
         #print(f"Successfully set ODrive {self.nodeID} to {torque} [Nm]")
 #-------------------------------------- Motor Controls END-------------------------------------------------
 
+#-------------------------------------- Setpoint Streaming ------------------------------------------------
+    # Setpoint command: (command ID, struct format of the payload)
+    SETPOINT_COMMANDS = {
+        "position": (0x0C, '<fhh'),  # Set_Input_Pos
+        "velocity": (0x0D, '<ff'),   # Set_Input_Vel
+        "torque": (0x0E, '<f'),      # Set_Input_Torque
+    }
+
+    def start_streaming(self, mode, period, *setpoint):
+        """
+        Starts sending a setpoint command at a fixed rate, timed by the kernel instead of a Python loop.
+
+        The frame is handed to python-can's send_periodic, which uses the SocketCAN broadcast manager on Linux, so the
+        transmit rate stays steady through garbage collection pauses and scheduler hiccups. Use update_stream to change
+        the setpoint; only the payload is updated, the kernel keeps its timer. Interfaces without a broadcast manager
+        fall back to python-can's thread based periodic sender.
+
+        Parameters:
+            mode     (str): "torque", "velocity" or "position".
+            period   (float): Seconds between frames, e.g. 0.001 for 1 kHz.
+            setpoint (float): The initial payload values, as for set_torque, set_velocity or set_position. Defaults to 0.
+
+        Example:
+            # Stream Set_Input_Torque at 1 kHz and update it from the controller
+            >>> odrive_can.start_streaming("torque", 0.001, 0.0)
+            >>> odrive_can.update_stream(0.05)
+            >>> odrive_can.stop_streaming()
+        """
+        if mode not in self.SETPOINT_COMMANDS:
+            print(f"Invalid streaming mode '{mode}'. Must be one of {list(self.SETPOINT_COMMANDS.keys())}.")
+            return
+        cmd_id, fmt = self.SETPOINT_COMMANDS[mode]
+        packer = struct.Struct(fmt)
+        data = packer.pack(*self.stream_payload(packer, setpoint))
+        self.stop_streaming()
+        self.stream_message = can.Message(
+            arbitration_id=(self.nodeID << 5 | cmd_id),
+            data=data,
+            is_extended_id=False
+        )
+        self.stream_packer = packer
+        self.stream_task = self.canBus.send_periodic(self.stream_message, period)
+        print(f"Streaming {mode} setpoints every {period} s to ODrive {self.nodeID}.")
+
+
+    def update_stream(self, *setpoint):
+        """
+        Updates the setpoint sent by start_streaming. The payload is packed in place and handed to the running task.
+
+        Parameters:
+            setpoint (float): The new payload values, as for start_streaming, e.g. the torque in Nm for "torque" streaming.
+                              Missing feedforward values default to 0.
+
+        Raises:
+            RuntimeError: If nothing is being streamed (start_streaming was not called, or stop_streaming was).
+
+        Example:
+            >>> odrive_can.update_stream(0.1)
+        """
+        if self.stream_task is None:
+            raise RuntimeError(f"No setpoint stream is active on ODrive {self.nodeID}, call start_streaming first.")
+        self.stream_packer.pack_into(self.stream_message.data, 0, *self.stream_payload(self.stream_packer, setpoint))
+        self.stream_task.modify_data(self.stream_message)
+
+
+    @staticmethod
+    def stream_payload(packer, setpoint):
+        """
+        Returns the values packed into a streamed setpoint frame. Missing feedforward values default to 0 like in
+        set_velocity and set_position, the integer fields (the feedforwards of "position") are truncated to int
+        and the others converted to float.
+
+        Raises:
+            ValueError: If more values are given than the frame holds.
+        """
+        fields = packer.format.lstrip('<>=!@')
+        if len(setpoint) > len(fields):
+            raise ValueError(f"Expected at most {len(fields)} setpoint values, got {len(setpoint)}.")
+        values = tuple(setpoint) + (0,) * (len(fields) - len(setpoint))
+        return tuple(int(value) if field == 'h' else float(value) for field, value in zip(fields, values))
+
+
+    def stop_streaming(self):
+        """
+        Stops sending the setpoint started with start_streaming. Does nothing if nothing is being streamed.
+        """
+        if self.stream_task is not None:
+            self.stream_task.stop()
+            self.stream_task = None
+            print(f"Stopped streaming setpoints to ODrive {self.nodeID}.")
+
+
+
+
 
 
 
@@ -882,114 +1145,410 @@ class ODriveCAN:
     }
         
 
+    # Cyclic messages decoded by default.
+    # Command ID: (signal group name, struct format, attributes the unpacked values are stored in)
+    CYCLIC_MESSAGES = {
+        0x09: ('encoder', '<ff', ('position', 'velocity')),                   # Get_Encoder_Estimates
+        0x1C: ('torques', '<ff', ('torque_target', 'torque_estimate')),       # Get_Torques
+        0x17: ('bus', '<ff', ('bus_voltage', 'bus_current')),                 # Get_Bus_Voltage_Current
+        0x14: ('iq', '<ff', ('iq_setpoint', 'iq_measured')),                  # Get_Iq
+        0x1D: ('powers', '<ff', ('electrical_power', 'mechanical_power')),    # Get_Powers
+        0x15: ('temperature', '<ff', ('fet_temp', 'motor_temp')),             # Get_Temperature
+    }
+
+    # The decoded signals live in self.telemetry, these read and write them as attributes of the node.
+    position = TelemetrySignal()
+    velocity = TelemetrySignal()
+    torque_target = TelemetrySignal()
+    torque_estimate = TelemetrySignal()
+    bus_voltage = TelemetrySignal()
+    bus_current = TelemetrySignal()
+    iq_setpoint = TelemetrySignal()
+    iq_measured = TelemetrySignal()
+    electrical_power = TelemetrySignal()
+    mechanical_power = TelemetrySignal()
+    fet_temp = TelemetrySignal()
+    motor_temp = TelemetrySignal()
+    axis_error = TelemetrySignal()
+    axis_state = TelemetrySignal()
+    procedure_result = TelemetrySignal()
+    trajectory_done_flag = TelemetrySignal()
+
+
+    def __getattr__(self, name):
+        # Only called for names that aren't attributes, i.e. the signals of decoders registered at runtime.
+        telemetry = self.__dict__.get('telemetry')
+        if telemetry is not None and name in telemetry.index:
+            return telemetry.get(name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+
+    def snapshot(self, out=None):
+        """
+        Returns a consistent copy of the latest decoded values of this O-Drive, with the receive timestamp and
+        sequence number of every signal group, so a controller can check the values are fresh before using them.
+
+        Parameters:
+            out (TelemetrySnapshot, optional): A snapshot returned by an earlier call to copy into, so calling this every
+                                               control tick allocates nothing. Defaults to a new snapshot.
+
+        Example:
+            >>> snapshot = odrive_can.snapshot()
+            >>> if snapshot.sequence('encoder') > last_sequence and snapshot.age('encoder', time.time()) < 0.01:
+            ...     odrive_can.set_torque(-0.1 * snapshot.velocity)
+        """
+        return self.telemetry.snapshot(out)
+
+
+    def register_decoder(self, cmd_id, fmt, signals=(), callback=None, name=None):
+        """
+        Registers a decoder for a CAN message sent by this O-Drive, so extra cyclic messages can be decoded without subclassing.
+
+        The struct format and decode function are built once here, so decoding a frame is a single dictionary lookup plus one unpack.
+        Registering a decoder for a command ID that already has one replaces it.
+
+        Parameters:
+            cmd_id   (int): The CAN Simple command ID of the message (e.g. 0x0A for Get_Encoder_Count).
+            fmt      (str): The struct format of the message data (e.g. '<ii').
+            signals  (tuple of str): Names the unpacked values are stored under in the telemetry record, in order. They can be read
+                                     as attributes of the node (e.g. odrive_can.shadow_count) or from a snapshot(). Defaults to none.
+            callback (callable, optional): Called with the unpacked values after the signals have been stored.
+            name     (str, optional): The name of this group of signals (used by the telemetry history). Defaults to the command ID in hex, e.g. "0x0a".
+
+        Example:
+            # Store Get_Encoder_Count as odrive.shadow_count and odrive.count_cpr
+            >>> odrive_can.register_decoder(0x0A, '<ii', ('shadow_count', 'count_cpr'), name='encoder_count')
+
+            # Handle a message yourself
+            >>> odrive_can.register_decoder(0x0A, '<ii', callback=lambda shadow_count, count_cpr: print(shadow_count))
+        """
+        if name is None:
+            name = f"0x{cmd_id:02x}"
+        self.decoder_specs[cmd_id] = (name, struct.Struct(fmt).unpack_from, tuple(signals), callback)
+        if signals:
+            self.telemetry.add_group(name, signals)
+        if self.history_size and signals and name not in self.history:
+            self.history[name] = TelemetryRingBuffer(signals, self.history_size)
+        self.decoders[self.nodeID << 5 | cmd_id] = self.build_decoder(cmd_id)
+
+
+    def build_decoder(self, cmd_id):
+        # Build the decode function once, with fast paths for the common two value cyclic messages and for callbacks only.
+        name, unpack, signals, callback = self.decoder_specs[cmd_id]
+        history = self.history.get(name) if signals else None
+        telemetry = self.telemetry
+        values, timestamps, sequences, waiters = telemetry.values, telemetry.timestamps, telemetry.sequences, telemetry.waiters
+        indexes = tuple(telemetry.index[signal] for signal in signals)
+        group = telemetry.group_index[name] if signals else None
+
+        if len(signals) == 2 and callback is None and history is None:
+            first, second = indexes
+            def decode(message):
+                values[first], values[second] = unpack(message.data)
+                timestamps[group] = message.timestamp
+                sequences[group] += 1
+                if waiters[group]:
+                    telemetry.notify(group)
+        elif not signals:
+            def decode(message):
+                if callback is not None:
+                    callback(*unpack(message.data))
+        else:
+            def decode(message):
+                unpacked = unpack(message.data)
+                for index, value in zip(indexes, unpacked):
+                    values[index] = value
+                timestamps[group] = message.timestamp
+                sequences[group] += 1
+                if waiters[group]:
+                    telemetry.notify(group)
+                if history is not None:
+                    history.append(message.timestamp, unpacked)
+                if callback is not None:
+                    callback(*unpacked)
+        return decode
+
+
+    def unregister_decoder(self, cmd_id):
+        """
+        Removes the decoder for a command ID, so the message is ignored from then on.
+
+        Parameters:
+            cmd_id (int): The CAN Simple command ID of the message.
+        """
+        self.decoder_specs.pop(cmd_id, None)
+        self.decoders.pop(self.nodeID << 5 | cmd_id, None)
+
+
     def process_can_message(self, message):
         """
         Processes received CAN messages and updates the latest data.
+
+        The decoder for the message is found with one lookup on its arbitration ID (see `register_decoder`).
         """
-        
-        arbitration_id = message.arbitration_id
-        data = message.data
-        if arbitration_id == (self.nodeID << 5 | 0x09):  # Encoder estimate
-            position, velocity = struct.unpack('<ff', data)
-            self.position = position
-            self.velocity = velocity
-            #print(f"Encoder Estimate - Position: {position:.3f} turns, Velocity: {velocity:.3f} turns/s")
-        elif arbitration_id == (self.nodeID << 5 | 0x1C):  # Torque
-            torque_target, torque_estimate = struct.unpack('<ff', data)
-            self.torque_target = torque_target
-            self.torque_estimate = torque_estimate
-            #print(f"Torque - Target: {torque_target:.3f} Nm, Estimate: {torque_estimate:.3f} Nm")
-        elif arbitration_id == (self.nodeID << 5 | 0x17):  # Bus voltage and current
-            bus_voltage, bus_current = struct.unpack('<ff', data)
-            self.bus_voltage = bus_voltage
-            self.bus_current = bus_current
-            #print(f"Bus Voltage and Current - Voltage: {bus_voltage:.3f} V, Current: {bus_current:.3f} A")
-        elif arbitration_id == (self.nodeID << 5 | 0x14):  # IQ setpoint and measured
-            iq_setpoint, iq_measured = struct.unpack('<ff', data)
-            self.iq_setpoint = iq_setpoint
-            self.iq_measured = iq_measured
-            #print(f"IQ Setpoint and Measured - Setpoint: {iq_setpoint:.3f} A, Measured: {iq_measured:.3f} A")
-        elif arbitration_id == (self.nodeID << 5 | 0x1D):  # Powers
-            electrical_power, mechanical_power = struct.unpack('<ff', data)
-            self.electrical_power = electrical_power
-            self.mechanical_power = mechanical_power
-            #print(f"Powers - Electrical: {electrical_power:.3f} W, Mechanical: {mechanical_power:.3f} W")
-        elif arbitration_id == (self.nodeID << 5 | 0x15): # Get_Temperature
-            fet_temp, motor_temp = struct.unpack('<ff', data)
-            self.fet_temp = fet_temp
-            self.motor_temp = motor_temp
-            #print(f"Temps - FET: {fet_temp:.3f} C, Motor: {motor_temp:.3f} C")
-        elif arbitration_id == (self.nodeID << 5 | 0x03):  # Get_Error message
-            active_errors, disarm_reason = struct.unpack('<II', data)
-            # Decode and print active errors
-            if active_errors != 0:  # Check if there are any active errors
-                errors = [description for code, description in self.ERROR_CODES.items() if active_errors & code]
-                self.active_error = ', '.join(errors)
-                print(f"ODrive {self.nodeID} Active Errors: {self.active_error}")
-                #Do I want to set self.running to flase here so it will stop datacollection loop running? 
+        decode = self.decoders.get(message.arbitration_id)
+        if decode is not None:
+            if self.instrumentation is None:
+                decode(message)
             else:
-                #print(f"ODrive {self.nodeID} No active errors.")
-                pass
-            
-            # Decode and print disarm reason
-            if disarm_reason != 0:  # Check if there is a disarm reason
-                reasons = [description for code, description in self.ERROR_CODES.items() if disarm_reason & code]
-                self.disarm_reason = ', '.join(reasons)
-                print(f"ODrive {self.nodeID} Disarm Reason: {self.disarm_reason}")
-                #Do I want to set self.running to flase here so it will stop datacollection loop running? 
-            else:
-                #print(f"ODrive {self.nodeID} No disarm reason.")
-                pass
+                self.instrumentation.decode_message(decode, message)
+
+
+#-------------------------------------- Instrumentation ----------------------------------------------------
+
+    def enable_instrumentation(self):
+        """
+        Starts recording latency statistics of the hot path stages of this node: frame receive (kernel timestamp to
+        decode), process_can_message decode, save_data inserts and each set_position, set_velocity and set_torque send.
+
+        While instrumentation is disabled the hot path only checks that it is disabled.
+
+        Example:
+            >>> odrive_can.enable_instrumentation()
+            >>> odrive_can.stats()
+            ...
+            ... {'receive': {'count': 1200, 'mean': 8.1e-05, 'p50': 6.4e-05, 'p99': 0.000256, 'max': 0.0011}, 'decode': {...}, ...}
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation()
+
+
+    def disable_instrumentation(self):
+        """
+        Stops recording latency statistics and discards them.
+        """
+        self.instrumentation = None
+
+
+    def stats(self):
+        """
+        Returns the latency statistics recorded since instrumentation was enabled.
+
+        Returns:
+            dict of {stage: {'count', 'mean', 'p50', 'p99', 'max'}} with the times in seconds, or an empty dict
+            if instrumentation is disabled.
+        """
+        if self.instrumentation is None:
+            return {}
+        return self.instrumentation.snapshot()
+
+
+#-------------------------------------- Telemetry History ----------------------------------------------------
+
+    def enable_history(self, history_size=1000):
+        """
+        Keeps the last history_size samples of every decoded signal group in a preallocated ring buffer.
+
+        Requires numpy. Memory use is bounded by history_size per signal group, and each sample is stored with its
+        kernel receive timestamp (can.Message.timestamp).
+
+        Parameters:
+            history_size (int): The number of samples kept per signal group. Defaults to 1000.
+
+        Example:
+            # Keep 2 seconds of 1 kHz encoder estimates
+            >>> odrive_can.enable_history(2000)
+        """
+        self.history_size = history_size
+        self.history = {}
+        for cmd_id, (name, _, signals, _) in self.decoder_specs.items():
+            if signals and name not in self.history:
+                self.history[name] = TelemetryRingBuffer(signals, history_size)
+        for cmd_id in self.decoder_specs:
+            self.decoders[self.nodeID << 5 | cmd_id] = self.build_decoder(cmd_id)
+
+
+    def get_history(self, name):
+        """
+        Returns the ring buffer of a signal group, or None if the history is not enabled.
+
+        Parameters:
+            name (str): The signal group name, e.g. "encoder" (see CYCLIC_MESSAGES).
+
+        Example:
+            # Velocity samples of the last 200 ms as a NumPy array
+            >>> times, velocity = odrive_can.get_history("encoder").since(time.time() - 0.2, "velocity")
+
+            # Last 50 position and velocity samples
+            >>> times, values = odrive_can.get_history("encoder").last(50)
+        """
+        return self.history.get(name)
+
+
+    def process_error_message(self, active_errors, disarm_reason):
+        """
+        Decodes a Get_Error message (0x03) and stores the names of the active errors and the disarm reason.
+        """
+        # Decode and print active errors
+        if active_errors != 0:  # Check if there are any active errors
+            errors = [description for code, description in self.ERROR_CODES.items() if active_errors & code]
+            self.active_error = ', '.join(errors)
+            print(f"ODrive {self.nodeID} Active Errors: {self.active_error}")
+            #Do I want to set self.running to flase here so it will stop datacollection loop running? 
+        else:
+            #print(f"ODrive {self.nodeID} No active errors.")
+            pass
+        
+        # Decode and print disarm reason
+        if disarm_reason != 0:  # Check if there is a disarm reason
+            reasons = [description for code, description in self.ERROR_CODES.items() if disarm_reason & code]
+            self.disarm_reason = ', '.join(reasons)
+            print(f"ODrive {self.nodeID} Disarm Reason: {self.disarm_reason}")
+            #Do I want to set self.running to flase here so it will stop datacollection loop running? 
+        else:
+            #print(f"ODrive {self.nodeID} No disarm reason.")
+            pass
 
 
     #This is aysnc receiving the messages from the can bus and feeding them into the process_can_message method.
+    #The shared hub reads each frame once and routes it to the node it belongs to.
     async def recv_all(self):
-        while self.running:
-            await asyncio.sleep(0)
-            msg = self.canBus.recv(timeout=0)
-            if msg is not None:
-                self.process_can_message(msg)
+        await self.hub.recv_all()
 
 
     
     #This is aysnc saving the data to a database at a set rate (timeout=0.1) every 0.1 seconds.
+    #Rows are handed to a database writer thread, so SQLite never runs on the event loop thread.
     async def save_data(self, timeout=0.1):
-        # Fetch the next trial_id
-        next_trial_id = self.database.get_next_trial_id()
-        print(f"Using trial_id: {next_trial_id}")
+        # Nothing to save in telemetry only mode (database=None)
+        if self.database_path is None:
+            return
         node_id = self.nodeID
-        while self.running:
-            await asyncio.sleep(timeout)
-            # Calculate elapsed time since the start of the program
-            current_time = time.time() - self.start_time
-            self.database.add_odrive_data(
-                next_trial_id,
-                node_id,
-                current_time,
-                self.position,
-                self.velocity,
-                self.torque_target,
-                self.torque_estimate,
-                self.bus_voltage,
-                self.bus_current,
-                self.iq_setpoint,
-                self.iq_measured,
-                self.electrical_power,
-                self.mechanical_power,
-                self.fet_temp,
-                self.motor_temp
-            )
+        if self.database_writer is None:
+            self.database_writer = OdriveDatabaseWriter.get_writer(self.database_path)
+        # Start a new trial, or join the trial of the other nodes logging to this database. The writer thread opens
+        # the database (creating its tables and indexes) and registers the trial, so the event loop keeps running.
+        next_trial_id = await asyncio.get_running_loop().run_in_executor(None, self.database_writer.join_trial, node_id)
+        print(f"Using trial_id: {next_trial_id}")
+        try:
+            while self.running:
+                await asyncio.sleep(timeout)
+                # Calculate elapsed time since the start of the program
+                current_time = time.time() - self.start_time
+                if self.instrumentation is not None:
+                    insert_start = time.perf_counter()
+                self.database_writer.put((
+                    next_trial_id,
+                    node_id,
+                    current_time,
+                    self.position,
+                    self.velocity,
+                    self.torque_target,
+                    self.torque_estimate,
+                    self.bus_voltage,
+                    self.bus_current,
+                    self.iq_setpoint,
+                    self.iq_measured,
+                    self.electrical_power,
+                    self.mechanical_power,
+                    self.fet_temp,
+                    self.motor_temp
+                ))
+                if self.instrumentation is not None:
+                    self.instrumentation.stage('save_data').record(time.perf_counter() - insert_start)
+        finally:
+            self.database_writer.leave_trial()
+            # Wait (without blocking the event loop) for the queued rows to be written once data collection stops
+            await asyncio.get_running_loop().run_in_executor(None, self.database_writer.flush)
+
+
+    def database_stats(self):
+        """
+        Returns the statistics of the database writer thread used by save_data.
+
+        Returns:
+            dict with queue_depth, dropped_rows, rows_written, flushes, last_flush_latency and max_flush_latency,
+            or None if data collection has not started.
+
+        Example:
+            >>> odrive_can.database_stats()
+            ...
+            ... {'queue_depth': 0, 'dropped_rows': 0, 'rows_written': 150, 'flushes': 2, 'last_flush_latency': 0.0021, 'max_flush_latency': 0.0043}
+        """
+        if self.database_writer is None:
+            return None
+        return self.database_writer.stats()
 
 
     async def get_velocity(self):
         """
-        This function makes sure that the returned velocity is not 'None'
+        This function makes sure that the returned velocity is not 'None'. It waits for the first encoder
+        frame (see wait_for) rather than polling, so it uses no CPU while it waits.
         """
         while self.running and self.velocity is None:
-            await asyncio.sleep(0)
+            await self.wait_for("encoder")
         return self.velocity
 
 
+    async def wait_for(self, name, newer_than=None, timeout=None):
+        """
+        Waits until a signal group receives a frame newer than a sequence number, without polling.
+
+        The decoders wake the waiting coroutines as soon as the frame is stored, so a controller awaiting this runs
+        exactly once per new frame. The receive loop (recv_all) is started if it is not running yet.
+
+        Parameters:
+            name       (str): A signal group (e.g. "encoder", "torques", "heartbeat", see CYCLIC_MESSAGES) or one of its signals (e.g. "velocity").
+            newer_than (int, optional): Wait for a sequence number above this one (see snapshot().sequence()). Returns at once
+                                        if the group is already past it. Defaults to the current sequence number, i.e. the next frame.
+            timeout    (float, optional): Max seconds to wait. Defaults to no timeout.
+
+        Returns:
+            int: The new sequence number of the group, or None on timeout or if the node stopped running.
+
+        Example:
+            >>> sequence = await odrive_can.wait_for("encoder")
+            >>> while odrive_can.running:
+            ...     sequence = await odrive_can.wait_for("encoder", newer_than=sequence)
+            ...     odrive_can.set_torque(-0.1 * odrive_can.velocity)
+        """
+        telemetry = self.telemetry
+        group = telemetry.group(name)
+        sequences = telemetry.sequences
+        if newer_than is None:
+            newer_than = sequences[group]
+        # Make sure the shared receive loop is running, otherwise nothing would ever be decoded.
+        self.hub.start()
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while sequences[group] <= newer_than:
+            if not self.running:
+                return None
+            future = loop.create_future()
+            telemetry.waiters[group].append(future)
+            try:
+                await asyncio.wait_for(future, None if deadline is None else deadline - loop.time())
+            except asyncio.TimeoutError:
+                return None
+        return sequences[group]
+
+
+    async def updates(self, name, timeout=None):
+        """
+        Asynchronously iterates over the updates of a signal group, yielding a snapshot after every new frame.
+
+        If several frames arrive while the loop body runs, only the latest is yielded, so a slow consumer never falls
+        behind; compare snapshot.sequence(name) between iterations to count the skipped frames. The snapshot is reused
+        between iterations. The iteration ends when the node stops running or no frame arrives within timeout seconds.
+
+        Parameters:
+            name    (str): A signal group or one of its signals, as in wait_for.
+            timeout (float, optional): Max seconds to wait for each frame. Defaults to no timeout.
+
+        Example:
+            >>> async for snapshot in odrive_can.updates("encoder"):
+            ...     odrive_can.set_torque(-0.1 * snapshot.velocity)
+        """
+        sequence = self.telemetry.sequences[self.telemetry.group(name)]
+        snapshot = None
+        while self.running:
+            sequence = await self.wait_for(name, newer_than=sequence, timeout=timeout)
+            if sequence is None:
+                return
+            snapshot = self.telemetry.snapshot(snapshot)
+            yield snapshot
+
+
     #This is the async loop that runs the receve_msgs and save_data methods async.
     #Use when you only have Muiltiple Instance Of ODriveCAN Class
     async def loop(self, *others):
@@ -0,0 +1,307 @@
+import argparse
+import can
+import math
+import struct
+import threading
+import time
+
+
+
+
+class SimulatedAxis:
+    """
+    The state and simple plant dynamics of one simulated O-Drive axis.
+
+    The motor is a rigid inertia with viscous damping. In closed loop control the commanded torque comes from the
+    control mode: torque control passes the torque setpoint through, velocity control is a P loop on velocity and
+    position control is a cascaded P-P loop, like the O-Drive controller. Any other state applies no torque.
+
+    Attributes:
+        nodeID          (int): The node ID of the simulated O-Drive.
+        axis_state      (int): The axis state code (see ODriveCAN.AXIS_STATES). Starts in idle (1).
+        control_mode    (int): 1 torque, 2 velocity or 3 position control. Starts in position control.
+        position        (float): Position in revolutions.
+        velocity        (float): Velocity in revolutions per second.
+        torque_estimate (float): Torque applied to the motor in Nm.
+    """
+    IDLE = 1
+    CLOSED_LOOP_CONTROL = 8
+    ESTOP_REQUESTED = 0x2000000
+
+    def __init__(self, nodeID, inertia=0.001, damping=0.0005, torque_constant=0.083, torque_limit=1.0, pos_gain=20.0, vel_gain=0.16, bus_voltage=24.0):
+        self.nodeID = nodeID
+        self.inertia = inertia                  # Nm/(rev/s^2)
+        self.damping = damping                  # Nm/(rev/s)
+        self.torque_constant = torque_constant  # Nm/A
+        self.torque_limit = torque_limit        # Nm
+        self.pos_gain = pos_gain                # (rev/s)/rev
+        self.vel_gain = vel_gain                # Nm/(rev/s)
+        self.bus_voltage = bus_voltage          # V
+        self.axis_state = self.IDLE
+        self.control_mode = 3
+        self.input_mode = 1
+        self.active_errors = 0
+        self.disarm_reason = 0
+        self.procedure_result = 0
+        self.position = 0.0
+        self.velocity = 0.0
+        self.input_pos = 0.0
+        self.input_vel = 0.0
+        self.input_torque = 0.0
+        self.torque_target = 0.0
+        self.torque_estimate = 0.0
+        self.fet_temp = 25.0
+        self.motor_temp = 25.0
+
+
+    def handle_command(self, cmd_id, data):
+        """
+        Applies one command sent to this axis. Unknown commands are ignored.
+        """
+        if cmd_id == 0x07:  # Set_Axis_State
+            requested_state = data[0]
+            if requested_state == self.CLOSED_LOOP_CONTROL and self.active_errors == 0:
+                self.axis_state = self.CLOSED_LOOP_CONTROL
+                # Hold the current position like the O-Drive does when entering closed loop control
+                self.input_pos = self.position
+            elif requested_state != self.CLOSED_LOOP_CONTROL:
+                # Calibration and other procedures finish instantly and return to idle
+                self.axis_state = self.IDLE
+        elif cmd_id == 0x0B:  # Set_Controller_Mode
+            self.control_mode, self.input_mode = struct.unpack_from('<II', data)
+        elif cmd_id == 0x02:  # Estop
+            self.axis_state = self.IDLE
+            self.active_errors |= self.ESTOP_REQUESTED
+            self.disarm_reason = self.ESTOP_REQUESTED
+        elif cmd_id == 0x18:  # Clear_Errors
+            self.active_errors = 0
+            self.disarm_reason = 0
+        elif cmd_id == 0x0C:  # Set_Input_Pos
+            self.input_pos = struct.unpack_from('<f', data)[0]
+        elif cmd_id == 0x0D:  # Set_Input_Vel
+            self.input_vel, self.input_torque = struct.unpack_from('<ff', data)
+        elif cmd_id == 0x0E:  # Set_Input_Torque
+            self.input_torque = struct.unpack_from('<f', data)[0]
+        elif cmd_id == 0x19:  # Set_Absolute_Position
+            self.position = struct.unpack_from('<f', data)[0]
+            self.input_pos = self.position
+
+
+    def step(self, dt):
+        """
+        Advances the plant by dt seconds.
+        """
+        if self.axis_state == self.CLOSED_LOOP_CONTROL:
+            if self.control_mode == 1:
+                torque = self.input_torque
+            elif self.control_mode == 2:
+                torque = self.vel_gain * (self.input_vel - self.velocity) + self.input_torque
+            else:
+                velocity_command = self.pos_gain * (self.input_pos - self.position)
+                torque = self.vel_gain * (velocity_command - self.velocity)
+            torque = max(-self.torque_limit, min(self.torque_limit, torque))
+        else:
+            torque = 0.0
+        self.torque_target = torque
+        self.torque_estimate = torque
+
+        acceleration = (torque - self.damping * self.velocity) / self.inertia
+        self.velocity += acceleration * dt
+        self.position += self.velocity * dt
+
+        # The motor heats up with the square of the current and cools towards 25 C
+        iq = torque / self.torque_constant
+        self.motor_temp += (0.5 * iq * iq - 0.05 * (self.motor_temp - 25.0)) * dt
+        self.fet_temp += (0.1 * iq * iq - 0.05 * (self.fet_temp - 25.0)) * dt
+
+
+    def cyclic_payload(self, cmd_id):
+        """
+        Returns the data of the cyclic message with the given command ID.
+        """
+        if cmd_id == 0x01:  # Heartbeat
+            return struct.pack('<IBBBx', self.active_errors, self.axis_state, self.procedure_result, 1)
+        if cmd_id == 0x03:  # Get_Error
+            return struct.pack('<II', self.active_errors, self.disarm_reason)
+        if cmd_id == 0x09:  # Get_Encoder_Estimates
+            return struct.pack('<ff', self.position, self.velocity)
+        if cmd_id == 0x1C:  # Get_Torques
+            return struct.pack('<ff', self.torque_target, self.torque_estimate)
+        iq = self.torque_estimate / self.torque_constant
+        mechanical_power = self.torque_estimate * self.velocity * 2 * math.pi
+        electrical_power = mechanical_power + 0.1 * iq * iq  # Copper losses of a 0.1 Ohm winding
+        if cmd_id == 0x17:  # Get_Bus_Voltage_Current
+            return struct.pack('<ff', self.bus_voltage, electrical_power / self.bus_voltage)
+        if cmd_id == 0x14:  # Get_Iq
+            return struct.pack('<ff', iq, iq)
+        if cmd_id == 0x1D:  # Get_Powers
+            return struct.pack('<ff', electrical_power, mechanical_power)
+        if cmd_id == 0x15:  # Get_Temperature
+            return struct.pack('<ff', self.fet_temp, self.motor_temp)
+        return None
+
+
+
+
+class ODriveSimulator:
+    """
+    Simulates O-Drives on a CAN bus, so the package can be tested and load tested without motors.
+
+    Runs on python-can's "virtual" interface (in the same process) or on a SocketCAN vcan interface (from any process).
+    A background thread steps the plant of every simulated axis, emits the cyclic messages that
+    ODriveCAN.process_can_message decodes at the configured rates and responds to Set_Axis_State,
+    Set_Controller_Mode, Estop, Clear_Errors, Set_Absolute_Position and the setpoint commands.
+
+    Attributes:
+        node_ids     (list of int): The node IDs to simulate.
+        canBusID     (str): The CAN channel. Defaults to "vcan0".
+        canBusType   (str): The python-can interface. Defaults to "virtual".
+        rates        (dict): Cyclic message rates in Hz keyed by command ID. Defaults to DEFAULT_RATES.
+        step_rate    (float): Plant simulation rate in Hz. Defaults to 1000.
+        axes         (dict): The SimulatedAxis of every node keyed by node ID.
+        cpu_time     (float): CPU seconds used by the simulation thread, set when it stops. Lets benchmarks
+                              subtract the simulator from the CPU use of the process.
+
+    Example:
+        >>> simulator = ODriveSimulator([0, 1], canBusID="sim", canBusType="virtual")
+        >>> simulator.start()
+        >>> odrive = ODriveCAN(0, canBusID="sim", canBusType="virtual")
+        ...
+        >>> simulator.stop()
+
+        Or from a shell, on a vcan interface:
+            python -m pyodrivecan.simulator --nodes 0 1 2 --channel vcan0 --interface socketcan
+    """
+    # Default cyclic message rates in Hz, keyed by command ID.
+    DEFAULT_RATES = {
+        0x01: 10,   # Heartbeat
+        0x03: 10,   # Get_Error
+        0x09: 100,  # Get_Encoder_Estimates
+        0x1C: 100,  # Get_Torques
+        0x17: 10,   # Get_Bus_Voltage_Current
+        0x14: 10,   # Get_Iq
+        0x1D: 10,   # Get_Powers
+        0x15: 10,   # Get_Temperature
+    }
+
+    def __init__(self, node_ids, canBusID="vcan0", canBusType="virtual", rates=None, step_rate=1000, **axis_parameters):
+        self.node_ids = list(node_ids)
+        self.canBusID = canBusID
+        self.canBusType = canBusType
+        self.rates = dict(self.DEFAULT_RATES if rates is None else rates)
+        self.step_rate = step_rate
+        self.axes = {node_id: SimulatedAxis(node_id, **axis_parameters) for node_id in self.node_ids}
+        self.canBus = can.interface.Bus(canBusID, interface=canBusType)
+        self.running = False
+        self.thread = None
+        self.frames_sent = 0
+        self.commands_received = 0
+        self.cpu_time = 0.0  # CPU seconds used by the last run of the simulation thread
+
+
+    def start(self):
+        """
+        Starts the simulation thread.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"ODriveSimulator {self.canBusID}", daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stops the simulation thread and shuts down its CAN bus.
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.canBus.shutdown()
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def receive_commands(self):
+        # Applies every command waiting on the bus to the axis it is addressed to.
+        while True:
+            msg = self.canBus.recv(timeout=0)
+            if msg is None:
+                return
+            axis = self.axes.get(msg.arbitration_id >> 5)
+            if axis is not None and not msg.is_error_frame:
+                axis.handle_command(msg.arbitration_id & 0x1F, msg.data)
+                self.commands_received += 1
+
+
+    def send_cyclic(self, cmd_id):
+        # Sends one cyclic message from every simulated axis.
+        for axis in self.axes.values():
+            data = axis.cyclic_payload(cmd_id)
+            if data is not None:
+                self.canBus.send(can.Message(arbitration_id=(axis.nodeID << 5 | cmd_id), data=data, is_extended_id=False))
+                self.frames_sent += 1
+
+
+    #This runs on the simulation thread with absolute deadlines, so the message rates don't drift.
+    def run(self):
+        dt = 1.0 / self.step_rate
+        start = time.monotonic()
+        next_step = start
+        next_send = {cmd_id: start for cmd_id in self.rates}
+        while self.running:
+            now = time.monotonic()
+            if now < next_step:
+                time.sleep(next_step - now)
+                continue
+            self.receive_commands()
+            for axis in self.axes.values():
+                axis.step(dt)
+            next_step += dt
+            for cmd_id, rate in self.rates.items():
+                if rate and now >= next_send[cmd_id]:
+                    self.send_cyclic(cmd_id)
+                    next_send[cmd_id] += 1.0 / rate
+                    if next_send[cmd_id] < now:
+                        next_send[cmd_id] = now + 1.0 / rate  # Don't burst to catch up after a stall
+            if next_step < now - 0.1:
+                next_step = now  # Fell more than 100 ms behind, restart the clock instead of fast forwarding
+        self.cpu_time = time.thread_time()
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate O-Drives on a CAN bus.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[0], help="node IDs to simulate")
+    parser.add_argument("--channel", default="vcan0", help="CAN channel, e.g. vcan0")
+    parser.add_argument("--interface", default="socketcan", help="python-can interface, e.g. socketcan")
+    parser.add_argument("--encoder-rate", type=float, default=ODriveSimulator.DEFAULT_RATES[0x09], help="Get_Encoder_Estimates rate in Hz")
+    parser.add_argument("--step-rate", type=float, default=1000, help="plant simulation rate in Hz")
+    args = parser.parse_args()
+
+    rates = dict(ODriveSimulator.DEFAULT_RATES)
+    rates[0x09] = args.encoder_rate
+    simulator = ODriveSimulator(args.nodes, canBusID=args.channel, canBusType=args.interface, rates=rates, step_rate=args.step_rate)
+    simulator.start()
+    print(f"Simulating O-Drives {args.nodes} on {args.channel}. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(f"Sent {simulator.frames_sent} frames, received {simulator.commands_received} commands.")
+
+
+if __name__ == "__main__":
+    main()
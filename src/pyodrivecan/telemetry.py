@@ -0,0 +1,212 @@
+class Telemetry:
+    """
+    The latest decoded values of one O-Drive, with the receive timestamp and sequence number of every signal group.
+
+    Values live in one flat list indexed by signal, and each group of signals decoded from the same frame (e.g. "encoder":
+    position and velocity) has one receive timestamp and one sequence number counting the frames received, so a
+    controller can tell whether a value is fresh and whether it changed since it last looked. Nothing is allocated per frame.
+
+    The decoders write the record from the event loop thread, one frame at a time, so a snapshot() taken by a coroutine
+    always holds whole frames: position and velocity always come from the same encoder frame.
+
+    Attributes:
+        values      (list): The latest value of every signal, None until it is first received.
+        timestamps  (list): The receive timestamp (can.Message.timestamp) of every group, 0.0 until it is first received.
+        sequences   (list): The number of frames received for every group.
+        index       (dict): Signal name to its index in values.
+        group_index (dict): Group name to its index in timestamps and sequences.
+        group_of    (dict): Signal name to the index of its group.
+        waiters     (list): The futures waiting for the next frame of every group (see ODriveCAN.wait_for).
+
+    Example:
+        >>> snapshot = odrive.telemetry.snapshot()
+        >>> snapshot.position, snapshot.velocity, snapshot.timestamp('encoder'), snapshot.sequence('encoder')
+    """
+    __slots__ = ('values', 'timestamps', 'sequences', 'index', 'group_index', 'group_of', 'waiters')
+
+    def __init__(self):
+        self.values = []
+        self.timestamps = []
+        self.sequences = []
+        self.index = {}
+        self.group_index = {}
+        self.group_of = {}
+        self.waiters = []
+
+
+    def add_signal(self, signal, value=None):
+        """
+        Adds a signal (if it isn't there yet) and returns its index in values.
+        """
+        index = self.index.get(signal)
+        if index is None:
+            index = self.index[signal] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+    def add_group(self, name, signals):
+        """
+        Adds a group of signals decoded from the same frame (if it isn't there yet) and returns its index.
+        """
+        group = self.group_index.get(name)
+        if group is None:
+            group = self.group_index[name] = len(self.timestamps)
+            self.timestamps.append(0.0)
+            self.sequences.append(0)
+            self.waiters.append([])
+        for signal in signals:
+            self.add_signal(signal)
+            self.group_of[signal] = group
+        return group
+
+
+    def group(self, name):
+        """
+        Returns the index of a group, given the group name or the name of one of its signals.
+        """
+        group = self.group_index.get(name)
+        if group is None:
+            group = self.group_of.get(name)
+            if group is None:
+                raise ValueError(f"No signal group or signal named {name!r}.")
+        return group
+
+
+    def notify(self, group):
+        """
+        Wakes the futures waiting for a group with its sequence number. Called by the decoders after a frame of the
+        group was stored, only when something is waiting.
+        """
+        waiting, self.waiters[group] = self.waiters[group], []
+        sequence = self.sequences[group]
+        for future in waiting:
+            if not future.done():
+                future.set_result(sequence)
+
+
+    def notify_all(self):
+        """
+        Wakes the futures waiting for any group, e.g. when the node stops running.
+        """
+        for group in range(len(self.waiters)):
+            if self.waiters[group]:
+                self.notify(group)
+
+
+    def get(self, signal):
+        """
+        Returns the latest value of a signal, or None if it hasn't been received.
+        """
+        index = self.index.get(signal)
+        return None if index is None else self.values[index]
+
+
+    def set(self, signal, value):
+        """
+        Sets the value of a signal without counting it as a received frame.
+        """
+        self.values[self.add_signal(signal)] = value
+
+
+    def snapshot(self, out=None):
+        """
+        Copies the record into a TelemetrySnapshot.
+
+        Parameters:
+            out (TelemetrySnapshot, optional): A snapshot of this record to copy into, so taking a snapshot every control
+                                               tick allocates nothing. Defaults to a new snapshot.
+
+        Returns:
+            The TelemetrySnapshot (out if it was given).
+        """
+        if out is None:
+            out = TelemetrySnapshot(self)
+        out.values[:] = self.values
+        out.timestamps[:] = self.timestamps
+        out.sequences[:] = self.sequences
+        return out
+
+
+
+
+class TelemetrySnapshot:
+    """
+    A copy of a Telemetry record taken at one instant. Signals are read as attributes or items
+    (snapshot.position or snapshot['position']).
+
+    Attributes:
+        telemetry   (Telemetry): The record this is a snapshot of.
+        values      (list): The value of every signal, in the order of telemetry.index.
+        timestamps  (list): The receive timestamp of every group, in the order of telemetry.group_index.
+        sequences   (list): The sequence number of every group, in the order of telemetry.group_index.
+    """
+    __slots__ = ('telemetry', 'values', 'timestamps', 'sequences')
+
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+        self.values = list(telemetry.values)
+        self.timestamps = list(telemetry.timestamps)
+        self.sequences = list(telemetry.sequences)
+
+
+    def __getitem__(self, signal):
+        return self.values[self.telemetry.index[signal]]
+
+
+    def __getattr__(self, signal):
+        # Only called for names that aren't slots or methods, i.e. signal names.
+        try:
+            return self.values[self.telemetry.index[signal]]
+        except KeyError:
+            raise AttributeError(f"Telemetry has no signal {signal!r}") from None
+
+
+    def timestamp(self, name):
+        """
+        Returns the receive timestamp (can.Message.timestamp, time.time() clock) of a group or of the group a signal belongs to.
+        0.0 if it hasn't been received.
+        """
+        return self.timestamps[self.telemetry.group(name)]
+
+
+    def sequence(self, name):
+        """
+        Returns the number of frames received for a group, or for the group a signal belongs to.
+        """
+        return self.sequences[self.telemetry.group(name)]
+
+
+    def age(self, name, now):
+        """
+        Returns how many seconds before now (a time.time() timestamp) a group or signal was received.
+        """
+        return now - self.timestamps[self.telemetry.group(name)]
+
+
+    def as_dict(self):
+        """
+        Returns the values as a {signal: value} dictionary.
+        """
+        values = self.values
+        return {signal: values[index] for signal, index in self.telemetry.index.items()}
+
+
+
+
+class TelemetrySignal:
+    """
+    Exposes one signal of a node's Telemetry record as an attribute of the node (e.g. odrive.position).
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+
+
+    def __get__(self, node, owner=None):
+        if node is None:
+            return self
+        return node.telemetry.get(self.name)
+
+
+    def __set__(self, node, value):
+        node.telemetry.set(self.name, value)
@@ -0,0 +1,117 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+
+class TelemetryRingBuffer:
+    """
+    A preallocated, array backed ring buffer holding the latest samples of one group of signals (e.g. position and velocity).
+
+    Memory is allocated once in the constructor, appends are O(1) and never allocate, and the queries return NumPy arrays
+    without creating a Python object per sample. Once the buffer is full the oldest samples are overwritten.
+
+    Attributes:
+        signals   (tuple of str): The names of the signals, one column each.
+        capacity  (int): The max number of samples kept.
+        count     (int): The total number of samples appended so far.
+        times     (numpy.ndarray): Sample timestamps (capacity,), in the same clock as can.Message.timestamp (time.time()).
+        values    (numpy.ndarray): Sample values (capacity, len(signals)).
+
+    Example:
+        >>> buffer = TelemetryRingBuffer(('position', 'velocity'), capacity=1000)
+        >>> buffer.append(1712000000.0, (1.0, 0.5))
+        >>> times, values = buffer.last(200)
+        >>> velocity = buffer.since(time.time() - 0.2, 'velocity')[1]
+    """
+    def __init__(self, signals, capacity=1000):
+        if np is None:
+            raise ImportError("TelemetryRingBuffer requires numpy, install it with: pip install numpy")
+        self.signals = tuple(signals)
+        self.capacity = capacity
+        self.count = 0
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, len(self.signals)), dtype=np.float64)
+        self.columns = {name: column for column, name in enumerate(self.signals)}
+
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+
+    def append(self, timestamp, values):
+        """
+        Appends one sample, overwriting the oldest one once the buffer is full.
+
+        Parameters:
+            timestamp (float): The sample time (can.Message.timestamp).
+            values    (tuple of float): One value per signal.
+        """
+        index = self.count % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = values
+        self.count += 1
+
+
+    def clear(self):
+        """
+        Removes all samples.
+        """
+        self.count = 0
+
+
+    def ordered(self, n):
+        # Returns the indexes of the last n samples, oldest first, as one or two slices of the arrays.
+        n = min(n, len(self))
+        end = self.count % self.capacity
+        start = end - n
+        if start >= 0:
+            return (slice(start, end),)
+        return (slice(start + self.capacity, self.capacity), slice(0, end))
+
+
+    def select(self, slices, signal):
+        # Copies the samples in slices (oldest first) out of the ring.
+        values = self.values if signal is None else self.values[:, self.columns[signal]]
+        if len(slices) == 1:
+            return self.times[slices[0]].copy(), values[slices[0]].copy()
+        return np.concatenate([self.times[s] for s in slices]), np.concatenate([values[s] for s in slices])
+
+
+    def last(self, n, signal=None):
+        """
+        Returns the last n samples, oldest first.
+
+        Parameters:
+            n      (int): The number of samples. Fewer are returned if the buffer holds fewer.
+            signal (str, optional): Only return this signal's values. Defaults to all signals.
+
+        Returns:
+            (times, values) NumPy arrays. values is (n, len(signals)), or (n,) if signal is given.
+        """
+        return self.select(self.ordered(n), signal)
+
+
+    def since(self, t, signal=None):
+        """
+        Returns all samples with a timestamp at or after t, oldest first.
+
+        Parameters:
+            t      (float): The start time, in the same clock as can.Message.timestamp (time.time()).
+            signal (str, optional): Only return this signal's values. Defaults to all signals.
+
+        Returns:
+            (times, values) NumPy arrays. values is (n, len(signals)), or (n,) if signal is given.
+        """
+        slices = self.ordered(self.capacity)
+        # Samples are appended in time order, so only the samples of the first slice before t need to be skipped.
+        skipped = 0
+        for s in slices:
+            times = self.times[s]
+            first = int(np.searchsorted(times, t, side='left'))
+            skipped += first
+            if first < len(times):
+                break
+        return self.select(self.ordered(len(self) - skipped), signal)
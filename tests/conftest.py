@@ -0,0 +1,31 @@
+import itertools
+
+import pytest
+
+from pyodrivecan import CanBusHub, ODriveSimulator
+
+
+channel_numbers = itertools.count()
+
+
+@pytest.fixture
+def channel():
+    """
+    A python-can "virtual" channel of its own for each test. The hub left on it is shut down afterwards.
+    """
+    name = f"pyodrivecan_test_{next(channel_numbers)}"
+    yield name
+    hub = CanBusHub.hubs.get(name)
+    if hub is not None:
+        hub.shutdown()
+
+
+@pytest.fixture
+def simulator(channel):
+    """
+    Simulated O-Drives with node IDs 0 and 1 on the test's channel.
+    """
+    simulator = ODriveSimulator([0, 1], canBusID=channel, canBusType="virtual")
+    simulator.start()
+    yield simulator
+    simulator.stop()
@@ -0,0 +1,74 @@
+import statistics
+
+import can
+import pytest
+
+from pyodrivecan.busmonitor import BusMonitor, StreamStats
+
+
+def observe_all(stream, timestamps):
+    for timestamp in timestamps:
+        stream.observe(timestamp)
+    return stream
+
+
+def test_steady_stream():
+    stream = observe_all(StreamStats(), [i * 0.01 for i in range(101)])
+    assert stream.frames == 101
+    assert stream.period == pytest.approx(0.01)
+    assert stream.jitter == pytest.approx(0.0, abs=1e-9)
+    assert stream.rate() == pytest.approx(100.0)
+    assert (stream.missed, stream.gaps) == (0, 0)
+
+
+def test_gap_counts_missed_frames():
+    # Two frames missing between 0.02 and 0.05
+    stream = observe_all(StreamStats(), [0.0, 0.01, 0.02, 0.05, 0.06])
+    assert (stream.missed, stream.gaps) == (2, 1)
+    assert stream.max_interval == pytest.approx(0.03)
+    # The gap is left out of the period and jitter
+    assert stream.period == pytest.approx(0.01)
+    assert stream.intervals == 3
+
+
+def test_short_gap_counts_at_least_one_missed_frame():
+    stream = observe_all(StreamStats(expected_period=0.01), [0.0, 0.016])
+    assert (stream.missed, stream.gaps) == (1, 1)
+
+
+def test_jitter_is_the_standard_deviation_of_the_intervals():
+    intervals = [0.009, 0.011, 0.010, 0.012, 0.008, 0.010]
+    timestamps = [0.0]
+    for interval in intervals:
+        timestamps.append(timestamps[-1] + interval)
+    stream = observe_all(StreamStats(expected_period=0.01), timestamps)
+    assert stream.period == 0.01  # An expected period is never learned
+    assert stream.jitter == pytest.approx(statistics.stdev(intervals))
+    assert stream.max_interval == pytest.approx(0.012)
+
+
+def test_frame_bits():
+    assert BusMonitor.frame_bits(0) == 55
+    assert BusMonitor.frame_bits(8) == 135
+    assert BusMonitor.frame_bits(8, extended=True) == 160
+
+
+def test_counter_load():
+    monitor = BusMonitor(canBitRate=250000)
+    # 1000 frames with 8 data bytes in one second: 135250 bits
+    assert monitor.counter_load(1000, 8000, 1.0) == pytest.approx(54.1)
+    assert monitor.counter_load(1000, 8000, 2.0) == pytest.approx(27.05)
+
+
+def test_bus_load_window_and_expected_rates():
+    monitor = BusMonitor(canBitRate=250000, window=1.0, expected_rates={0x09: 1000})
+    for i in range(1001):
+        monitor.observe(can.Message(timestamp=i * 0.001, arbitration_id=(3 << 5 | 0x09), data=bytes(8), is_extended_id=False))
+    assert monitor.bus_load == pytest.approx(54.0)
+    assert monitor.max_bus_load == monitor.bus_load
+    [stats] = monitor.stream_stats()
+    assert (stats['node_ID'], stats['cmd_id'], stats['frames'], stats['missed']) == (3, 0x09, 1001, 0)
+    assert stats['period'] == 0.001
+    monitor.reset()
+    assert monitor.stream_stats() == [] and monitor.bus_load == 0.0
+    assert monitor.expected_rates == {0x09: 1000}
@@ -0,0 +1,113 @@
+import asyncio
+import subprocess
+
+import can
+import pytest
+
+from pyodrivecan import CanBusHub, ODriveCAN
+from pyodrivecan.busstate import BusStateMonitor
+
+
+def error_frame(error_class, data=bytes(8), timestamp=1.0):
+    return can.Message(timestamp=timestamp, arbitration_id=error_class, data=data, is_error_frame=True)
+
+
+def controller_status(status, tx_errors=0, rx_errors=0):
+    return bytes([0, status, 0, 0, 0, 0, tx_errors, rx_errors])
+
+
+@pytest.fixture
+def hub(channel):
+    hub = CanBusHub.get_hub(channel, "virtual")
+    hub.bus_state.auto_recover = False
+    return hub
+
+
+def test_error_frames_are_decoded(hub):
+    bus_state = hub.bus_state
+    events = []
+    bus_state.add_listener(events.append)
+
+    hub.dispatch(error_frame(BusStateMonitor.CAN_ERR_CRTL | BusStateMonitor.CAN_ERR_CNT, controller_status(BusStateMonitor.CAN_ERR_CRTL_TX_WARNING, 97, 3)))
+    assert (bus_state.state, bus_state.tx_errors, bus_state.rx_errors) == ("error-warning", 97, 3)
+    hub.dispatch(error_frame(BusStateMonitor.CAN_ERR_CRTL, controller_status(BusStateMonitor.CAN_ERR_CRTL_RX_PASSIVE)))
+    assert bus_state.state == "error-passive"
+    # Protocol errors and lost arbitration are counted, but don't change the state
+    hub.dispatch(error_frame(BusStateMonitor.CAN_ERR_PROT | BusStateMonitor.CAN_ERR_LOSTARB, timestamp=2.0))
+    assert bus_state.state == "error-passive"
+    hub.dispatch(error_frame(BusStateMonitor.CAN_ERR_CRTL, controller_status(BusStateMonitor.CAN_ERR_CRTL_ACTIVE)))
+    assert bus_state.state == "error-active"
+
+    stats = bus_state.stats()
+    assert stats['error_frames'] == 4
+    assert stats['error_counts']['controller'] == 3
+    assert (stats['error_counts']['protocol'], stats['error_counts']['lost_arbitration']) == (1, 1)
+    assert stats['last_error_time'] == 1.0
+    assert [(event['old_state'], event['state']) for event in events] == [
+        ("error-active", "error-warning"), ("error-warning", "error-passive"), ("error-passive", "error-active")]
+    # Error frames never reach the decoders
+    assert hub.frames_decoded == 0
+
+
+def test_bus_off_and_restart(hub):
+    bus_state = hub.bus_state
+    hub.dispatch(error_frame(BusStateMonitor.CAN_ERR_BUSOFF))
+    assert (bus_state.state, bus_state.bus_off_count) == ("bus-off", 1)
+    hub.dispatch(error_frame(BusStateMonitor.CAN_ERR_RESTARTED))
+    assert (bus_state.state, bus_state.recoveries) == ("error-active", 1)
+    assert [event['event'] for event in bus_state.events] == ["state_change", "state_change", "recovered"]
+
+
+def test_error_frames_on_a_virtual_bus(channel):
+    # python-can filters error frames like other frames on virtual interfaces, so let every frame through
+    hub = CanBusHub.get_hub(channel, "virtual", kernel_filters=False)
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None, hub=hub)
+    sender = can.interface.Bus(channel, interface="virtual")
+
+    async def controller():
+        sender.send(error_frame(BusStateMonitor.CAN_ERR_CRTL, controller_status(BusStateMonitor.CAN_ERR_CRTL_TX_PASSIVE)))
+        assert await hub.bus_state.wait_for_state("error-passive", timeout=1.0)
+        sender.send(error_frame(BusStateMonitor.CAN_ERR_BUSOFF))
+        assert await hub.bus_state.wait_for_state("bus-off", timeout=1.0)
+        # The driver reports the restart, which ends the recovery started on bus-off
+        sender.send(error_frame(BusStateMonitor.CAN_ERR_RESTARTED))
+        assert await asyncio.wait_for(hub.bus_state.recovery, 1.0) is True
+        odrive.running = False
+
+    async def main():
+        await asyncio.gather(odrive.recv_all(), controller())
+
+    try:
+        asyncio.run(main())
+    finally:
+        sender.shutdown()
+    stats = hub.bus_state.stats()
+    assert (stats['state'], stats['bus_off_count'], stats['recoveries'], stats['error_frames']) == ("error-active", 1, 1, 3)
+
+
+def test_restart_without_sudo_password_falls_back_to_reset(hub, monkeypatch):
+    bus_state = hub.bus_state
+    commands = []
+
+    def run(command, **kwargs):
+        commands.append(command)
+        raise subprocess.CalledProcessError(1, command, stderr="sudo: a password is required\n")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    assert bus_state.restart_controller() is False
+    assert bus_state.restart_unavailable
+    assert commands[0][:2] == ["sudo", "-n"]
+
+    resets = []
+    monkeypatch.setattr(hub, "canBusType", "socketcan")
+    monkeypatch.setattr(bus_state, "reset_interface", lambda: resets.append(True))
+    monkeypatch.setattr(hub, "is_link_up", lambda: True)
+    bus_state.state = "bus-off"
+
+    async def main():
+        return await bus_state.recover()
+
+    assert asyncio.run(main()) is True
+    # The restart was tried once, not max_recovery_attempts times
+    assert len(commands) == 2 and resets == [True]
+    assert bus_state.state == "error-active"
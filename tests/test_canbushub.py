@@ -0,0 +1,205 @@
+import asyncio
+import struct
+
+import can
+import pytest
+
+from pyodrivecan import CanBusHub, ODriveCAN
+
+
+def encoder_frame(node_id, position, velocity, timestamp=1.0):
+    return can.Message(arbitration_id=(node_id << 5 | 0x09), data=struct.pack('<ff', position, velocity), is_extended_id=False, timestamp=timestamp)
+
+
+def test_frames_are_routed_to_their_node(channel):
+    odrive0 = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    odrive1 = ODriveCAN(1, canBusID=channel, canBusType="virtual", database=None)
+    hub = odrive0.hub
+    assert odrive1.hub is hub
+
+    hub.dispatch(encoder_frame(1, 2.5, -1.0))
+    assert (odrive1.position, odrive1.velocity) == (2.5, -1.0)
+    assert odrive0.position is None
+
+    # Frames of nodes that aren't attached are dropped
+    hub.dispatch(encoder_frame(5, 1.0, 1.0))
+    assert hub.frames_received == 2
+    assert hub.frames_decoded == 1
+
+
+def test_subscribed_command_ids_only(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None, command_ids=[0x01, 0x09])
+    torques = can.Message(arbitration_id=0x1C, data=struct.pack('<ff', 1.0, 2.0), is_extended_id=False)
+    odrive.hub.dispatch(torques)
+    assert odrive.torque_target is None
+    odrive.hub.dispatch(encoder_frame(0, 3.0, 0.0))
+    assert odrive.position == 3.0
+
+
+def test_build_filters(channel):
+    hub = CanBusHub.get_hub(channel, "virtual")
+    # Nothing attached: a filter matching no standard frame, not an empty list that lets everything through
+    assert hub.build_filters() == [{"can_id": 0, "can_mask": 0x7FF, "extended": True}]
+    ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    ODriveCAN(3, canBusID=channel, canBusType="virtual", database=None, command_ids=[0x09, 0x01])
+    assert hub.build_filters() == [
+        {"can_id": 0, "can_mask": 0x7E0, "extended": False},
+        {"can_id": 3 << 5 | 0x01, "can_mask": 0x7FF, "extended": False},
+        {"can_id": 3 << 5 | 0x09, "can_mask": 0x7FF, "extended": False},
+    ]
+
+
+def test_filters_drop_frames_of_other_nodes(channel):
+    odrive = ODriveCAN(1, canBusID=channel, canBusType="virtual", database=None)
+    sender = can.interface.Bus(channel, interface="virtual")
+    try:
+        sender.send(encoder_frame(2, 1.0, 1.0))
+        sender.send(encoder_frame(1, 4.0, 1.0))
+        msg = odrive.hub.canBus.recv(1.0)
+        assert msg.arbitration_id == 1 << 5 | 0x09
+        assert odrive.hub.canBus.recv(0.05) is None
+    finally:
+        sender.shutdown()
+
+
+def test_duplicate_node_rejected(channel):
+    ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    with pytest.raises(ValueError):
+        ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+
+
+def test_last_node_detaching_shuts_down_hub(channel):
+    odrive0 = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    odrive1 = ODriveCAN(1, canBusID=channel, canBusType="virtual", database=None)
+    odrive0.bus_shutdown()
+    assert CanBusHub.hubs[channel] is odrive1.hub
+    odrive1.bus_shutdown()
+    assert channel not in CanBusHub.hubs
+
+
+def test_recv_all_decodes_simulated_nodes(simulator, channel):
+    odrives = [ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=None) for node_id in (0, 1)]
+    simulator.axes[1].position = 5.0
+
+    async def controller():
+        for odrive in odrives:
+            assert await odrive.wait_for("encoder", timeout=1.0) is not None
+            assert await odrive.wait_for("heartbeat", timeout=1.0) is not None
+        for odrive in odrives:
+            odrive.running = False
+
+    async def main():
+        await asyncio.gather(odrives[0].recv_all(), odrives[1].recv_all(), controller())
+
+    asyncio.run(main())
+    assert odrives[0].position == pytest.approx(0.0)
+    assert odrives[1].position == pytest.approx(5.0)
+    assert odrives[0].hub.health()['reading'] is False
+
+
+def test_setAxisState_outside_event_loop(simulator, channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    assert odrive.setAxisState("closed_loop_control") is True
+    assert simulator.axes[0].axis_state == 8
+    assert odrive.is_odrive_idle(timeout=1.0) is False
+
+
+def test_sync_axis_state_calls_refuse_to_block_event_loop(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+
+    async def main():
+        with pytest.raises(RuntimeError, match="is_odrive_idle_async"):
+            odrive.is_odrive_idle()
+        with pytest.raises(RuntimeError, match="setAxisStateAsync"):
+            odrive.setAxisState("closed_loop_control")
+        with pytest.raises(RuntimeError, match="setAxisStateAsync"):
+            odrive.initCanBus()
+        with pytest.raises(RuntimeError, match="reboot_save_async"):
+            odrive.reboot_save("save")
+
+    asyncio.run(main())
+
+
+def test_setAxisStateAsync_confirms_nodes_concurrently(simulator, channel):
+    odrives = [ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=None) for node_id in (0, 1)]
+    # Node 1 refuses closed loop control while it has an active error, so its heartbeats keep reporting idle
+    simulator.axes[1].active_errors = simulator.axes[1].ESTOP_REQUESTED
+
+    async def main():
+        return await asyncio.gather(*(odrive.setAxisStateAsync("closed_loop_control", timeout=0.5) for odrive in odrives))
+
+    assert asyncio.run(main()) == [True, False]
+    assert [axis.axis_state for axis in simulator.axes.values()] == [8, 1]
+
+
+def test_setAxisStateAsync_waits_for_the_requested_state(simulator, channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+
+    async def main():
+        assert await odrive.initCanBusAsync() is True
+        # The simulated calibration returns to idle at once, so no heartbeat ever reports motor_calibration
+        assert await odrive.setAxisStateAsync("motor_calibration", timeout=0.3) is False
+        assert await odrive.is_odrive_idle_async(timeout=1.0) is True
+
+    asyncio.run(main())
+
+
+def test_reboot_save_checks_idle_state(simulator, channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    sniffer = can.interface.Bus(channel, interface="virtual", can_filters=[{"can_id": 0x16, "can_mask": 0x7FF}])
+    try:
+        odrive.reboot_save("save")
+        assert bytes(sniffer.recv(1.0).data) == b"\x01"
+        assert odrive.setAxisState("closed_loop_control", timeout=1.0) is True
+        odrive.reboot_save("save")
+        assert sniffer.recv(0.05) is None
+    finally:
+        sniffer.shutdown()
+
+
+def test_flush_can_buffer_is_deprecated(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    sender = can.interface.Bus(channel, interface="virtual")
+    try:
+        sender.send(encoder_frame(0, 1.0, 1.0))
+        with pytest.warns(DeprecationWarning):
+            odrive.flush_can_buffer()
+        assert odrive.canBus.recv(0.05) is None
+    finally:
+        sender.shutdown()
+
+
+def test_shutdown_stops_read_loop(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    hub = odrive.hub
+
+    async def main():
+        reader = hub.start()
+        await asyncio.sleep(0.05)
+        assert hub.notifier is not None
+        hub.shutdown()
+        await asyncio.wait_for(reader, 1.0)
+        assert hub.notifier is None
+
+    asyncio.run(main())
+    assert channel not in CanBusHub.hubs
+
+
+def test_receive_thread_error_is_raised_from_recv_all(channel):
+    hub = CanBusHub.get_hub(channel, "virtual", receive_thread=True)
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None, hub=hub)
+
+    def recv(timeout=None):
+        raise can.CanOperationError("receive failed")
+
+    hub.canBus.recv = recv
+
+    async def main():
+        with pytest.raises(can.CanOperationError):
+            await asyncio.wait_for(odrive.recv_all(), 2.0)
+
+    asyncio.run(main())
+    health = hub.health()
+    assert health['reading'] is False
+    assert "receive failed" in health['receive_error']
+    assert hub.receiving is False
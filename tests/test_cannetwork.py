@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from pyodrivecan import CanBusHub, CanNetwork, ODriveSimulator
+
+
+@pytest.fixture
+def channels(channel):
+    # A second virtual channel, shut down afterwards like the channel fixture's
+    second = f"{channel}_b"
+    yield channel, second
+    hub = CanBusHub.hubs.get(second)
+    if hub is not None:
+        hub.shutdown()
+
+
+def test_network_of_two_interfaces(channels):
+    first, second = channels
+    simulators = [ODriveSimulator([0], canBusID=first, canBusType="virtual"), ODriveSimulator([0], canBusID=second, canBusType="virtual")]
+    simulators[1].axes[0].position = 7.0
+    for simulator in simulators:
+        simulator.start()
+    network = CanNetwork({first: 250000, second: 500000}, canBusType="virtual")
+    try:
+        # The same node ID on each interface
+        nodes = [network.add_node(first, 0, database=None), network.add_node(second, 0, database=None)]
+        assert network[second, 0] is nodes[1]
+        assert len(network) == 2
+        assert nodes[1].hub is network.hubs[second] and nodes[1].hub.canBitRate == 500000
+
+        async def controller():
+            for node in nodes:
+                assert await node.wait_for("encoder", timeout=1.0) is not None
+            network.set_running(False)
+
+        async def main():
+            await asyncio.gather(network.recv_all(), controller())
+
+        asyncio.run(main())
+        assert nodes[0].position == pytest.approx(0.0)
+        assert nodes[1].position == pytest.approx(7.0)
+        health = network.health()
+        assert set(health) == {first, second}
+        assert all(interface['nodes'] == [0] and interface['frames_decoded'] > 0 for interface in health.values())
+    finally:
+        network.shutdown()
+        for simulator in simulators:
+            simulator.stop()
+    assert len(network) == 0 and network.hubs == {}
+    assert first not in CanBusHub.hubs and second not in CanBusHub.hubs
+
+
+def test_add_interface_rejects_another_bit_rate(channel):
+    network = CanNetwork({channel: 500000}, canBusType="virtual")
+    try:
+        assert network.add_interface(channel, 500000) is network.hubs[channel]
+        with pytest.raises(ValueError):
+            network.add_interface(channel, 250000)
+    finally:
+        network.shutdown()
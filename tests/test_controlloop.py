@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from pyodrivecan import ControlLoop
+
+
+def test_overrun_skips_missed_ticks_and_keeps_the_grid():
+    period = 0.02
+    starts = []
+
+    def callback(snapshot):
+        starts.append(time.monotonic())
+        if len(starts) == 3:
+            time.sleep(0.05)  # Runs past the deadlines of ticks 3 and 4
+
+    control_loop = ControlLoop(callback, rate=1 / period)
+    asyncio.run(control_loop.run(ticks=6))
+
+    offsets = [(start - starts[0]) / period for start in starts]
+    assert [round(offset) for offset in offsets] == [0, 1, 2, 5]
+    # Tick 5 starts on the original grid, not one period after the overrun
+    assert all(abs(offset - round(offset)) < 0.25 for offset in offsets)
+    stats = control_loop.stats()
+    assert (stats['ticks'], stats['overruns'], stats['skipped_ticks']) == (4, 1, 2)
+    assert stats['max_callback_time'] >= 0.05
+
+
+def test_coroutine_callback_and_stop():
+    control_loop = ControlLoop(None, rate=500)
+
+    async def callback(snapshot):
+        assert snapshot == []
+        await asyncio.sleep(0)
+        if control_loop.ticks == 3:
+            control_loop.stop()
+
+    control_loop.callback = callback
+    asyncio.run(control_loop.run())
+    assert control_loop.ticks == 3
+    assert control_loop.running is False
+
+
+def test_lateness_histogram_and_percentiles():
+    control_loop = ControlLoop(lambda snapshot: None, rate=1000, bin_width=50e-6, bins=10)
+    for _ in range(98):
+        control_loop.record_lateness(10e-6)
+    control_loop.record_lateness(120e-6)
+    control_loop.record_lateness(1.0)  # Past the last bin
+    stats = control_loop.stats()
+    assert stats['ticks'] == 100
+    assert stats['late_ticks'] == 2  # 120 us and 1 s are later than 10% of the 1 ms period
+    assert stats['histogram'] == [(0.0, 98), (pytest.approx(100e-6), 1), (pytest.approx(500e-6), 1)]
+    assert stats['p50_lateness'] == pytest.approx(50e-6)
+    assert stats['p99_lateness'] == pytest.approx(150e-6)
+    assert control_loop.lateness_percentile(100) == 1.0
+    control_loop.reset_stats()
+    assert control_loop.stats()['ticks'] == 0 and control_loop.stats()['histogram'] == []
@@ -0,0 +1,74 @@
+import asyncio
+import struct
+
+import can
+import pytest
+
+from pyodrivecan import ODriveCAN
+from pyodrivecan.telemetry import TelemetrySignal
+
+
+def frame(node_id, cmd_id, data, timestamp=1.0):
+    return can.Message(arbitration_id=(node_id << 5 | cmd_id), data=data, is_extended_id=False, timestamp=timestamp)
+
+
+@pytest.fixture
+def odrive(channel):
+    return ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+
+
+def test_custom_two_signal_decoder(odrive):
+    odrive.register_decoder(0x0A, '<ii', ('shadow_count', 'count_cpr'), name='encoder_count')
+    with pytest.raises(AttributeError):
+        odrive.nothing
+    assert odrive.shadow_count is None
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, odrive.hub.dispatch, frame(0, 0x0A, struct.pack('<ii', -1200, 8192), timestamp=5.0))
+        # The two signal fast path wakes waiters like every other decoder
+        assert await odrive.wait_for("encoder_count", timeout=1.0) == 1
+
+    asyncio.run(main())
+    assert (odrive.shadow_count, odrive.count_cpr) == (-1200, 8192)
+    snapshot = odrive.snapshot()
+    assert (snapshot.shadow_count, snapshot.count_cpr) == (-1200, 8192)
+    assert (snapshot.sequence("encoder_count"), snapshot.timestamp("count_cpr")) == (1, 5.0)
+    # Frames of other nodes never reach the decoder
+    odrive.hub.dispatch(frame(1, 0x0A, struct.pack('<ii', 1, 1)))
+    assert odrive.shadow_count == -1200
+
+
+def test_decoder_with_signals_and_callback(odrive):
+    received = []
+    odrive.register_decoder(0x1F, '<fBxxx', ('gain', 'mode'), callback=lambda *values: received.append(values))
+    odrive.register_decoder(0x1E, '<hhh', ('x', 'y', 'z'))
+    odrive.hub.dispatch(frame(0, 0x1F, struct.pack('<fBxxx', 0.5, 3)))
+    odrive.hub.dispatch(frame(0, 0x1E, struct.pack('<hhh', 1, -2, 3)))
+    # Signals are stored before the callback runs, under the default group name
+    assert received == [(0.5, 3)]
+    assert (odrive.gain, odrive.mode) == (0.5, 3)
+    assert (odrive.x, odrive.y, odrive.z) == (1, -2, 3)
+    assert odrive.snapshot().sequence("0x1f") == 1
+
+
+def test_callback_only_decoder_replaces_and_unregisters(odrive):
+    received = []
+    odrive.register_decoder(0x09, '<ff', callback=lambda position, velocity: received.append((position, velocity)))
+    odrive.hub.dispatch(frame(0, 0x09, struct.pack('<ff', 2.0, 1.0)))
+    assert received == [(2.0, 1.0)]
+    assert odrive.position is None  # The built-in encoder decoder was replaced
+    odrive.unregister_decoder(0x09)
+    odrive.hub.dispatch(frame(0, 0x09, struct.pack('<ff', 3.0, 1.0)))
+    assert received == [(2.0, 1.0)]
+
+
+def test_built_in_signals_are_telemetry_descriptors(odrive):
+    assert isinstance(ODriveCAN.position, TelemetrySignal)
+    odrive.hub.dispatch(frame(0, 0x09, struct.pack('<ff', 1.5, -0.5), timestamp=3.0))
+    assert (odrive.position, odrive.velocity) == (1.5, -0.5)
+    assert odrive.telemetry.get("position") == 1.5
+    # Writing the attribute writes the telemetry record, without counting as a received frame
+    odrive.position = 4.0
+    assert odrive.snapshot().position == 4.0
+    assert odrive.snapshot().sequence("encoder") == 1
@@ -0,0 +1,118 @@
+import csv
+import sqlite3
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyodrivecan import OdriveDatabase, export_trial, iter_trial, load_trial
+from pyodrivecan import export
+
+
+NODES = (10, 2)
+SAMPLES = 250
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    # Trial 1 holds nodes 10 and 2 (logged in that order, so text order and numeric order differ), trial 2 one node.
+    path = str(tmp_path / "odrive_data.db")
+    database = OdriveDatabase(path)
+    for node_ID in NODES:
+        t = np.arange(SAMPLES) * 0.01
+        database.insert_odrive_columns({'trial_id': 1, 'node_ID': node_ID, 'time': t, 'position': t * node_ID, 'velocity': float(node_ID)})
+    database.insert_odrive_columns({'trial_id': 2, 'node_ID': 0, 'time': [0.0], 'position': [9.0]})
+    database.close()
+    return path
+
+
+def test_iter_trial_orders_by_node_and_time(database_path):
+    chunks = list(iter_trial(database_path, 1, columns=['node_ID', 'time'], chunk_size=100))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 100, 100, 100]
+    rows = [row for chunk in chunks for row in chunk]
+    # The order of the trial index: node_ID is TEXT, so node 10 comes before node 2
+    assert [int(node_ID) for node_ID, _ in rows] == [10] * SAMPLES + [2] * SAMPLES
+    assert [t for _, t in rows[:SAMPLES]] == sorted(t for _, t in rows[:SAMPLES])
+
+
+def test_export_opens_the_database_read_only(tmp_path):
+    # A database written by an older version: no trial index, no Trials table, rollback journal
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ODriveData (UniqueID INTEGER PRIMARY KEY AUTOINCREMENT, trial_id INTEGER NOT NULL, node_ID TEXT, time REAL, position REAL);")
+    conn.executemany("INSERT INTO ODriveData (trial_id, node_ID, time, position) VALUES (1, '0', ?, ?);", [(i * 0.1, float(i)) for i in range(5)])
+    conn.commit()
+    conn.close()
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    data = load_trial(path, 1, columns=['time', 'position'])
+    assert data['position'].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    with open(path, 'rb') as f:
+        assert f.read() == before
+
+
+def test_load_trial(database_path):
+    data = load_trial(database_path, 1, node_ID=10, columns=['time', 'position', 'velocity'], chunk_size=64)
+    assert data.dtype.names == ('time', 'position', 'velocity')
+    assert len(data) == SAMPLES
+    np.testing.assert_allclose(data['position'], np.arange(SAMPLES) * 0.01 * 10)
+    assert (data['velocity'] == 10.0).all()
+
+
+def test_load_trial_maps_missing_node_ID(tmp_path):
+    database = OdriveDatabase(str(tmp_path / "missing.db"))
+    database.insert_odrive_columns({'trial_id': 1, 'node_ID': [3, None], 'time': [0.0, 0.0]})
+    data = load_trial(database, 1, columns=['node_ID', 'time'])
+    assert data['node_ID'].tolist() == [export.MISSING_NODE_ID, 3]
+    database.close()
+
+
+def test_csv_round_trip(database_path, tmp_path):
+    path = str(tmp_path / "trial.csv")
+    assert export_trial(database_path, 1, path, chunk_size=100) == 2 * SAMPLES
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert tuple(rows[0]) == OdriveDatabase.ODRIVE_DATA_COLUMNS
+    expected = load_trial(database_path, 1)
+    assert len(rows) - 1 == len(expected)
+    for column in ('node_ID', 'time', 'position', 'velocity'):
+        index = rows[0].index(column)
+        np.testing.assert_allclose([float(row[index]) for row in rows[1:]], expected[column])
+
+
+def test_npz_round_trip(database_path, tmp_path):
+    path = str(tmp_path / "trial.npz")
+    columns = ['node_ID', 'time', 'position']
+    assert export_trial(database_path, 1, path, columns=columns, chunk_size=64) == 2 * SAMPLES
+    with np.load(path) as archive:
+        data = archive[export.NPZ_ARRAY_NAME]
+    np.testing.assert_array_equal(data, load_trial(database_path, 1, columns=columns))
+    assert data.dtype == export.trial_dtype(columns)
+
+
+def test_parquet_round_trip(database_path, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "trial.parquet")
+    assert export_trial(database_path, 1, path, node_ID=2, chunk_size=100) == SAMPLES
+    table = pq.read_table(path)
+    np.testing.assert_allclose(table.column('position').to_numpy(), load_trial(database_path, 1, node_ID=2)['position'])
+
+
+def test_export_rejects_unknown_format_and_columns(database_path, tmp_path):
+    with pytest.raises(ValueError):
+        export_trial(database_path, 1, str(tmp_path / "trial.xlsx"))
+    with pytest.raises(ValueError):
+        export_trial(database_path, 1, str(tmp_path / "trial.csv"), columns=['time', 'nothing'])
+    with pytest.raises(FileNotFoundError):
+        export_trial(str(tmp_path / "missing.db"), 1, str(tmp_path / "trial.csv"))
+
+
+def test_command_line(database_path, tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "trial_2.npz")
+    monkeypatch.setattr(sys, "argv", ["pyodrivecan-export", database_path, "2", path])
+    export.main()
+    assert "Exported 1 rows of trial 2" in capsys.readouterr().out
+    with np.load(path) as archive:
+        assert archive[export.NPZ_ARRAY_NAME]['position'].tolist() == [9.0]
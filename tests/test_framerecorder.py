@@ -0,0 +1,64 @@
+import asyncio
+import struct
+
+import can
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyodrivecan import ODriveCAN
+from pyodrivecan.framerecorder import FRAME_RECORD, FrameRecorder, load_frames
+
+
+def test_record_round_trip(tmp_path):
+    path = str(tmp_path / "trial.frames")
+    recorder = FrameRecorder(path)
+    recorder.record(can.Message(timestamp=1.5, arbitration_id=0x09, data=struct.pack('<ff', 2.0, -1.0), is_extended_id=False))
+    recorder.record(can.Message(timestamp=1.75, arbitration_id=(3 << 5 | 0x01), data=b'\x01\x02\x03', is_extended_id=False))
+    recorder.close()
+    with open(path, 'rb') as f:
+        assert len(f.read()) == 2 * FRAME_RECORD.size
+
+    frames = load_frames(path)
+    assert frames['timestamp'].tolist() == [1.5, 1.75]
+    assert frames['arbitration_id'].tolist() == [0x09, 3 << 5 | 0x01]
+    assert frames['dlc'].tolist() == [8, 3]
+    assert frames['data'][0, :8].copy().view('<f4').tolist() == [2.0, -1.0]
+    assert frames['data'][1].tolist() == [1, 2, 3, 0, 0, 0, 0, 0]
+
+
+def test_load_empty_recording(tmp_path):
+    path = str(tmp_path / "empty.frames")
+    FrameRecorder(path).close()
+    frames = load_frames(path)
+    assert len(frames) == 0
+    assert frames.dtype.names == ('timestamp', 'arbitration_id', 'dlc', 'data')
+
+
+def test_hub_records_frames_of_every_node(channel, tmp_path):
+    path = str(tmp_path / "trial.frames")
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    hub = odrive.hub
+    hub.start_recording(path)
+    sender = can.interface.Bus(channel, interface="virtual")
+
+    async def controller():
+        # Node 7 isn't attached, but the recording keeps its frames too
+        sender.send(can.Message(arbitration_id=(7 << 5 | 0x09), data=struct.pack('<ff', 3.0, 0.0), is_extended_id=False))
+        sender.send(can.Message(arbitration_id=0x09, data=struct.pack('<ff', 1.0, 0.5), is_extended_id=False))
+        assert await odrive.wait_for("encoder", timeout=1.0) is not None
+        odrive.running = False
+
+    async def main():
+        await asyncio.gather(odrive.recv_all(), controller())
+
+    try:
+        asyncio.run(main())
+    finally:
+        sender.shutdown()
+    assert hub.stop_recording() == 2
+    frames = load_frames(path)
+    assert frames['arbitration_id'].tolist() == [7 << 5 | 0x09, 0x09]
+    assert frames['data'][1, :8].copy().view('<f4').tolist() == [1.0, 0.5]
+    assert (np.diff(frames['timestamp']) >= 0).all()
+    assert odrive.position == 1.0
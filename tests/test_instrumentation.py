@@ -0,0 +1,77 @@
+import struct
+import time
+
+import can
+import pytest
+
+from pyodrivecan import ODriveCAN
+from pyodrivecan.instrumentation import Instrumentation, LatencyStats
+
+
+def test_log2_microsecond_buckets():
+    stats = LatencyStats()
+    for latency in (0.0, 0.5e-6, 1e-6, 3e-6, 4e-6, 1e-3, 1e4):
+        stats.record(latency)
+    histogram = stats.histogram
+    assert histogram[0] == 2  # Under 1 us
+    assert histogram[1] == 1  # 1 to 2 us
+    assert histogram[2] == 1  # 2 to 4 us
+    assert histogram[3] == 1  # 4 to 8 us
+    assert histogram[10] == 1  # 512 to 1024 us
+    assert histogram[LatencyStats.BUCKETS - 1] == 1  # Everything too large for the histogram
+    assert sum(histogram) == stats.count == 7
+
+
+def test_percentiles_of_known_samples():
+    stats = LatencyStats()
+    assert stats.snapshot() == {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+    for _ in range(99):
+        stats.record(3e-6)
+    stats.record(1e-3)
+    snapshot = stats.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['mean'] == pytest.approx((99 * 3e-6 + 1e-3) / 100)
+    # The upper edge of the bucket holding the percentile
+    assert snapshot['p50'] == pytest.approx(4e-6)
+    assert snapshot['p99'] == pytest.approx(4e-6)
+    # Capped at the max, 1 ms, rather than the 1024 us edge of its bucket
+    assert stats.percentile(100) == snapshot['max'] == 1e-3
+    stats.reset()
+    assert stats.count == 0 and sum(stats.histogram) == 0
+
+
+def test_instrumentation_stages():
+    instrumentation = Instrumentation()
+    decoded = []
+    message = can.Message(timestamp=time.time(), arbitration_id=0x09, data=bytes(8), is_extended_id=False)
+    instrumentation.decode_message(decoded.append, message)
+    assert decoded == [message]
+    # No kernel timestamp, so no receive latency
+    instrumentation.decode_message(decoded.append, can.Message(timestamp=0.0, arbitration_id=0x09, data=bytes(8)))
+
+    class Bus:
+        def send(self, message):
+            self.sent = message
+
+    bus = Bus()
+    instrumentation.timed_send(bus, message, 'send.set_torque')
+    assert bus.sent is message
+
+    snapshot = instrumentation.snapshot()
+    assert set(snapshot) == {'receive', 'decode', 'send.set_torque'}
+    assert (snapshot['receive']['count'], snapshot['decode']['count'], snapshot['send.set_torque']['count']) == (1, 2, 1)
+    assert 0.0 <= snapshot['receive']['max'] < 1.0
+    instrumentation.reset()
+    assert all(stats['count'] == 0 for stats in instrumentation.snapshot().values())
+
+
+def test_odrive_records_hot_path_latencies(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    assert odrive.stats() == {}
+    odrive.enable_instrumentation()
+    odrive.hub.dispatch(can.Message(timestamp=time.time(), arbitration_id=0x09, data=struct.pack('<ff', 1.0, 2.0), is_extended_id=False))
+    odrive.set_torque(0.1)
+    stats = odrive.stats()
+    assert (stats['receive']['count'], stats['decode']['count'], stats['send.set_torque']['count']) == (1, 1, 1)
+    odrive.disable_instrumentation()
+    assert odrive.stats() == {}
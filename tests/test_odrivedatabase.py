@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from pyodrivecan import OdriveDatabase, OdriveDatabaseWriter
+
+
+def odrive_row(trial_id=1, node_ID=0, t=0.0):
+    return (trial_id, node_ID, t, 1.0, 2.0, 0.1, 0.1, 24.0, 0.5, 1.0, 1.0, 12.0, 11.0, 40.0, 35.0)
+
+
+def count_rows(database):
+    return database.fetch("SELECT COUNT(*) FROM ODriveData;")[0][0]
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / "odrive_data.db")
+
+
+def test_add_odrive_data_many(database_path):
+    database = OdriveDatabase(database_path)
+    assert database.add_odrive_data_many([odrive_row(t=i * 0.01) for i in range(3)]) == 3
+    database.close()
+    assert count_rows(OdriveDatabase(database_path)) == 3
+
+
+def test_writer_batches_rows(database_path):
+    writer = OdriveDatabaseWriter(database_path, batch_size=10, flush_interval=60)
+    for i in range(25):
+        assert writer.put(odrive_row(t=i * 0.01))
+    assert writer.flush(timeout=5)
+    stats = writer.stats()
+    assert stats['rows_written'] == 25
+    assert stats['flushes'] == 3  # Two full batches of 10, and the last 5 written by flush()
+    assert stats['queue_depth'] == 0
+    assert stats['dropped_rows'] == 0
+    assert stats['max_flush_latency'] >= stats['last_flush_latency'] > 0
+    writer.close()
+    assert count_rows(OdriveDatabase(database_path)) == 25
+
+
+def test_writer_drops_rows_when_queue_is_full(database_path):
+    writer = OdriveDatabaseWriter(database_path, max_queue=2)
+    # Hold up the writer thread, so the queue fills
+    gate = threading.Event()
+    started = threading.Event()
+    writer.queue.put(lambda database: (started.set(), gate.wait()))
+    assert started.wait(5)
+    assert writer.put(odrive_row())
+    assert writer.put(odrive_row())
+    assert not writer.put(odrive_row())
+    assert writer.stats()['dropped_rows'] == 1
+    gate.set()
+    writer.close()
+    assert writer.stats()['rows_written'] == 2
+
+
+def test_get_writer_is_shared_per_database(database_path):
+    writer = OdriveDatabaseWriter.get_writer(database_path)
+    assert OdriveDatabaseWriter.get_writer(database_path) is writer
+    writer.put(odrive_row())
+    writer.release()
+    assert writer.thread.is_alive()
+    writer.release()
+    assert not writer.thread.is_alive()
+    assert database_path not in OdriveDatabaseWriter.writers
+    assert count_rows(OdriveDatabase(database_path)) == 1
+
+
+def test_writer_that_cannot_open_the_database_fails_fast(tmp_path):
+    writer = OdriveDatabaseWriter(str(tmp_path / "missing" / "odrive_data.db"))
+    with pytest.raises(Exception) as error:
+        writer.join_trial(0, timeout=5)
+    assert writer.error is error.value
+    assert not writer.put(odrive_row())
+    assert not writer.put_bus_stats([(0.0,)])
+    assert writer.flush(timeout=5) is False
+    assert writer.stats()['dropped_rows'] == 2
+    assert writer.close() is True
+    with pytest.raises(Exception):
+        writer.call(lambda database: None, timeout=5)
+
+
+def test_insert_odrive_columns_from_lists_and_arrays(database_path):
+    np = pytest.importorskip("numpy")
+    database = OdriveDatabase(database_path)
+    t = np.arange(4) * 0.01
+    assert database.insert_odrive_columns({'trial_id': 1, 'node_ID': 3, 'time': t, 'position': [1.0, 2.0, 3.0, 4.0], 'velocity': np.float32(0.5)}) == 4
+    rows = database.fetch("SELECT trial_id, node_ID, time, position, velocity, torque_target FROM ODriveData ORDER BY UniqueID;")
+    assert rows == [(1, '3', i * 0.01, float(i + 1), 0.5, None) for i in range(4)]
+    database.close()
+
+
+def test_insert_odrive_columns_from_structured_array(database_path):
+    np = pytest.importorskip("numpy")
+    database = OdriveDatabase(database_path)
+    data = np.zeros(3, dtype=[('time', '<f8'), ('position', '<f4')])
+    data['time'] = [0.0, 0.5, 1.0]
+    data['position'] = [1.5, 2.5, 3.5]
+    # trial_id is NOT NULL, so without it the insert fails and nothing is written
+    assert database.insert_odrive_columns(data) == 0
+    assert count_rows(database) == 0
+    data = np.zeros(3, dtype=[('trial_id', '<i8'), ('time', '<f8'), ('position', '<f4')])
+    data['trial_id'] = 2
+    data['position'] = [1.5, 2.5, 3.5]
+    assert database.insert_odrive_columns(data) == 3
+    assert database.fetch("SELECT trial_id, position FROM ODriveData ORDER BY UniqueID;") == [(2, 1.5), (2, 2.5), (2, 3.5)]
+    database.close()
+
+
+def test_insert_odrive_columns_rejects_bad_input(database_path):
+    database = OdriveDatabase(database_path)
+    assert database.insert_odrive_columns({'trial_id': 1, 'time': []}) == 0
+    assert database.insert_odrive_columns({'trial_id': 1, 'node_ID': 0}) == 0  # Only scalars, no rows
+    assert database.insert_odrive_columns({'trial_id': 1, 'time': [0.0, 0.1], 'position': [1.0]}) == 0
+    assert database.insert_odrive_columns({'trial_id': 1, 'time': [0.0], 'nothing': [1.0]}) == 0
+    assert count_rows(database) == 0
+    database.close()
+
+
+def test_bulk_insert_odrive_data(database_path):
+    # Every one of the 15 columns is written, on the database's own connection
+    database = OdriveDatabase(database_path)
+    records = [dict(zip(OdriveDatabase.ODRIVE_DATA_COLUMNS, odrive_row(t=i * 0.1))) for i in range(3)]
+    assert database.bulk_insert_odrive_data(records) == 3
+    columns = ', '.join(OdriveDatabase.ODRIVE_DATA_COLUMNS)
+    rows = database.fetch(f"SELECT {columns} FROM ODriveData ORDER BY UniqueID;")
+    assert [row[3:] for row in rows] == [odrive_row(t=i * 0.1)[3:] for i in range(3)]
+    assert [row[2] for row in rows] == [0.0, 0.1, 0.2]
+    del records[1]['motor_temp']
+    assert database.bulk_insert_odrive_data(records) == 0
+    assert count_rows(database) == 3
+    database.close()
@@ -0,0 +1,70 @@
+import struct
+
+import can
+import numpy as np
+import pytest
+
+from pyodrivecan import ODriveCAN, ODriveGroup
+
+
+@pytest.fixture
+def group(channel):
+    odrives = [ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=None) for node_id in (0, 1, 2)]
+    return ODriveGroup(odrives)
+
+
+@pytest.fixture
+def sink(channel):
+    sink = can.interface.Bus(channel, interface="virtual")
+    yield sink
+    sink.shutdown()
+
+
+def received(sink, count):
+    frames = [sink.recv(1.0) for _ in range(count)]
+    assert sink.recv(0.01) is None
+    return [(msg.arbitration_id, bytes(msg.data)) for msg in frames]
+
+
+def test_set_torques_sends_one_frame_per_node(group, sink):
+    group.set_torques(np.array([0.5, 0.0, -0.5]))
+    assert received(sink, 3) == [(node_id << 5 | 0x0E, struct.pack('<f', torque)) for node_id, torque in zip((0, 1, 2), (0.5, 0.0, -0.5))]
+
+
+def test_set_velocities_with_feedforward(group, sink):
+    group.set_velocities([1.0, 2.0, 3.0])
+    group.set_velocities(np.array([1.0, 2.0, 3.0]), torque_feedforwards=np.array([0.1, 0.0, 0.0]))
+    frames = received(sink, 6)
+    assert frames[0] == (0x0D, struct.pack('<ff', 1.0, 0.0))
+    assert frames[3] == (0x0D, struct.pack('<ff', 1.0, 0.1))
+    assert frames[5] == (2 << 5 | 0x0D, struct.pack('<ff', 3.0, 0.0))
+
+
+def test_set_positions_truncates_float_feedforwards(group, sink):
+    group.set_positions(np.array([10.0, 20.0, 30.0]), velocity_feedforwards=np.array([1.7, 0.0, -2.0]), torque_feedforwards=[0.0, 3.2, 0.0])
+    group.set_positions([1.0, 2.0, 3.0])
+    frames = received(sink, 6)
+    assert frames[:3] == [
+        (0x0C, struct.pack('<fhh', 10.0, 1, 0)),
+        (1 << 5 | 0x0C, struct.pack('<fhh', 20.0, 0, 3)),
+        (2 << 5 | 0x0C, struct.pack('<fhh', 30.0, -2, 0)),
+    ]
+    assert frames[4] == (1 << 5 | 0x0C, struct.pack('<fhh', 2.0, 0, 0))
+
+
+def test_setpoint_count_must_match_group(group, sink):
+    with pytest.raises(ValueError):
+        group.set_torques([0.1, 0.2])
+    with pytest.raises(ValueError):
+        group.set_velocities([1.0, 2.0, 3.0], torque_feedforwards=[0.0])
+    assert sink.recv(0.01) is None
+    assert group.stats()['bursts'] == 0
+
+
+def test_stats(group, sink):
+    assert group.stats()['mean_burst_latency'] == 0.0
+    group.set_torques([0.0, 0.0, 0.0])
+    group.set_torques([0.1, 0.1, 0.1])
+    stats = group.stats()
+    assert (stats['bursts'], stats['frames']) == (2, 6)
+    assert stats['max_burst_latency'] >= stats['mean_burst_latency'] > 0
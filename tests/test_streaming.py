@@ -0,0 +1,51 @@
+import struct
+import time
+
+import can
+import pytest
+
+from pyodrivecan import ODriveCAN
+
+
+@pytest.fixture
+def odrive(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+    yield odrive
+    odrive.stop_streaming()
+
+
+def test_update_stream_without_stream(odrive):
+    with pytest.raises(RuntimeError):
+        odrive.update_stream(1.0)
+
+
+def test_stream_pads_missing_feedforwards(odrive):
+    odrive.start_streaming("position", 0.01, 1.5)
+    odrive.update_stream(2.5)
+    assert struct.unpack('<fhh', odrive.stream_message.data) == (2.5, 0, 0)
+    odrive.update_stream(3.0, 100, 7.9)
+    assert struct.unpack('<fhh', odrive.stream_message.data) == (3.0, 100, 7)
+
+    odrive.start_streaming("velocity", 0.01, 1)
+    assert struct.unpack('<ff', odrive.stream_message.data) == (1.0, 0.0)
+    with pytest.raises(ValueError):
+        odrive.update_stream(1.0, 0.0, 0.0)
+
+
+def test_stream_sends_updated_setpoint(odrive, channel):
+    sink = can.interface.Bus(channel, interface="virtual")
+    try:
+        odrive.start_streaming("torque", 0.005, 0.0)
+        odrive.update_stream(0.25)
+        deadline = time.monotonic() + 1.0
+        torque = None
+        while time.monotonic() < deadline and torque != 0.25:
+            msg = sink.recv(0.1)
+            if msg is not None and msg.arbitration_id == 0x0E:
+                torque = struct.unpack('<f', msg.data)[0]
+        assert torque == 0.25
+        odrive.stop_streaming()
+        with pytest.raises(RuntimeError):
+            odrive.update_stream(0.0)
+    finally:
+        sink.shutdown()
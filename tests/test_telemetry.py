@@ -0,0 +1,123 @@
+import asyncio
+import struct
+
+import can
+import pytest
+
+from pyodrivecan import ODriveCAN, Telemetry, TelemetryRingBuffer, TelemetrySnapshot
+
+
+def encoder_frame(node_id, position, velocity, timestamp):
+    return can.Message(arbitration_id=(node_id << 5 | 0x09), data=struct.pack('<ff', position, velocity), is_extended_id=False, timestamp=timestamp)
+
+
+@pytest.fixture
+def odrive(channel):
+    return ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+
+
+def test_telemetry_groups_and_snapshots():
+    telemetry = Telemetry()
+    group = telemetry.add_group("encoder", ("position", "velocity"))
+    assert telemetry.group("encoder") == telemetry.group("velocity") == group
+    with pytest.raises(ValueError):
+        telemetry.group("nothing")
+
+    telemetry.set("position", 1.5)
+    snapshot = telemetry.snapshot()
+    assert isinstance(snapshot, TelemetrySnapshot)
+    assert snapshot.position == snapshot["position"] == 1.5
+    assert snapshot.velocity is None
+    assert snapshot.sequence("encoder") == 0  # set() doesn't count as a received frame
+    with pytest.raises(AttributeError):
+        snapshot.nothing
+
+    # Snapshots are copies, and can be refreshed in place
+    telemetry.set("position", 2.5)
+    assert snapshot.position == 1.5
+    assert telemetry.snapshot(snapshot) is snapshot
+    assert snapshot.as_dict() == {"position": 2.5, "velocity": None}
+
+
+def test_snapshot_holds_whole_frames(odrive):
+    odrive.hub.dispatch(encoder_frame(0, 1.0, 2.0, timestamp=100.0))
+    first = odrive.snapshot()
+    odrive.hub.dispatch(encoder_frame(0, 3.0, 4.0, timestamp=100.5))
+    second = odrive.snapshot()
+    assert (first.position, first.velocity, first.sequence("encoder"), first.timestamp("encoder")) == (1.0, 2.0, 1, 100.0)
+    assert (second.position, second.velocity, second.sequence("velocity"), second.timestamp("position")) == (3.0, 4.0, 2, 100.5)
+    assert second.age("encoder", 101.0) == pytest.approx(0.5)
+    assert odrive.position == 3.0
+
+
+def test_wait_for_wakes_on_next_frame(odrive):
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, odrive.hub.dispatch, encoder_frame(0, 1.0, 2.0, timestamp=1.0))
+        assert await odrive.wait_for("encoder", timeout=1.0) == 1
+        # Already past the given sequence number: returns at once
+        assert await odrive.wait_for("velocity", newer_than=0, timeout=0) == 1
+        # Times out without a frame
+        assert await odrive.wait_for("encoder", timeout=0.05) is None
+        # Stopping the node wakes the waiters
+        loop.call_later(0.05, setattr, odrive, "running", False)
+        assert await odrive.wait_for("encoder", timeout=1.0) is None
+
+    asyncio.run(main())
+
+
+def test_updates_yields_snapshots_of_simulated_frames(simulator, channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None)
+
+    async def main():
+        sequences = []
+        async for snapshot in odrive.updates("encoder", timeout=1.0):
+            sequences.append(snapshot.sequence("encoder"))
+            if len(sequences) == 3:
+                odrive.running = False
+        return sequences
+
+    sequences = asyncio.run(main())
+    assert len(sequences) == 3
+    assert sequences == sorted(set(sequences))
+
+
+def test_updates_ends_on_timeout(odrive):
+    async def main():
+        return [snapshot async for snapshot in odrive.updates("encoder", timeout=0.05)]
+
+    assert asyncio.run(main()) == []
+
+
+def test_ring_buffer_wraps_around():
+    buffer = TelemetryRingBuffer(("position", "velocity"), capacity=4)
+    for i in range(6):
+        buffer.append(float(i), (i * 10.0, -i))
+    assert len(buffer) == 4
+    assert buffer.count == 6
+
+    times, values = buffer.last(10)
+    assert times.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert values[:, 0].tolist() == [20.0, 30.0, 40.0, 50.0]
+
+    times, velocity = buffer.last(2, "velocity")
+    assert times.tolist() == [4.0, 5.0]
+    assert velocity.tolist() == [-4.0, -5.0]
+
+    times, position = buffer.since(3.0, "position")
+    assert times.tolist() == [3.0, 4.0, 5.0]
+    assert position.tolist() == [30.0, 40.0, 50.0]
+    assert buffer.since(9.0)[0].size == 0
+
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.last(4)[0].size == 0
+
+
+def test_history_keeps_decoded_frames(channel):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=None, history_size=3)
+    for i in range(5):
+        odrive.hub.dispatch(encoder_frame(0, float(i), 0.5, timestamp=10.0 + i))
+    times, position = odrive.get_history("encoder").last(3, "position")
+    assert times.tolist() == [12.0, 13.0, 14.0]
+    assert position.tolist() == [2.0, 3.0, 4.0]
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from pyodrivecan import ODriveCAN, OdriveDatabase, OdriveDatabaseWriter
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = OdriveDatabase(str(tmp_path / "odrive_data.db"))
+    yield database
+    database.close()
+
+
+def insert_samples(database, trial_id, node_ID, times):
+    database.insert_odrive_columns({'trial_id': trial_id, 'node_ID': node_ID, 'time': list(times), 'position': [float(i) for i in range(len(times))]})
+
+
+def test_trial_index_exists(database):
+    indexes = [row[0] for row in database.fetch("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ODriveData';")]
+    assert "ODriveData_trial_node_time" in indexes
+    plan = " ".join(str(row) for row in database.fetch("EXPLAIN QUERY PLAN SELECT time FROM ODriveData WHERE trial_id = 1 AND node_ID = 0 ORDER BY time;"))
+    assert "ODriveData_trial_node_time" in plan
+
+
+def test_trials_table(database):
+    assert database.get_next_trial_id() == 1
+    trial_id = database.start_trial(nodes=[1], metadata={'kp': 0.5}, start_time=100.0)
+    assert trial_id == 1
+    database.add_trial_node(trial_id, 0)
+    database.add_trial_node(trial_id, 1)
+    assert database.get_trial(trial_id) == {'trial_id': 1, 'start_time': 100.0, 'nodes': [0, 1], 'metadata': {'kp': 0.5}}
+    assert database.get_trial(2) is None
+
+    # Rows logged without a Trials entry still count
+    insert_samples(database, 5, 0, [0.0])
+    assert database.get_next_trial_id() == 6
+    assert database.start_trial() == 6
+    assert [trial['trial_id'] for trial in database.get_trials()] == [1, 6]
+
+
+def test_trials_are_backfilled_from_existing_data(tmp_path):
+    path = str(tmp_path / "old.db")
+    database = OdriveDatabase(path)
+    insert_samples(database, 1, 0, [0.0])
+    insert_samples(database, 1, 1, [0.0])
+    insert_samples(database, 2, 1, [0.0])
+    database.execute("DROP TABLE Trials;")
+    database.close()
+
+    database = OdriveDatabase(path)
+    assert [(trial['trial_id'], trial['nodes']) for trial in database.get_trials()] == [(1, [0, 1]), (2, [1])]
+    database.close()
+
+
+def test_query_window_pages_by_key(database):
+    # Repeated timestamps across a page boundary are paged by UniqueID, so no row is skipped or repeated
+    times = [i * 0.01 for i in range(25)] + [0.25] * 10 + [0.26 + i * 0.01 for i in range(15)]
+    insert_samples(database, 1, 0, times)
+    insert_samples(database, 1, 1, times)
+    insert_samples(database, 2, 0, times)
+
+    rows, key = database.query_window(1, 0, columns=['time', 'position'], page_size=30)
+    assert len(rows) == 30 and key is not None
+    more, key = database.query_window(1, 0, columns=['time', 'position'], page_size=30, after=key)
+    assert key is None
+    assert [position for _, position in rows + more] == [float(i) for i in range(len(times))]
+
+    pages = list(database.iter_window(1, 0, columns=['position'], page_size=7))
+    assert [len(page) for page in pages] == [7] * 7 + [1]
+    assert [row[0] for page in pages for row in page] == [float(i) for i in range(len(times))]
+
+
+def test_query_window_time_range(database):
+    insert_samples(database, 1, 0, [i * 0.1 for i in range(100)])
+    rows = [row for page in database.iter_window(1, 0, start=1.0, end=2.0, columns=['time'], page_size=4) for row in page]
+    assert [round(t, 6) for (t,) in rows] == [round(i * 0.1, 6) for i in range(10, 20)]
+    assert database.query_window(1, 0, start=50.0, columns=['time']) == ([], None)
+    assert database.query_window(1, 0, columns=['nothing']) == ([], None)
+
+
+def test_writer_trials_are_shared_until_every_node_leaves(tmp_path):
+    path = str(tmp_path / "odrive_data.db")
+    writer = OdriveDatabaseWriter.get_writer(path)
+    try:
+        assert writer.join_trial(0, timeout=5) == 1
+        assert writer.join_trial(1, timeout=5) == 1
+        writer.leave_trial()
+        writer.leave_trial()
+        assert writer.join_trial(1, timeout=5) == 2
+        writer.leave_trial()
+        assert writer.call(lambda database: database.get_trial(1)['nodes'], timeout=5) == [0, 1]
+    finally:
+        writer.release()
+
+
+def test_writer_call_raises_errors_of_the_request(tmp_path):
+    writer = OdriveDatabaseWriter(str(tmp_path / "odrive_data.db"))
+    try:
+        with pytest.raises(ZeroDivisionError):
+            writer.call(lambda database: 1 / 0, timeout=5)
+        assert writer.thread.is_alive()
+    finally:
+        writer.close()
+
+
+def test_save_data_logs_simulated_nodes_into_one_trial(simulator, channel, tmp_path):
+    path = str(tmp_path / "odrive_data.db")
+    odrives = [ODriveCAN(node_id, canBusID=channel, canBusType="virtual", database=path) for node_id in (0, 1)]
+
+    async def controller():
+        await asyncio.sleep(0.3)
+        for odrive in odrives:
+            odrive.running = False
+
+    async def main():
+        await asyncio.gather(controller(), odrives[0].recv_all(), *(odrive.save_data(timeout=0.05) for odrive in odrives))
+
+    asyncio.run(main())
+    # The trial was registered on the writer thread, the event loop never opened a connection
+    assert all(odrive.odrive_database is None for odrive in odrives)
+    for odrive in odrives:
+        odrive.bus_shutdown()
+    database = OdriveDatabase(path)
+    assert database.get_trials()[0]['nodes'] == [0, 1]
+    assert database.fetch("SELECT COUNT(DISTINCT trial_id), COUNT(DISTINCT node_ID) FROM ODriveData;")[0] == (1, 2)
+    database.close()
+
+
+def test_save_data_raises_when_the_database_cannot_be_opened(channel, tmp_path):
+    odrive = ODriveCAN(0, canBusID=channel, canBusType="virtual", database=str(tmp_path / "missing" / "odrive_data.db"))
+
+    async def main():
+        with pytest.raises(Exception):
+            await asyncio.wait_for(odrive.save_data(timeout=0.05), 5.0)
+
+    asyncio.run(main())
+    odrive.bus_shutdown()